@@ -14,6 +14,12 @@ python manage.py migrate
 # Crear estados de publicación
 echo "from diarioback.models import EstadoPublicacion; states = [('borrador', 'Borrador'), ('en_papelera', 'En Papelera'), ('publicado', 'Publicado'), ('listo_para_editar', 'Listo para editar')]; [EstadoPublicacion.objects.get_or_create(nombre_estado=code) for code, name in states]" | python manage.py shell
 
+# Calcular los rankings materializados (después con un cron cada 5 minutos, fuera de los workers web)
+python manage.py actualizar_rankings
+
+# Consolidar las visitas por día y purgar las crudas vencidas (también periódicamente con un cron)
+python manage.py consolidar_visitas
+
 
 #creacion de usuario admin 
 #export DJANGO_SUPERUSER_USERNAME=admin
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from datetime import timedelta
@@ -51,6 +52,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Después de whitenoise: los estáticos ya se sirven precomprimidos
+    'diarioback.middleware.CompresionMiddleware',
+    'diarioback.middleware.PresupuestoConsultasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -91,6 +95,73 @@ DATABASES = {
     }
 
 
+# Cache
+# Con REDIS_URL definido la cache se comparte entre workers (necesario para que
+# la invalidación de feeds llegue a todos los procesos de gunicorn).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Tiempo de vida (segundos) de los feeds públicos cacheados
+CONTENIDO_FEED_CACHE_TIMEOUT = int(os.environ.get('CONTENIDO_FEED_CACHE_TIMEOUT', 60 * 10))
+CONTENIDO_DETALLE_CACHE_TIMEOUT = int(os.environ.get('CONTENIDO_DETALLE_CACHE_TIMEOUT', 60 * 60))
+CONTENIDO_HOME_CACHE_TIMEOUT = int(os.environ.get('CONTENIDO_HOME_CACHE_TIMEOUT', 60 * 5))
+# Agregados costosos (stale-while-revalidate): segundos frescos y vida máxima de la entrada
+AGREGADOS_CACHE_FRESCURA = int(os.environ.get('AGREGADOS_CACHE_FRESCURA', 60))
+AGREGADOS_CACHE_TIMEOUT = int(os.environ.get('AGREGADOS_CACHE_TIMEOUT', 60 * 60))
+# Segundos que un request espera un agregado que otro worker está calculando
+AGREGADOS_ESPERA_MAXIMA = float(os.environ.get('AGREGADOS_ESPERA_MAXIMA', 0.3))
+
+# Snapshots JSON de los feeds públicos (comando exportar_snapshots), servidos en diarioback/snapshots/
+SNAPSHOTS_ROOT = os.environ.get('SNAPSHOTS_ROOT', os.path.join(BASE_DIR, 'snapshots'))
+# Regenerar los snapshots automáticamente al guardar contenido
+SNAPSHOTS_AUTOEXPORTAR = os.environ.get('SNAPSHOTS_AUTOEXPORTAR', 'False') == 'True'
+
+# Respuestas menores a este tamaño (bytes) se envían sin comprimir
+COMPRESION_TAMANO_MINIMO = int(os.environ.get('COMPRESION_TAMANO_MINIMO', 1024))
+
+# Las visitas se acumulan en memoria y las vuelca un hilo por worker cada tantos segundos
+# o al juntar tantas; si un worker muere con SIGKILL se pierden las de ese intervalo
+VISITAS_VOLCADO_INTERVALO = int(os.environ.get('VISITAS_VOLCADO_INTERVALO', 10))
+VISITAS_VOLCADO_MAXIMO = int(os.environ.get('VISITAS_VOLCADO_MAXIMO', 500))
+# Segundos en los que una nueva visita de la misma IP al mismo contenido no se cuenta
+VISITAS_DEDUPLICACION = int(os.environ.get('VISITAS_DEDUPLICACION', 60 * 5))
+# La marca de deduplicación vive en la cache: con varios workers hace falta REDIS_URL,
+# sin él cada worker tiene la suya y una visita repetida se cuenta una vez por worker.
+# VISITAS_DEDUPLICACION_EN_BASE=True (opcional) busca además las visitas ya volcadas,
+# a costa de una consulta por visita y sin ver las que siguen en el buffer de otro worker
+VISITAS_DEDUPLICACION_EN_BASE = os.environ.get('VISITAS_DEDUPLICACION_EN_BASE', 'False') == 'True'
+# Eventos por lote en el beacon api/v1/visitas/
+VISITAS_BEACON_MAXIMO = int(os.environ.get('VISITAS_BEACON_MAXIMO', 50))
+# Contar visitas en el detalle; con el beacon activo en el front-end se desactiva (False)
+VISITAS_CONTAR_EN_DETALLE = os.environ.get('VISITAS_CONTAR_EN_DETALLE', 'True') == 'True'
+# Días de visitas crudas que se conservan después de consolidarlas (consolidar_visitas)
+VISITAS_RETENCION_DIAS = int(os.environ.get('VISITAS_RETENCION_DIAS', 90))
+VISITAS_PURGA_LOTE = int(os.environ.get('VISITAS_PURGA_LOTE', 5000))
+
+# Presupuesto de consultas SQL por request (PresupuestoConsultasMiddleware)
+PRESUPUESTO_CONSULTAS = int(os.environ.get('PRESUPUESTO_CONSULTAS', 30))
+# Veces que puede repetirse una misma consulta antes de considerarla un N+1
+PRESUPUESTO_CONSULTAS_REPETIDAS = int(os.environ.get('PRESUPUESTO_CONSULTAS_REPETIDAS', 5))
+# 'log' solo registra los excesos; 'rechazar' además responde 500 a los GET (CI/staging)
+PRESUPUESTO_CONSULTAS_MODO = os.environ.get('PRESUPUESTO_CONSULTAS_MODO', 'log')
+# Cabeceras X-Consultas-* con los conteos (en debug o con la variable activada en staging)
+PRESUPUESTO_CONSULTAS_CABECERAS = DEBUG or os.environ.get('PRESUPUESTO_CONSULTAS_CABECERAS', 'False') == 'True'
+# El admin queda fuera del presupuesto
+PRESUPUESTO_CONSULTAS_EXCLUIR = [r'^/admin/']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -148,7 +219,23 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',        
     ],
+    # orjson para JSON; el navegable solo se usa al abrir la API desde el navegador
+    'DEFAULT_RENDERER_CLASSES': [
+        'diarioback.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'diarioback.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
+
+# MessagePack opcional (Accept: application/msgpack o ?format=msgpack), solo si está instalado msgpack
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'diarioback.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('diarioback.renderers.MessagePackParser')
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',  # Este es el backend predeterminado que usa 'username'
 ]
@@ -5,10 +5,14 @@ from django.utils.html import format_html
 from django.contrib.contenttypes.models import ContentType
 from django.utils.safestring import mark_safe
 from django import forms
+from django.utils import timezone
 from .models import (
     Trabajador, Usuario, Contenido, EstadoPublicacion, Publicidad, 
-    UserProfile, EspacioReferencia, ImagenLink, ContenidoVisita, PasswordResetToken
+    UserProfile, EspacioReferencia, ImagenLink, ContenidoImagen, ContenidoVisita, PasswordResetToken,
+    RankingContenido, ContenidoVisitaDiaria
 )
+from .cache_utils import invalidar_categorias, invalidar_contenidos
+from .snapshots import programar_exportacion
 
 # --- Función helper para verificar permisos de admin ---
 def es_admin_completo(user):
@@ -197,6 +201,12 @@ class EspacioReferenciaInline(admin.TabularInline):
     fields = ('orden', 'texto_mostrar', 'url')
     ordering = ('orden',)
 
+class ContenidoImagenInline(admin.TabularInline):
+    model = ContenidoImagen
+    extra = 1
+    fields = ('tipo', 'posicion', 'url', 'ancho', 'alto')
+    ordering = ('tipo', 'posicion')
+
 class ImagenLinkInline(admin.TabularInline):
     model = ImagenLink
     extra = 1
@@ -231,11 +241,6 @@ class ContenidoForm(forms.ModelForm):
             for field in ['numero_issue', 'nombre_modelo', 'subtitulo_issue', 'frase_final_issue', 'video_youtube_issue']:
                 if field in self.fields:
                     self.fields[field].widget = forms.HiddenInput()
-            # Ocultar campos de backstage
-            for i in range(1, 31):
-                backstage_field = f'backstage_{i}'
-                if backstage_field in self.fields:
-                    self.fields[backstage_field].widget = forms.HiddenInput()
         
         if categoria != 'madeinarg':
             for field in ['subcategoria_madeinarg', 'subtitulo_madeinarg', 'tags_marcas']:
@@ -250,7 +255,7 @@ class ContenidoForm(forms.ModelForm):
 @admin.register(Contenido)
 class ContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
     form = ContenidoForm
-    inlines = [EspacioReferenciaInline, ImagenLinkInline]
+    inlines = [ContenidoImagenInline, EspacioReferenciaInline, ImagenLinkInline]
     
     list_display = (
         'titulo_corto',
@@ -288,10 +293,6 @@ class ContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
                 base_fieldsets.extend([
                     ('Datos de Issue', {
                         'fields': ('numero_issue', 'nombre_modelo', 'subtitulo_issue', 'frase_final_issue', 'video_youtube_issue')
-                    }),
-                    ('Imágenes Backstage', {
-                        'fields': tuple(f'backstage_{i}' for i in range(1, 11)),
-                        'classes': ('collapse',)
                     })
                 ])
             
@@ -327,10 +328,6 @@ class ContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
         
         # Agregar fieldsets comunes
         base_fieldsets.extend([
-            ('Imágenes Principales', {
-                'fields': tuple(f'imagen_{i}' for i in range(1, 11)),
-                'classes': ('collapse',)
-            }),
             ('Estadísticas', {
                 'fields': ('contador_visitas', 'contador_visitas_total', 'ultima_actualizacion_contador'),
                 'classes': ('collapse',)
@@ -339,6 +336,16 @@ class ContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
         
         return base_fieldsets
     
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # La portada depende de la galería editada en el inline; cualquier cambio en los
+        # inlines vuelve a guardar el contenido para invalidar la cache y los snapshots
+        contenido = form.instance
+        portada_anterior = contenido.portada
+        contenido.actualizar_portada()
+        if contenido.portada != portada_anterior or any(formset.has_changed() for formset in formsets):
+            contenido.save(update_fields=['portada', 'fecha_actualizacion'])
+    
     def titulo_corto(self, obj):
         if len(obj.titulo) > 50:
             return obj.titulo[:50] + '...'
@@ -369,8 +376,8 @@ class ContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
     estado_badge.short_description = 'Estado'
     
     def mostrar_imagen_principal(self, obj):
-        if obj.imagen_1:
-            return format_html('<img src="{}" style="max-height: 50px;">', obj.imagen_1)
+        if obj.portada:
+            return format_html('<img src="{}" style="max-height: 50px;">', obj.portada)
         return "Sin imagen"
     mostrar_imagen_principal.short_description = 'Imagen Principal'
     
@@ -403,35 +410,43 @@ class ContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
     reset_total_counter.short_description = "Resetear contadores"
 
     def cambiar_a_publicado(self, request, queryset):
-        try:
-            estado_publicado = EstadoPublicacion.objects.get(nombre_estado='publicado')
-            count = queryset.update(estado=estado_publicado)
-            self.message_user(
-                request,
-                f'Se cambió el estado de {count} contenidos a "Publicado".'
-            )
-        except EstadoPublicacion.DoesNotExist:
+        estado_publicado_id = EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO)
+        if estado_publicado_id is None:
             self.message_user(
                 request,
                 'No se encontró el estado "Publicado". Créalo primero.',
                 level='ERROR'
             )
+            return
+        filas = list(queryset.values_list('pk', 'categoria'))
+        count = queryset.update(estado_id=estado_publicado_id, fecha_actualizacion=timezone.now())
+        invalidar_categorias(*{categoria for _, categoria in filas})
+        invalidar_contenidos(*[pk for pk, _ in filas])
+        programar_exportacion(*[pk for pk, _ in filas], categorias={categoria for _, categoria in filas})
+        self.message_user(
+            request,
+            f'Se cambió el estado de {count} contenidos a "Publicado".'
+        )
     cambiar_a_publicado.short_description = "Cambiar a Publicado"
 
     def cambiar_a_borrador(self, request, queryset):
-        try:
-            estado_borrador = EstadoPublicacion.objects.get(nombre_estado='borrador')
-            count = queryset.update(estado=estado_borrador)
-            self.message_user(
-                request,
-                f'Se cambió el estado de {count} contenidos a "Borrador".'
-            )
-        except EstadoPublicacion.DoesNotExist:
+        estado_borrador_id = EstadoPublicacion.id_de(EstadoPublicacion.BORRADOR)
+        if estado_borrador_id is None:
             self.message_user(
                 request,
                 'No se encontró el estado "Borrador". Créalo primero.',
                 level='ERROR'
             )
+            return
+        filas = list(queryset.values_list('pk', 'categoria'))
+        count = queryset.update(estado_id=estado_borrador_id, fecha_actualizacion=timezone.now())
+        invalidar_categorias(*{categoria for _, categoria in filas})
+        invalidar_contenidos(*[pk for pk, _ in filas])
+        programar_exportacion(*[pk for pk, _ in filas], categorias={categoria for _, categoria in filas})
+        self.message_user(
+            request,
+            f'Se cambió el estado de {count} contenidos a "Borrador".'
+        )
     cambiar_a_borrador.short_description = "Cambiar a Borrador"
 
 @admin.register(EstadoPublicacion)
@@ -468,10 +483,36 @@ class ContenidoVisitaAdmin(StaffPermissionMixin, admin.ModelAdmin):
     search_fields = ('contenido__titulo', 'ip_address')
     date_hierarchy = 'fecha'
     ordering = ['-fecha']
+    list_select_related = ('contenido',)
+    # Evita el COUNT(*) de toda la tabla en cada listado filtrado
+    show_full_result_count = False
     
     def has_add_permission(self, request):
         return False  # No permitir crear visitas manualmente
 
+@admin.register(ContenidoVisitaDiaria)
+class ContenidoVisitaDiariaAdmin(StaffPermissionMixin, admin.ModelAdmin):
+    list_display = ('contenido', 'fecha', 'visitas', 'unicos')
+    list_filter = ('contenido__categoria',)
+    search_fields = ('contenido__titulo',)
+    date_hierarchy = 'fecha'
+    list_select_related = ('contenido',)
+    ordering = ['-fecha', '-visitas']
+    
+    def has_add_permission(self, request):
+        return False  # Se consolidan con el comando consolidar_visitas
+
+@admin.register(RankingContenido)
+class RankingContenidoAdmin(StaffPermissionMixin, admin.ModelAdmin):
+    list_display = ('ventana', 'categoria', 'posicion', 'contenido', 'visitas', 'fecha_calculo')
+    list_filter = ('ventana', 'categoria')
+    search_fields = ('contenido__titulo',)
+    list_select_related = ('contenido',)
+    ordering = ['ventana', 'categoria', 'posicion']
+    
+    def has_add_permission(self, request):
+        return False  # Se recalculan con el comando actualizar_rankings
+
 @admin.register(Publicidad)
 class PublicidadAdmin(StaffPermissionMixin, admin.ModelAdmin):
     list_display = ('tipo_anuncio', 'fecha_inicio', 'fecha_fin', 'contenido', 'impresiones', 'clics')
@@ -0,0 +1,448 @@
+import copy
+import hashlib
+import threading
+import time
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+# Tiempo de vida de las respuestas cacheadas (en segundos)
+FEED_CACHE_TIMEOUT = getattr(settings, 'CONTENIDO_FEED_CACHE_TIMEOUT', 60 * 10)
+DETALLE_CACHE_TIMEOUT = getattr(settings, 'CONTENIDO_DETALLE_CACHE_TIMEOUT', 60 * 60)
+# La home incluye listas por visitas: se invalida al recalcular los rankings y además se acota por tiempo
+HOME_CACHE_TIMEOUT = getattr(settings, 'CONTENIDO_HOME_CACHE_TIMEOUT', 60 * 5)
+# Agregados costosos: se consideran frescos AGREGADOS_FRESCURA segundos y se sirven
+# vencidos (mientras se recalculan) hasta AGREGADOS_CACHE_TIMEOUT
+AGREGADOS_FRESCURA = getattr(settings, 'AGREGADOS_CACHE_FRESCURA', 60)
+AGREGADOS_CACHE_TIMEOUT = getattr(settings, 'AGREGADOS_CACHE_TIMEOUT', 60 * 60)
+# Tiempo máximo que un worker retiene el lock de recálculo
+AGREGADOS_LOCK_TIMEOUT = 30
+# Lo que un request espera el resultado de otro worker antes de calcularlo él mismo (en segundos):
+# esperas largas retendrían todo el pool de workers detrás de un cálculo lento
+AGREGADOS_ESPERA_MAXIMA = getattr(settings, 'AGREGADOS_ESPERA_MAXIMA', 0.3)
+# Ventana en la que una segunda visita de la misma IP al mismo contenido no se cuenta
+VISITAS_DEDUPLICACION = getattr(settings, 'VISITAS_DEDUPLICACION', 60 * 5)
+
+# Parámetros de consulta que afectan el resultado de los feeds.
+# Cualquier otro parámetro (ej: cache busters del frontend) se ignora en la clave.
+PARAMETROS_FEED = (
+    'limit', 'ordering', 'subcategoria', 'estado', 'page',
+    'autor', 'numero_issue', 'fecha_desde', 'fecha_hasta', 'tags', 'search', 'vista',
+    'fields', 'exclude', 'cursor', 'page_size', 'ventana',
+)
+
+
+# ==================== VERSIONES POR ÁMBITO ====================
+
+def _clave_version(ambito):
+    return f'version:{ambito}'
+
+
+def _version_inicial():
+    """Las versiones nuevas parten del timestamp actual para no reutilizar claves viejas tras un desalojo"""
+    return int(time.time() * 1000)
+
+
+def obtener_versiones(ambitos):
+    """Retorna la versión actual de cada ámbito, inicializando las que no existan"""
+    claves = [_clave_version(ambito) for ambito in ambitos]
+    versiones = cache.get_many(claves)
+
+    for clave in claves:
+        if clave not in versiones:
+            cache.add(clave, _version_inicial(), None)
+            versiones[clave] = cache.get(clave)
+
+    return [versiones[clave] for clave in claves]
+
+
+def version_actual(ambito):
+    """Versión del ámbito sin inicializarla; None si todavía no se invalidó o se desalojó"""
+    return cache.get(_clave_version(ambito))
+
+
+def invalidar_ambitos(*ambitos):
+    """Incrementa la versión de los ámbitos indicados, invalidando sus respuestas cacheadas"""
+    for ambito in set(ambitos):
+        clave = _clave_version(ambito)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, _version_inicial(), None)
+
+
+def ambito_categoria(categoria):
+    return f'contenido:{categoria}'
+
+
+def invalidar_categorias(*categorias):
+    """Invalida los feeds de las categorías de contenido indicadas"""
+    invalidar_ambitos(*[ambito_categoria(c) for c in categorias if c])
+
+
+def ambito_contenido(pk):
+    return f'contenido:detalle:{pk}'
+
+
+def invalidar_contenidos(*pks):
+    """Invalida el detalle cacheado de los contenidos indicados"""
+    invalidar_ambitos(*[ambito_contenido(pk) for pk in pks])
+
+
+# Ámbito compartido por tiendas, productos y artistas de MadeInArg
+AMBITO_MADEINARG = 'madeinarg'
+
+# Rankings materializados de visitas: se invalida cada vez que se recalculan
+AMBITO_RANKING = 'ranking'
+
+# Registro nombre -> id de EstadoPublicacion que cada proceso guarda en memoria
+AMBITO_ESTADOS = 'estados'
+
+
+def clave_snapshot_home(categoria, version, version_ranking, limit):
+    """Clave del snapshot de una categoría en la home para una versión de la categoría y de los rankings"""
+    return f'respuesta:home:{categoria}:{version}:{version_ranking}:{limit}'
+
+
+def clave_slug(slug):
+    """Clave del id de contenido asociado a un slug"""
+    return f'slug:contenido:{slug}'
+
+
+def clave_detalle(pk, version):
+    """Clave del detalle serializado de un contenido para una versión dada"""
+    return f'respuesta:detalle:{pk}:{version}'
+
+
+# ==================== DEDUPLICACIÓN DE VISITAS ====================
+
+def clave_visita(contenido_id, ip_address):
+    """Clave de la marca de visita: hash de (contenido, IP) para no guardar IPs en la cache"""
+    firma = hashlib.md5(f'{contenido_id}:{ip_address}'.encode('utf-8')).hexdigest()[:16]
+    return f'visita:{firma}'
+
+
+def marcar_visita(contenido_id, ip_address):
+    """
+    Retorna True si es la primera visita de esa IP al contenido en la ventana
+    de deduplicación. cache.add es atómico, así que con una cache compartida
+    dos workers no cuentan la misma visita; con la cache local de cada proceso
+    la marca solo vale para ese worker (ver VISITAS_DEDUPLICACION_EN_BASE).
+    """
+    return cache.add(clave_visita(contenido_id, ip_address), 1, VISITAS_DEDUPLICACION)
+
+
+# ==================== CACHE DE RESPUESTAS ====================
+
+def normalizar_parametros(viewset, request):
+    """Normaliza los parámetros relevantes para que URLs equivalentes compartan entrada de cache"""
+    params = {}
+    for nombre in PARAMETROS_FEED:
+        valor = request.query_params.get(nombre, '').strip()
+        if valor:
+            params[nombre] = valor
+
+    # Valores por defecto equivalentes a no enviar el parámetro
+    if params.get('estado') == 'publicado':
+        params.pop('estado')
+    if params.get('subcategoria') == 'ver_todo':
+        params.pop('subcategoria')
+    if 'limit' in params and hasattr(viewset, '_get_limit_from_request'):
+        params['limit'] = viewset._get_limit_from_request(request)
+
+    return sorted(params.items())
+
+
+def construir_clave_respuesta(nombre, versiones, params):
+    """Construye la clave de cache para una respuesta a partir de su acción, versiones y parámetros"""
+    firma = hashlib.md5(repr((versiones, params)).encode('utf-8')).hexdigest()
+    return f'respuesta:{nombre}:{firma}'
+
+
+def _etag(clave, request):
+    """
+    ETag fuerte derivado de la clave: cambia solo cuando cambia alguna versión o parámetro.
+
+    La entrada cacheada es la misma para JSON y MessagePack, pero cada formato
+    negociado es otra representación y necesita su propio ETag.
+    """
+    formato = getattr(getattr(request, 'accepted_renderer', None), 'format', 'json')
+    if formato != 'json':
+        clave = f'{clave}:{formato}'
+    return '"%s"' % hashlib.md5(clave.encode('utf-8')).hexdigest()
+
+
+def _timestamp(fecha):
+    return timegm(fecha.utctimetuple()) if fecha else None
+
+
+def _aplicar_validadores(response, etag, modificado):
+    response['ETag'] = etag
+    if modificado:
+        response['Last-Modified'] = http_date(modificado)
+    # Los clientes y la CDN pueden guardar la respuesta pero deben revalidarla siempre
+    patch_cache_control(response, public=True, no_cache=True)
+    # El formato (JSON o MessagePack) también se negocia con el header Accept
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def responder_con_cache(request, clave, generar, obtener_modificado, timeout=None):
+    """
+    Retorna la respuesta cacheada en `clave` o la genera con `generar()`.
+
+    Emite ETag y Last-Modified, y responde 304 a las peticiones condicionales
+    que coinciden sin consultar la cache ni ejecutar el serializer.
+    """
+    etag = _etag(clave, request)
+
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is not None:
+            return _aplicar_validadores(no_modificado, etag, None)
+
+    entrada = cache.get(clave)
+    if entrada is not None:
+        data, modificado = entrada
+        response = Response(data)
+    else:
+        response = generar()
+        if response.status_code != 200:
+            return response
+        modificado = _timestamp(obtener_modificado())
+        cache.set(clave, (response.data, modificado), FEED_CACHE_TIMEOUT if timeout is None else timeout)
+
+    no_modificado = get_conditional_response(request, last_modified=modificado)
+    if no_modificado is not None:
+        return _aplicar_validadores(no_modificado, etag, modificado)
+    return _aplicar_validadores(response, etag, modificado)
+
+
+def obtener_detalles(pks, generar, timeout=None):
+    """
+    Retorna {pk: data} con el detalle de varios contenidos usando las mismas
+    entradas de cache que retrieve (`clave_detalle`).
+
+    Las vigentes se leen con un solo get_many; el resto se genera junto con
+    `generar(faltantes)`, que retorna [(pk, data, fecha_modificacion)], y se
+    guarda para los próximos retrieve o batch.
+    """
+    versiones = obtener_versiones([ambito_contenido(pk) for pk in pks])
+    claves = {pk: clave_detalle(pk, version) for pk, version in zip(pks, versiones)}
+    entradas = cache.get_many(list(claves.values()))
+    detalles = {pk: entradas[clave][0] for pk, clave in claves.items() if clave in entradas}
+
+    faltantes = [pk for pk in pks if pk not in detalles]
+    if faltantes:
+        nuevas = {}
+        for pk, data, modificado in generar(faltantes):
+            detalles[pk] = data
+            nuevas[claves[pk]] = (data, _timestamp(modificado))
+        cache.set_many(nuevas, DETALLE_CACHE_TIMEOUT if timeout is None else timeout)
+    return detalles
+
+
+def _categorias_de_request(request, kwargs):
+    """Categorías involucradas en una acción genérica (recientes, destacados): la indicada o todas"""
+    from .models import Contenido
+
+    categoria = kwargs.get('categoria') or request.query_params.get('categoria')
+    if categoria:
+        return [categoria]
+    return [valor for valor, _ in Contenido.CATEGORIA_CHOICES]
+
+
+def ultima_modificacion_contenido(categorias):
+    """Retorna la última modificación del contenido de las categorías indicadas"""
+    from .models import Contenido
+
+    return Contenido.objects.filter(categoria__in=categorias).aggregate(
+        ultima=Max('fecha_actualizacion')
+    )['ultima']
+
+
+def ultima_modificacion_madeinarg():
+    """Retorna la última modificación entre tiendas, productos y artistas"""
+    from .models import TiendaMadeInArg, ProductoMadeInArg, ArtistaMadeInArg
+
+    fechas = [
+        modelo.objects.aggregate(ultima=Max('fecha_actualizacion'))['ultima']
+        for modelo in (TiendaMadeInArg, ProductoMadeInArg, ArtistaMadeInArg)
+    ]
+    fechas = [fecha for fecha in fechas if fecha]
+    return max(fechas) if fechas else None
+
+
+def cachear_feed(*categorias, ambitos_extra=()):
+    """
+    Decorador para acciones de ContenidoViewSet que cachea la respuesta serializada.
+
+    La clave incluye la versión de cada categoría involucrada, por lo que al
+    guardar o eliminar contenido de una categoría solo se invalidan sus feeds.
+    Sin categorías fijas se usa el parámetro `categoria` o, en su defecto, todas.
+    `ambitos_extra` suma otros ámbitos a la clave (ej: AMBITO_RANKING).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(viewset, request, *args, **kwargs):
+            categorias_feed = list(categorias) or _categorias_de_request(request, kwargs)
+            ambitos = [ambito_categoria(c) for c in categorias_feed] + list(ambitos_extra)
+            versiones = list(zip(ambitos, obtener_versiones(ambitos)))
+            clave = construir_clave_respuesta(
+                func.__name__, versiones, normalizar_parametros(viewset, request)
+            )
+            return responder_con_cache(
+                request, clave,
+                lambda: func(viewset, request, *args, **kwargs),
+                lambda: ultima_modificacion_contenido(categorias_feed),
+            )
+        return wrapper
+    return decorator
+
+
+def cachear_madeinarg(func):
+    """
+    Decorador para vistas de MadeInArg. Todas comparten un único ámbito que se
+    invalida al guardar o eliminar cualquier tienda, producto o artista.
+    """
+    @wraps(func)
+    def wrapper(viewset, request, *args, **kwargs):
+        params = sorted(request.query_params.items())
+        clave = construir_clave_respuesta(
+            f'{type(viewset).__name__}.{func.__name__}',
+            obtener_versiones([AMBITO_MADEINARG]),
+            (params, sorted(kwargs.items())),
+        )
+        return responder_con_cache(
+            request, clave,
+            lambda: func(viewset, request, *args, **kwargs),
+            ultima_modificacion_madeinarg,
+        )
+    return wrapper
+
+
+# ==================== STALE-WHILE-REVALIDATE ====================
+
+def _recalcular(clave, clave_lock, versiones, generar):
+    """Ejecuta `generar()`, guarda la respuesta si es válida y libera el lock; retorna (response, entrada)"""
+    try:
+        response = generar()
+        if response.status_code != 200:
+            return response, None
+        entrada = (response.data, versiones, time.time())
+        cache.set(clave, entrada, AGREGADOS_CACHE_TIMEOUT)
+        return response, entrada
+    finally:
+        cache.delete(clave_lock)
+
+
+def _contexto_separado(vista, request, args, kwargs):
+    """
+    Arma una vista y un request nuevos con lo mínimo del original (ruta,
+    parámetros, host y usuario) para generar la respuesta en otro hilo: el
+    request original se termina de procesar y se libera mientras tanto.
+    """
+    base = APIRequestFactory().get(
+        request.get_full_path(), HTTP_HOST=request.get_host(), secure=request.is_secure(),
+        HTTP_ACCEPT=request.META.get('HTTP_ACCEPT', '*/*'),
+    )
+    copia = copy.copy(vista)
+    copia.args, copia.kwargs = args, kwargs
+    copia.request = copia.initialize_request(base, *args, **kwargs)
+    # El usuario ya autenticado, sin volver a validar credenciales
+    copia.request.user = request.user
+    copia.headers = {}
+    return copia, copia.request
+
+
+def _recalcular_en_segundo_plano(clave, clave_lock, versiones, generar):
+    def tarea():
+        try:
+            _recalcular(clave, clave_lock, versiones, generar)
+        except Exception as e:
+            print(f"Error al recalcular {clave} en segundo plano: {str(e)}")
+        finally:
+            # El hilo abre su propia conexión a la base: se cierra al terminar
+            connection.close()
+
+    threading.Thread(target=tarea, daemon=True).start()
+
+
+def _esperar_entrada(clave, clave_lock):
+    """Espera a que otro worker termine de calcular `clave`; retorna la entrada o None si se agotó el tiempo"""
+    limite = time.monotonic() + AGREGADOS_ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            return entrada
+        if cache.get(clave_lock) is None:
+            # El otro worker falló sin guardar nada
+            return None
+    return None
+
+
+def cachear_con_revalidacion(ambitos=(), publico=True):
+    """
+    Decorador stale-while-revalidate para vistas de agregados costosos.
+
+    Una entrada vencida (por tiempo o porque cambió la versión de algún ámbito)
+    se sigue sirviendo mientras un único worker la recalcula en segundo plano.
+    Con la cache vacía, el primero que toma el lock calcula y el resto espera
+    su resultado hasta AGREGADOS_ESPERA_MAXIMA en lugar de repetir las mismas
+    consultas; pasado ese tiempo lo calcula cada uno. El lock vive en la
+    cache, por lo que coordina hilos y procesos si la cache es compartida (Redis).
+
+    La clave no incluye al usuario: solo sirve para vistas cuya respuesta no
+    depende de quién la pide (con publico=False no se agregan validadores HTTP).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(vista, request, *args, **kwargs):
+            clave = construir_clave_respuesta(
+                f'swr:{type(vista).__name__}.{func.__name__}', [],
+                (sorted(request.query_params.items()), sorted(kwargs.items())),
+            )
+            clave_lock = f'lock:{clave}'
+            versiones = obtener_versiones(list(ambitos)) if ambitos else []
+            generar = lambda: func(vista, request, *args, **kwargs)
+
+            entrada = cache.get(clave)
+            if entrada is None:
+                if cache.add(clave_lock, 1, AGREGADOS_LOCK_TIMEOUT):
+                    response, entrada = _recalcular(clave, clave_lock, versiones, generar)
+                    if entrada is None:
+                        return response
+                else:
+                    entrada = _esperar_entrada(clave, clave_lock)
+                    if entrada is None:
+                        return generar()
+            else:
+                _, versiones_entrada, generado = entrada
+                vencida = versiones_entrada != versiones or time.time() - generado > AGREGADOS_FRESCURA
+                if vencida and cache.add(clave_lock, 1, AGREGADOS_LOCK_TIMEOUT):
+                    copia, request_copia = _contexto_separado(vista, request, args, kwargs)
+                    _recalcular_en_segundo_plano(
+                        clave, clave_lock, versiones, lambda: func(copia, request_copia, *args, **kwargs)
+                    )
+
+            data, _, generado = entrada
+            response = Response(data)
+            if publico:
+                modificado = int(generado)
+                etag = _etag(f'{clave}:{generado}', request)
+                no_modificado = get_conditional_response(request, etag=etag, last_modified=modificado)
+                if no_modificado is not None:
+                    response = no_modificado
+                _aplicar_validadores(response, etag, modificado)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from diarioback.models import RankingContenido, actualizar_rankings
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los rankings materializados de contenido (día, semana e histórico) por categoría'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamano', type=int, default=RankingContenido.TAMANO,
+            help='Cantidad de posiciones a guardar por ranking'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        filas = actualizar_rankings(options['tamano'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rankings actualizados: {filas} posiciones en {time.monotonic() - inicio:.2f}s')
+        )
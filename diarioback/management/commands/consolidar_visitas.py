@@ -0,0 +1,48 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from diarioback.models import ContenidoVisita, consolidar_visitas, purgar_visitas
+from diarioback.particiones import crear_particiones, esta_particionada, particionar
+
+
+class Command(BaseCommand):
+    help = (
+        'Consolida las visitas crudas en ContenidoVisitaDiaria y borra las que quedan fuera de la '
+        'ventana de retención (VISITAS_RETENCION_DIAS). En PostgreSQL mantiene las particiones mensuales.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde', type=date.fromisoformat,
+            help='Recalcular desde este día (YYYY-MM-DD) en lugar de seguir desde el último consolidado'
+        )
+        parser.add_argument('--retencion', type=int, help='Días de visitas crudas a conservar')
+        parser.add_argument('--lote', type=int, help='Filas por DELETE al purgar')
+        parser.add_argument('--sin-purgar', action='store_true', help='Solo consolidar')
+        parser.add_argument(
+            '--particionar', action='store_true',
+            help='Convertir la tabla de visitas en una tabla particionada por mes (solo PostgreSQL, una vez)'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        if options['particionar']:
+            if particionar(ContenidoVisita):
+                self.stdout.write(self.style.SUCCESS('Tabla de visitas particionada por mes'))
+            else:
+                self.stdout.write(self.style.WARNING('La base no es PostgreSQL o la tabla ya está particionada'))
+        elif esta_particionada(ContenidoVisita):
+            for nombre in crear_particiones(ContenidoVisita):
+                self.stdout.write(f'Partición creada: {nombre}')
+
+        filas = consolidar_visitas(options['desde'])
+        self.stdout.write(f'Días consolidados: {filas} filas')
+
+        if not options['sin_purgar']:
+            borradas, particiones = purgar_visitas(options['retencion'], options['lote'])
+            self.stdout.write(f'Visitas crudas borradas: {borradas} filas y {particiones} particiones')
+
+        self.stdout.write(self.style.SUCCESS(f'Visitas consolidadas en {time.monotonic() - inicio:.2f}s'))
@@ -0,0 +1,156 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from diarioback.models import (
+    Contenido, ContenidoVisita, EstadoPublicacion, ProductoMadeInArg, Suscriptor,
+    TiendaMadeInArg, Trabajador
+)
+
+
+class Rollback(Exception):
+    """Se lanza para descartar los datos sembrados y los índices eliminados"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra el plan de ejecución y el tiempo de las consultas públicas más frecuentes, '
+        'con y sin los índices de los modelos, sobre un dataset sembrado. Todo se ejecuta '
+        'dentro de una transacción que se descarta al terminar.'
+    )
+
+    MODELOS_CON_INDICES = (Contenido, ContenidoVisita, TiendaMadeInArg, ProductoMadeInArg, Suscriptor)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contenidos', type=int, default=20000, help='Contenidos a sembrar')
+        parser.add_argument('--visitas', type=int, default=50000, help='Visitas a sembrar')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Ejecuciones por consulta para medir')
+        parser.add_argument('--sin-comparar', action='store_true', help='No medir sin índices')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._sembrar(options['contenidos'], options['visitas'])
+                self._medir('CON ÍNDICES', options['repeticiones'])
+                if not options['sin_comparar']:
+                    self._eliminar_indices()
+                    self._medir('SIN ÍNDICES', options['repeticiones'])
+                raise Rollback()
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('Datos de prueba descartados'))
+
+    def _consultas(self):
+        """Formas reales de las consultas públicas (ver ContenidoViewSet y MadeInArg)"""
+        publicados = Contenido.objects.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
+        contenido = publicados.order_by('-pk').first()
+        hace_5_minutos = timezone.now() - timedelta(minutes=5)
+        return {
+            'feed de categoría': publicados.filter(categoria='news').order_by('-fecha_publicacion', '-id')[:12],
+            'recientes': publicados.order_by('-fecha_publicacion')[:10],
+            'destacados de categoría': publicados.filter(categoria='news').order_by('-contador_visitas_total')[:12],
+            'más leídas': publicados.order_by('-contador_visitas_total')[:10],
+            'más vistas de la semana': publicados.filter(contador_visitas__gt=0).order_by('-contador_visitas')[:10],
+            'último número de issue': Contenido.objects.filter(categoria='issues').order_by('-numero_issue')[:1],
+            # Solo con VISITAS_DEDUPLICACION_EN_BASE
+            'visita reciente por IP': ContenidoVisita.objects.filter(
+                contenido_id=contenido.pk if contenido else 0,
+                ip_address='10.0.0.1', fecha__gte=hace_5_minutos
+            )[:1],
+            'productos por categoría': ProductoMadeInArg.objects.filter(
+                categoria='calzado', activo=True, tienda__activa=True
+            ).order_by('-fecha_creacion')[:8],
+            'tiendas activas': TiendaMadeInArg.objects.filter(activa=True).order_by('-fecha_creacion')[:12],
+            'suscriptores activos': Suscriptor.objects.filter(activo=True)[:100],
+        }
+
+    def _medir(self, titulo, repeticiones):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n==================== {titulo} ===================='))
+        for nombre, queryset in self._consultas().items():
+            sql, params = queryset.query.sql_with_params()
+            # El comentario distingue cada fase: SQLite reutiliza el plan de sentencias ya preparadas
+            sql = f'/* {titulo} */ {sql}'
+
+            with connection.cursor() as cursor:
+                inicio = time.perf_counter()
+                for _ in range(repeticiones):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                promedio = (time.perf_counter() - inicio) / repeticiones * 1000
+
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                plan = '\n'.join(str(fila[-1]) for fila in cursor.fetchall())
+
+            self.stdout.write(self.style.SQL_TABLE(f'\n{nombre}: {promedio:.2f} ms'))
+            self.stdout.write(plan)
+
+    def _eliminar_indices(self):
+        """Elimina los índices declarados en Meta.indexes (se restauran con el rollback)"""
+        # DROP INDEX directo: el schema editor de SQLite no se puede usar dentro de una transacción
+        with connection.cursor() as cursor:
+            for modelo in self.MODELOS_CON_INDICES:
+                for indice in modelo._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(indice.name)}')
+
+    def _sembrar(self, cantidad_contenidos, cantidad_visitas):
+        self.stdout.write(f'Sembrando {cantidad_contenidos} contenidos y {cantidad_visitas} visitas...')
+        estados = [
+            EstadoPublicacion.objects.get_or_create(nombre_estado=nombre)[0]
+            for nombre, _ in EstadoPublicacion.ESTADO_CHOICES
+        ]
+        user = User.objects.create_user(username=f'benchmark_{int(time.time())}')
+        autor = Trabajador.objects.create(
+            user=user, nombre='Bench', apellido='Mark', correo='bench@example.com',
+            foto_perfil='https://example.com/perfil.png'
+        )
+
+        hoy = timezone.now()
+        categorias = [valor for valor, _ in Contenido.CATEGORIA_CHOICES]
+        contenidos = Contenido.objects.bulk_create([
+            Contenido(
+                categoria=random.choice(categorias),
+                titulo=f'Contenido {i}',
+                autor=autor,
+                # La mayoría publicado, como en producción
+                estado=estados[2] if random.random() < 0.8 else random.choice(estados),
+                fecha_publicacion=(hoy - timedelta(days=random.randint(0, 3650))).date(),
+                numero_issue=i,
+                contador_visitas=random.randint(0, 500),
+                contador_visitas_total=random.randint(0, 50000),
+                ultima_actualizacion_contador=hoy - timedelta(days=random.randint(0, 30)),
+            )
+            for i in range(cantidad_contenidos)
+        ], batch_size=1000)
+
+        ContenidoVisita.objects.bulk_create([
+            ContenidoVisita(
+                contenido=random.choice(contenidos),
+                ip_address=f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}'
+            )
+            for _ in range(cantidad_visitas)
+        ], batch_size=1000)
+
+        tiendas = TiendaMadeInArg.objects.bulk_create([
+            TiendaMadeInArg(titulo=f'Tienda {i}', subtitulo='Sub', creado_por=autor, activa=random.random() < 0.9)
+            for i in range(max(1, cantidad_contenidos // 20))
+        ], batch_size=1000)
+        ProductoMadeInArg.objects.bulk_create([
+            ProductoMadeInArg(
+                tienda=random.choice(tiendas), nombre=f'Producto {i}',
+                categoria=random.choice(ProductoMadeInArg.CATEGORIA_CHOICES)[0],
+                link_producto='https://example.com', activo=random.random() < 0.9
+            )
+            for i in range(max(1, cantidad_contenidos // 4))
+        ], batch_size=1000)
+        Suscriptor.objects.bulk_create([
+            Suscriptor(nombre=f'Suscriptor {i}', email=f'bench{i}@example.com', activo=random.random() < 0.7)
+            for i in range(max(1, cantidad_contenidos // 2))
+        ], batch_size=1000)
+
+        # Estadísticas actualizadas para que el planner elija como en producción
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from diarioback.snapshots import SNAPSHOTS_ROOT, exportar_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Pre-renderiza los feeds públicos y el detalle del contenido publicado como archivos JSON estáticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--destino', default=SNAPSHOTS_ROOT,
+            help='Directorio donde se escriben los snapshots'
+        )
+        parser.add_argument(
+            '--contenido', type=int, action='append', dest='contenidos',
+            help='Regenerar solo el detalle de estos contenidos (se puede repetir)'
+        )
+        parser.add_argument(
+            '--sin-detalles', action='store_true',
+            help='Exportar solo los feeds, sin el detalle de cada contenido'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        escritos = exportar_snapshots(
+            destino=options['destino'],
+            contenidos=options['contenidos'],
+            incluir_detalles=not options['sin_detalles'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshots exportados: {escritos} archivos en {options["destino"]} '
+            f'({time.monotonic() - inicio:.2f}s)'
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from diarioback.cache_utils import invalidar_categorias, invalidar_contenidos
+from diarioback.models import Contenido, slug_base, slug_disponible, slugs_ocupados
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera el slug del contenido que todavía no lo tiene, por lotes con bulk_update. '
+        'Cada lote se confirma por separado: si se interrumpe, al volver a ejecutarlo continúa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=500,
+            help='Cantidad de filas por lote'
+        )
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        pendientes = Contenido.objects.filter(slug__isnull=True).order_by('pk').only('id', 'titulo', 'categoria')
+        total = pendientes.count()
+        procesados = 0
+        categorias = set()
+        inicio = time.monotonic()
+
+        self.stdout.write(f'Contenido sin slug: {total}')
+
+        while True:
+            filas = list(pendientes[:lote])
+            if not filas:
+                break
+
+            bases = [slug_base(contenido.titulo) for contenido in filas]
+            ocupados = slugs_ocupados(bases)
+            for contenido, base in zip(filas, bases):
+                contenido.slug = slug_disponible(base, ocupados)
+                ocupados.add(contenido.slug)
+
+            with transaction.atomic():
+                Contenido.objects.bulk_update(filas, ['slug'])
+
+            # bulk_update no dispara señales: se invalida el detalle cacheado a mano
+            invalidar_contenidos(*[contenido.pk for contenido in filas])
+            categorias.update(contenido.categoria for contenido in filas)
+
+            procesados += len(filas)
+            transcurrido = time.monotonic() - inicio
+            self.stdout.write(
+                f'Procesados {procesados}/{total} ({procesados / max(transcurrido, 0.001):.0f} filas/s)'
+            )
+
+        invalidar_categorias(*categorias)
+        self.stdout.write(self.style.SUCCESS(
+            f'Slugs generados: {procesados} en {time.monotonic() - inicio:.2f}s'
+        ))
@@ -0,0 +1,128 @@
+import gzip
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from diarioback.middleware import brotli
+from diarioback.models import (
+    ArtistaMadeInArg, Contenido, ContenidoImagen, EstadoPublicacion, ProductoMadeInArg,
+    TiendaMadeInArg, Trabajador
+)
+from diarioback.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+
+
+class Rollback(Exception):
+    """Se lanza para descartar los datos sembrados"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el tiempo de encode y los bytes (sin comprimir, gzip y brotli) de los payloads '
+        'de recientes y madeinarg/resumen con el JSONRenderer de DRF, orjson y MessagePack, sobre un '
+        'dataset sembrado dentro de una transacción que se descarta al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contenidos', type=int, default=100, help='Contenidos a sembrar (y a pedir en recientes)')
+        parser.add_argument('--imagenes', type=int, default=10, help='Imágenes por contenido')
+        parser.add_argument('--repeticiones', type=int, default=50, help='Encodes por payload para medir')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson no está instalado: ORJSONRenderer usa el encoder de DRF'))
+        try:
+            with transaction.atomic():
+                self._sembrar(options['contenidos'], options['imagenes'])
+                for nombre, data in self._payloads(options['contenidos']).items():
+                    self._medir(nombre, data, options['repeticiones'])
+                raise Rollback()
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('\nDatos de prueba descartados'))
+
+    def _payloads(self, limit):
+        """Ejecuta las vistas públicas y retorna el `response.data` de cada una"""
+        factory = RequestFactory()
+        recientes = reverse('contenido-recientes')
+        urls = {
+            'recientes (tarjeta)': f'{recientes}?limit={limit}',
+            'recientes (completa)': f'{recientes}?limit={limit}&vista=completa',
+            'madeinarg/resumen': reverse('madeinarg-resumen'),
+        }
+        payloads = {}
+        for nombre, url in urls.items():
+            match = resolve(url.split('?')[0])
+            payloads[nombre] = match.func(factory.get(url), *match.args, **match.kwargs).data
+        return payloads
+
+    def _medir(self, nombre, data, repeticiones):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n==================== {nombre} ===================='))
+        renderers = [('DRF json', JSONRenderer()), ('orjson', ORJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        for etiqueta, renderer in renderers:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                contenido = renderer.render(data)
+            promedio = (time.perf_counter() - inicio) / repeticiones * 1000
+            self.stdout.write(f'{etiqueta:>10}: {promedio:8.3f} ms  {len(contenido):>9} bytes')
+
+            tamanos = [f'gzip {len(gzip.compress(contenido, compresslevel=6)):>8} bytes']
+            if brotli is not None:
+                tamanos.append(f'br {len(brotli.compress(contenido, quality=5)):>8} bytes')
+            self.stdout.write(self.style.SQL_TABLE(' ' * 12 + '  '.join(tamanos)))
+
+    def _sembrar(self, cantidad, imagenes_por_contenido):
+        self.stdout.write(f'Sembrando {cantidad} contenidos con {imagenes_por_contenido} imágenes...')
+        publicado = EstadoPublicacion.objects.get_or_create(nombre_estado=EstadoPublicacion.PUBLICADO)[0]
+        user = User.objects.create_user(username=f'benchmark_{int(time.time())}')
+        autor = Trabajador.objects.create(
+            user=user, nombre='Bench', apellido='Mark', correo='bench@example.com',
+            foto_perfil='https://example.com/perfil.png'
+        )
+
+        hoy = timezone.now().date()
+        texto = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 20
+        categorias = [valor for valor, _ in Contenido.CATEGORIA_CHOICES]
+        contenidos = Contenido.objects.bulk_create([
+            Contenido(
+                categoria=random.choice(categorias), titulo=f'Contenido {i}', autor=autor,
+                estado=publicado, fecha_publicacion=hoy - timedelta(days=i), numero_issue=i,
+                subtitulo_issue=texto, contenido_news=texto,
+                portada=f'https://example.com/{i}/1.jpg', slug=f'contenido-{i}',
+            )
+            for i in range(cantidad)
+        ], batch_size=1000)
+        ContenidoImagen.objects.bulk_create([
+            ContenidoImagen(contenido=contenido, posicion=posicion, url=f'https://example.com/{contenido.pk}/{posicion}.jpg')
+            for contenido in contenidos
+            for posicion in range(1, imagenes_por_contenido + 1)
+        ], batch_size=1000)
+
+        tiendas = TiendaMadeInArg.objects.bulk_create([
+            TiendaMadeInArg(titulo=f'Tienda {i}', subtitulo='Sub', descripcion=texto, creado_por=autor)
+            for i in range(12)
+        ])
+        ProductoMadeInArg.objects.bulk_create([
+            ProductoMadeInArg(
+                tienda=random.choice(tiendas), nombre=f'Producto {i}', descripcion=texto,
+                categoria=random.choice(ProductoMadeInArg.CATEGORIA_CHOICES)[0],
+                link_producto='https://example.com', imagen='https://example.com/producto.jpg'
+            )
+            for i in range(200)
+        ])
+        ArtistaMadeInArg.objects.bulk_create([
+            ArtistaMadeInArg(
+                titulo=f'Artista {i}', subtitulo='Sub', descripcion=texto, creado_por=autor,
+                imagen_principal='https://example.com/artista.jpg', total_imagenes=1
+            )
+            for i in range(12)
+        ])
@@ -0,0 +1,195 @@
+import gzip
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tipos de contenido que vale la pena comprimir (las imágenes y archivos ya vienen comprimidos)
+TIPOS_COMPRIMIBLES = ('application/json', 'application/msgpack', 'application/javascript', 'text/')
+
+_codificacion_re = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def _codificaciones_aceptadas(cabecera):
+    """Retorna las codificaciones de Accept-Encoding con q > 0"""
+    aceptadas = set()
+    for parte in cabecera.split(','):
+        match = _codificacion_re.match(parte)
+        if not match:
+            continue
+        try:
+            calidad = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        if calidad > 0:
+            aceptadas.add(match.group(1).lower())
+    return aceptadas
+
+
+class CompresionMiddleware:
+    """
+    Comprime las respuestas de texto/JSON con brotli (si está instalado) o gzip
+    según el Accept-Encoding del cliente.
+
+    Las respuestas menores a COMPRESION_TAMANO_MINIMO se envían sin comprimir:
+    por debajo de ese tamaño el costo de CPU no compensa los bytes ahorrados.
+
+    Solo se comprimen respuestas públicas a GET/HEAD (ver _es_publica): una
+    respuesta que mezcla secretos con datos que el atacante controla puede
+    filtrar esos secretos por el tamaño comprimido (BREACH).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.tamano_minimo = getattr(settings, 'COMPRESION_TAMANO_MINIMO', 1024)
+        self.nivel_gzip = getattr(settings, 'COMPRESION_NIVEL_GZIP', 6)
+        self.nivel_brotli = getattr(settings, 'COMPRESION_NIVEL_BROTLI', 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.comprimir(request, response)
+
+    def comprimir(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(TIPOS_COMPRIMIBLES):
+            return response
+
+        # La respuesta depende del Accept-Encoding aunque esta vez no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.status_code != 200 or len(response.content) < self.tamano_minimo:
+            return response
+        if not self._es_publica(request, response):
+            return response
+
+        aceptadas = _codificaciones_aceptadas(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in aceptadas:
+            codificacion = 'br'
+            comprimido = brotli.compress(response.content, quality=self.nivel_brotli)
+        elif 'gzip' in aceptadas:
+            codificacion = 'gzip'
+            comprimido = gzip.compress(response.content, compresslevel=self.nivel_gzip, mtime=0)
+        else:
+            return response
+
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacion
+
+        # El cuerpo ya no es idéntico byte a byte: el ETag pasa a ser débil (como en GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def _es_publica(self, request, response):
+        """Lecturas anónimas cuya respuesta no setea cookies ni es privada (tokens JWT, sesión, admin)"""
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if 'HTTP_AUTHORIZATION' in request.META or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        if response.cookies or 'private' in response.get('Cache-Control', ''):
+            return False
+        return True
+
+
+# ==================== PRESUPUESTO DE CONSULTAS ====================
+
+logger = logging.getLogger(__name__)
+
+# Listas de placeholders de un IN (...): un IN de 3 ids y uno de 30 son la misma consulta
+_lista_placeholders_re = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def plantilla_sql(sql):
+    """Normaliza el SQL para agrupar las ejecuciones de una misma consulta con distintos parámetros"""
+    return _lista_placeholders_re.sub('(%s, ...)', sql)
+
+
+class RegistroConsultas:
+    """execute_wrapper que cuenta las consultas de un request, su tiempo y cuántas veces se repite cada plantilla"""
+
+    def __init__(self):
+        self.total = 0
+        self.tiempo = 0.0
+        self.plantillas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.total += 1
+            self.plantillas[plantilla_sql(sql)] += 1
+
+    def repetidas(self, limite):
+        """Plantillas ejecutadas más de `limite` veces (N+1), de la más repetida a la menos"""
+        return [(sql, veces) for sql, veces in self.plantillas.most_common() if veces > limite]
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Cuenta las consultas SQL de cada request y detecta las que se repiten (N+1).
+
+    Si se supera PRESUPUESTO_CONSULTAS o alguna consulta se repite más de
+    PRESUPUESTO_CONSULTAS_REPETIDAS veces, se registra en el log; con
+    PRESUPUESTO_CONSULTAS_MODO = 'rechazar' además los GET responden 500 (para
+    detectarlo en CI/staging). Con PRESUPUESTO_CONSULTAS_CABECERAS los conteos
+    se exponen en las cabeceras X-Consultas-*.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limite = getattr(settings, 'PRESUPUESTO_CONSULTAS', 30)
+        self.limite_repetidas = getattr(settings, 'PRESUPUESTO_CONSULTAS_REPETIDAS', 5)
+        self.rechazar = getattr(settings, 'PRESUPUESTO_CONSULTAS_MODO', 'log') == 'rechazar'
+        self.cabeceras = getattr(settings, 'PRESUPUESTO_CONSULTAS_CABECERAS', settings.DEBUG)
+        self.excluir = [re.compile(patron) for patron in getattr(settings, 'PRESUPUESTO_CONSULTAS_EXCLUIR', [])]
+
+    def __call__(self, request):
+        if any(patron.search(request.path) for patron in self.excluir):
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        with connection.execute_wrapper(registro):
+            response = self.get_response(request)
+
+        repetidas = registro.repetidas(self.limite_repetidas)
+        if registro.total > self.limite or repetidas:
+            logger.warning(
+                'Presupuesto de consultas excedido en %s %s: %d consultas (límite %d)',
+                request.method, request.get_full_path(), registro.total, self.limite
+            )
+            for sql, veces in repetidas:
+                logger.warning('N+1: %d veces: %s', veces, sql[:300])
+
+            # Solo se rechazan lecturas: una escritura ya quedó aplicada. El SQL queda en el
+            # log; al cliente solo van los conteos para no exponer el esquema
+            if self.rechazar and request.method in ('GET', 'HEAD'):
+                response = JsonResponse({
+                    'error': 'Presupuesto de consultas excedido',
+                    'consultas': registro.total,
+                    'limite': self.limite,
+                    'repetidas': len(repetidas),
+                }, status=500)
+
+        if self.cabeceras:
+            response['X-Consultas-SQL'] = str(registro.total)
+            response['X-Consultas-Tiempo-Ms'] = f'{registro.tiempo * 1000:.1f}'
+            response['X-Consultas-Repetidas'] = str(max(registro.plantillas.values(), default=0))
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0006_suscriptor_newsletter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contenido',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 00:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0007_contenido_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('todas', 'Todas'), ('editorials', 'Editorials'), ('issues', 'Issues'), ('madeinarg', 'MadeInArg'), ('news', 'News'), ('club_pompa', 'Club Pompa')], max_length=20)),
+                ('ventana', models.CharField(choices=[('dia', 'Último día'), ('semana', 'Última semana'), ('total', 'Histórico')], max_length=10)),
+                ('posicion', models.PositiveIntegerField()),
+                ('visitas', models.PositiveIntegerField(default=0)),
+                ('fecha_calculo', models.DateTimeField(default=django.utils.timezone.now)),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='diarioback.contenido')),
+            ],
+            options={
+                'ordering': ['ventana', 'categoria', 'posicion'],
+                'unique_together': {('ventana', 'categoria', 'posicion')},
+            },
+        ),
+    ]
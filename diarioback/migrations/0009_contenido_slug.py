@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 00:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0008_rankingcontenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contenido',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
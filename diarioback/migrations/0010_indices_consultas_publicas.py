@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0009_contenido_slug'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['categoria', 'estado', '-fecha_publicacion'], name='contenido_cat_est_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['estado', '-fecha_publicacion'], name='contenido_est_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['categoria', 'estado', '-contador_visitas_total'], name='contenido_cat_est_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['estado', '-contador_visitas_total'], name='contenido_est_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['estado', '-contador_visitas'], name='contenido_est_semana_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(condition=models.Q(('categoria', 'issues')), fields=['numero_issue'], name='contenido_numero_issue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenidovisita',
+            index=models.Index(fields=['contenido', 'ip_address', 'fecha'], name='visita_contenido_ip_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productomadeinarg',
+            index=models.Index(fields=['categoria', 'activo', 'tienda'], name='producto_cat_activo_tienda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suscriptor',
+            index=models.Index(fields=['activo'], name='suscriptor_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiendamadeinarg',
+            index=models.Index(fields=['activa', '-fecha_creacion'], name='tienda_activa_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+POSICIONES = range(1, 31)
+TIPOS = ('imagen', 'backstage')
+
+
+def copiar_imagenes(apps, schema_editor):
+    """Pasa las columnas imagen_N / backstage_N (o su archivo local) a ContenidoImagen"""
+    Contenido = apps.get_model('diarioback', 'Contenido')
+    ContenidoImagen = apps.get_model('diarioback', 'ContenidoImagen')
+
+    columnas = ['id'] + [
+        f'{tipo}_{i}{sufijo}' for tipo in TIPOS for i in POSICIONES for sufijo in ('', '_local')
+    ]
+    imagenes, portadas = [], []
+    for fila in Contenido.objects.values(*columnas).iterator(chunk_size=500):
+        portada = None
+        for tipo in TIPOS:
+            for i in POSICIONES:
+                url = fila[f'{tipo}_{i}']
+                if not url and fila[f'{tipo}_{i}_local']:
+                    url = default_storage.url(fila[f'{tipo}_{i}_local'])
+                if url:
+                    imagenes.append(ContenidoImagen(contenido_id=fila['id'], tipo=tipo, posicion=i, url=url))
+                    if tipo == 'imagen' and portada is None:
+                        portada = url
+        if portada:
+            portadas.append(Contenido(pk=fila['id'], portada=portada))
+
+        if len(imagenes) >= 1000:
+            ContenidoImagen.objects.bulk_create(imagenes)
+            imagenes = []
+
+    ContenidoImagen.objects.bulk_create(imagenes)
+    Contenido.objects.bulk_update(portadas, ['portada'], batch_size=500)
+
+
+def restaurar_columnas(apps, schema_editor):
+    """Vuelve a escribir las primeras 30 posiciones de cada tipo en sus columnas"""
+    Contenido = apps.get_model('diarioback', 'Contenido')
+    ContenidoImagen = apps.get_model('diarioback', 'ContenidoImagen')
+
+    valores = {}
+    for imagen in ContenidoImagen.objects.filter(posicion__lte=30).iterator(chunk_size=1000):
+        valores.setdefault(imagen.contenido_id, {})[f'{imagen.tipo}_{imagen.posicion}'] = imagen.url
+
+    for contenido_id, campos in valores.items():
+        Contenido.objects.filter(pk=contenido_id).update(**campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0010_indices_consultas_publicas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contenido',
+            name='portada',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+        migrations.CreateModel(
+            name='ContenidoImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('imagen', 'Imagen'), ('backstage', 'Backstage')], default='imagen', max_length=10)),
+                ('posicion', models.PositiveIntegerField()),
+                ('url', models.URLField(max_length=500)),
+                ('ancho', models.PositiveIntegerField(blank=True, null=True)),
+                ('alto', models.PositiveIntegerField(blank=True, null=True)),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imagenes', to='diarioback.contenido')),
+            ],
+            options={
+                'verbose_name': 'Imagen de Contenido',
+                'verbose_name_plural': 'Imágenes de Contenido',
+                'ordering': ['tipo', 'posicion'],
+                'unique_together': {('contenido', 'tipo', 'posicion')},
+            },
+        ),
+        migrations.RunPython(copiar_imagenes, restaurar_columnas),
+    ] + [
+        migrations.RemoveField(model_name='contenido', name=f'{tipo}_{i}{sufijo}')
+        for tipo in TIPOS for i in POSICIONES for sufijo in ('', '_local')
+    ]
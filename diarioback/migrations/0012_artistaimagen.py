@@ -0,0 +1,88 @@
+# Generated by Django 5.2 on 2026-10-18 01:41
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+POSICIONES = range(1, 21)
+
+
+def copiar_galerias(apps, schema_editor):
+    """Pasa las columnas imagen_N (o su archivo local) a ArtistaImagen y calcula el resumen"""
+    ArtistaMadeInArg = apps.get_model('diarioback', 'ArtistaMadeInArg')
+    ArtistaImagen = apps.get_model('diarioback', 'ArtistaImagen')
+
+    columnas = ['id'] + [f'imagen_{i}{sufijo}' for i in POSICIONES for sufijo in ('', '_local')]
+    imagenes, resumenes = [], []
+    for fila in ArtistaMadeInArg.objects.values(*columnas).iterator(chunk_size=500):
+        urls = []
+        for i in POSICIONES:
+            url = fila[f'imagen_{i}']
+            if not url and fila[f'imagen_{i}_local']:
+                url = default_storage.url(fila[f'imagen_{i}_local'])
+            if url:
+                imagenes.append(ArtistaImagen(artista_id=fila['id'], posicion=i, url=url))
+                urls.append(url)
+        if urls:
+            resumenes.append(ArtistaMadeInArg(pk=fila['id'], imagen_principal=urls[0], total_imagenes=len(urls)))
+
+    ArtistaImagen.objects.bulk_create(imagenes, batch_size=1000)
+    ArtistaMadeInArg.objects.bulk_update(resumenes, ['imagen_principal', 'total_imagenes'], batch_size=500)
+
+
+def restaurar_columnas(apps, schema_editor):
+    """Vuelve a escribir las primeras 20 posiciones en sus columnas"""
+    ArtistaMadeInArg = apps.get_model('diarioback', 'ArtistaMadeInArg')
+    ArtistaImagen = apps.get_model('diarioback', 'ArtistaImagen')
+
+    valores = {}
+    for imagen in ArtistaImagen.objects.filter(posicion__lte=20).iterator(chunk_size=1000):
+        valores.setdefault(imagen.artista_id, {})[f'imagen_{imagen.posicion}'] = imagen.url
+
+    for artista_id, campos in valores.items():
+        ArtistaMadeInArg.objects.filter(pk=artista_id).update(**campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0011_contenidoimagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artistamadeinarg',
+            name='imagen_principal',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='artistamadeinarg',
+            name='total_imagenes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ArtistaImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveIntegerField()),
+                ('url', models.URLField(max_length=500)),
+                ('ancho', models.PositiveIntegerField(blank=True, null=True)),
+                ('alto', models.PositiveIntegerField(blank=True, null=True)),
+                ('artista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imagenes', to='diarioback.artistamadeinarg')),
+            ],
+            options={
+                'verbose_name': 'Imagen de Artista',
+                'verbose_name_plural': 'Imágenes de Artistas',
+                'ordering': ['posicion'],
+                'unique_together': {('artista', 'posicion')},
+            },
+        ),
+        migrations.RunPython(copiar_galerias, restaurar_columnas),
+        migrations.AddIndex(
+            model_name='artistamadeinarg',
+            index=models.Index(fields=['activo', '-fecha_creacion'], name='artista_activo_fecha_idx'),
+        ),
+    ] + [
+        migrations.RemoveField(model_name='artistamadeinarg', name=f'imagen_{i}{sufijo}')
+        for i in POSICIONES for sufijo in ('', '_local')
+    ]
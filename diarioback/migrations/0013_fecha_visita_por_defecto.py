@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 02:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0012_artistaimagen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contenidovisita',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
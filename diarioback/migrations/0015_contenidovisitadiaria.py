@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0013_fecha_visita_por_defecto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContenidoVisitaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('visitas', models.PositiveIntegerField(default=0)),
+                ('unicos', models.PositiveIntegerField(default=0)),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitas_diarias', to='diarioback.contenido')),
+            ],
+            options={
+                'ordering': ['-fecha', 'contenido'],
+                'indexes': [models.Index(fields=['fecha'], name='diarioback__fecha_2139fe_idx')],
+                'unique_together': {('contenido', 'fecha')},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 03:21
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def llenar_visitas_por_hora(apps, schema_editor):
+    """Arma los buckets por hora de los últimos 30 días con las visitas crudas existentes"""
+    ContenidoVisita = apps.get_model('diarioback', 'ContenidoVisita')
+    ContenidoVisitaHora = apps.get_model('diarioback', 'ContenidoVisitaHora')
+
+    conteos = (
+        ContenidoVisita.objects.filter(fecha__gte=timezone.now() - timedelta(days=31))
+        .annotate(bucket=TruncHour('fecha')).values('contenido_id', 'bucket')
+        .annotate(visitas=Count('id')).order_by()
+        .values_list('contenido_id', 'bucket', 'visitas')
+    )
+    ContenidoVisitaHora.objects.bulk_create([
+        ContenidoVisitaHora(contenido_id=contenido_id, hora=hora, visitas=visitas)
+        for contenido_id, hora, visitas in conteos.iterator(chunk_size=2000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diarioback', '0015_contenidovisitadiaria'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rankingcontenido',
+            name='ventana',
+            field=models.CharField(choices=[('dia', 'Último día'), ('semana', 'Última semana'), ('mes', 'Último mes'), ('total', 'Histórico')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ContenidoVisitaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('visitas', models.PositiveIntegerField(default=0)),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitas_por_hora', to='diarioback.contenido')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hora'], name='diarioback__hora_599207_idx')],
+                'unique_together': {('contenido', 'hora')},
+            },
+        ),
+        migrations.RunPython(llenar_visitas_por_hora, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,27 @@
+import atexit
 import os
+import re
+import threading
 import base64
 import time
 import random
 import string
 import uuid
 import requests
-from datetime import timedelta
-from django.db import models
+from collections import Counter
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection, models, transaction
 from django.contrib.auth.models import User
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
 from django.utils import timezone
-from django.db.models import Q, Count, Max
+from django.utils.text import slugify
+from django.db.models import Q, Count, Max, Sum, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
 
 def validate_positive(value):
     if value <= 0:
@@ -185,9 +195,62 @@ class EstadoPublicacion(models.Model):
         default=BORRADOR,
     )
 
+    # Registro nombre -> id compartido por el proceso; los estados casi nunca cambian.
+    # La versión del ámbito AMBITO_ESTADOS en la cache avisa a los demás workers de un cambio
+    REGISTRO_TTL = 300
+    _registro = None
+    _registro_cargado = 0
+    _registro_version = None
+
     def __str__(self):
         return self.get_nombre_estado_display()
 
+    @classmethod
+    def registro(cls):
+        """Retorna el diccionario {nombre_estado: id}, recargándolo si cambió su versión o venció el TTL"""
+        registro = cls._registro
+        # Sin versión en la cache (nunca se invalidó o se desalojó) queda el TTL como respaldo
+        version = version_actual(AMBITO_ESTADOS)
+        if (
+            registro is None or (version is not None and version != cls._registro_version)
+            or time.monotonic() - cls._registro_cargado > cls.REGISTRO_TTL
+        ):
+            registro = {}
+            # Ante nombres repetidos prevalece el id más bajo
+            for nombre, pk in cls.objects.order_by('-pk').values_list('nombre_estado', 'id'):
+                registro[nombre] = pk
+            cls._registro = registro
+            cls._registro_cargado = time.monotonic()
+            cls._registro_version = version
+        return registro
+
+    @classmethod
+    def limpiar_registro(cls):
+        """Descarta el registro en este proceso y en los demás workers"""
+        cls._registro = None
+        invalidar_ambitos(AMBITO_ESTADOS)
+
+    @classmethod
+    def id_de(cls, nombre):
+        """Retorna el id del estado o None si no existe"""
+        return cls.registro().get(nombre)
+
+    @classmethod
+    def nombre_de(cls, pk):
+        """Retorna el nombre del estado con ese id o None si no existe"""
+        for nombre, id_estado in cls.registro().items():
+            if id_estado == pk:
+                return nombre
+        return None
+
+    @classmethod
+    def filtro(cls, nombre, campo='estado'):
+        """Q que filtra por el id del estado sin join; vacío si el estado no existe"""
+        pk = cls.id_de(nombre)
+        if pk is None:
+            return Q(pk__in=[])
+        return Q(**{f'{campo}_id': pk})
+
 
 # MODELO BASE PARA CONTENIDO
 class ContenidoBase(models.Model):
@@ -206,68 +269,6 @@ class ContenidoBase(models.Model):
     fecha_publicacion = models.DateField()
     estado = models.ForeignKey('EstadoPublicacion', on_delete=models.SET_NULL, null=True)
     
-    # Campos de imágenes (hasta 30 por contenido)
-    imagen_1 = models.URLField(blank=True, null=True)
-    imagen_1_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_2 = models.URLField(blank=True, null=True)
-    imagen_2_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_3 = models.URLField(blank=True, null=True)
-    imagen_3_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_4 = models.URLField(blank=True, null=True)
-    imagen_4_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_5 = models.URLField(blank=True, null=True)
-    imagen_5_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_6 = models.URLField(blank=True, null=True)
-    imagen_6_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_7 = models.URLField(blank=True, null=True)
-    imagen_7_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_8 = models.URLField(blank=True, null=True)
-    imagen_8_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_9 = models.URLField(blank=True, null=True)
-    imagen_9_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_10 = models.URLField(blank=True, null=True)
-    imagen_10_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_11 = models.URLField(blank=True, null=True)
-    imagen_11_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_12 = models.URLField(blank=True, null=True)
-    imagen_12_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_13 = models.URLField(blank=True, null=True)
-    imagen_13_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_14 = models.URLField(blank=True, null=True)
-    imagen_14_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_15 = models.URLField(blank=True, null=True)
-    imagen_15_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_16 = models.URLField(blank=True, null=True)
-    imagen_16_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_17 = models.URLField(blank=True, null=True)
-    imagen_17_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_18 = models.URLField(blank=True, null=True)
-    imagen_18_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_19 = models.URLField(blank=True, null=True)
-    imagen_19_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_20 = models.URLField(blank=True, null=True)
-    imagen_20_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_21 = models.URLField(blank=True, null=True)
-    imagen_21_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_22 = models.URLField(blank=True, null=True)
-    imagen_22_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_23 = models.URLField(blank=True, null=True)
-    imagen_23_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_24 = models.URLField(blank=True, null=True)
-    imagen_24_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_25 = models.URLField(blank=True, null=True)
-    imagen_25_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_26 = models.URLField(blank=True, null=True)
-    imagen_26_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_27 = models.URLField(blank=True, null=True)
-    imagen_27_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_28 = models.URLField(blank=True, null=True)
-    imagen_28_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_29 = models.URLField(blank=True, null=True)
-    imagen_29_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    imagen_30 = models.URLField(blank=True, null=True)
-    imagen_30_local = models.ImageField(upload_to='images/', blank=True, null=True)
-    
     # Contadores de visitas
     contador_visitas = models.PositiveIntegerField(default=0)
     contador_visitas_total = models.PositiveIntegerField(default=0)
@@ -275,40 +276,6 @@ class ContenidoBase(models.Model):
     
     class Meta:
         abstract = True
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        images_updated = self._process_images()
-        if images_updated:
-            super().save()
-    
-    def _process_images(self):
-        """Procesa todas las imágenes, sube a ImgBB y actualiza URLs"""
-        images_updated = False
-        
-        for i in range(1, 31):
-            local_field_name = f'imagen_{i}_local'
-            url_field_name = f'imagen_{i}'
-            
-            local_field = getattr(self, local_field_name)
-            if local_field and hasattr(local_field, 'file'):
-                imgur_url = upload_to_imgbb(local_field)
-                if imgur_url:
-                    setattr(self, url_field_name, imgur_url)
-                    setattr(self, local_field_name, None)
-                    images_updated = True
-                    print(f"Imagen {i} subida a ImgBB: {imgur_url}")
-        
-        return images_updated
-    
-    def get_image_urls(self):
-        """Retorna una lista de todas las URLs de imágenes disponibles"""
-        image_urls = []
-        for i in range(1, 31):
-            image_field = getattr(self, f'imagen_{i}')
-            if image_field:
-                image_urls.append(image_field)
-        return image_urls
 
 
 # MODELO PARA ESPACIOS DE REFERENCIA
@@ -351,68 +318,6 @@ class Contenido(ContenidoBase):
     frase_final_issue = models.TextField(blank=True, null=True, help_text="Solo para Issues")
     video_youtube_issue = models.URLField(blank=True, null=True, help_text="Solo para Issues")
     
-    # Imágenes de backstage para Issues (30 adicionales)
-    backstage_1 = models.URLField(blank=True, null=True)
-    backstage_1_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_2 = models.URLField(blank=True, null=True)
-    backstage_2_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_3 = models.URLField(blank=True, null=True)
-    backstage_3_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_4 = models.URLField(blank=True, null=True)
-    backstage_4_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_5 = models.URLField(blank=True, null=True)
-    backstage_5_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_6 = models.URLField(blank=True, null=True)
-    backstage_6_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_7 = models.URLField(blank=True, null=True)
-    backstage_7_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_8 = models.URLField(blank=True, null=True)
-    backstage_8_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_9 = models.URLField(blank=True, null=True)
-    backstage_9_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_10 = models.URLField(blank=True, null=True)
-    backstage_10_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_11 = models.URLField(blank=True, null=True)
-    backstage_11_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_12 = models.URLField(blank=True, null=True)
-    backstage_12_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_13 = models.URLField(blank=True, null=True)
-    backstage_13_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_14 = models.URLField(blank=True, null=True)
-    backstage_14_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_15 = models.URLField(blank=True, null=True)
-    backstage_15_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_16 = models.URLField(blank=True, null=True)
-    backstage_16_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_17 = models.URLField(blank=True, null=True)
-    backstage_17_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_18 = models.URLField(blank=True, null=True)
-    backstage_18_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_19 = models.URLField(blank=True, null=True)
-    backstage_19_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_20 = models.URLField(blank=True, null=True)
-    backstage_20_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_21 = models.URLField(blank=True, null=True)
-    backstage_21_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_22 = models.URLField(blank=True, null=True)
-    backstage_22_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_23 = models.URLField(blank=True, null=True)
-    backstage_23_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_24 = models.URLField(blank=True, null=True)
-    backstage_24_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_25 = models.URLField(blank=True, null=True)
-    backstage_25_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_26 = models.URLField(blank=True, null=True)
-    backstage_26_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_27 = models.URLField(blank=True, null=True)
-    backstage_27_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_28 = models.URLField(blank=True, null=True)
-    backstage_28_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_29 = models.URLField(blank=True, null=True)
-    backstage_29_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    backstage_30 = models.URLField(blank=True, null=True)
-    backstage_30_local = models.ImageField(upload_to='backstage/', blank=True, null=True)
-    
     # Campos específicos para MADEINARG
     subcategoria_madeinarg = models.CharField(max_length=20, choices=SUBCATEGORIAS_MADEINARG, blank=True, null=True)
     subtitulo_madeinarg = models.TextField(blank=True, null=True, help_text="Solo para MadeInArg")
@@ -423,7 +328,20 @@ class Contenido(ContenidoBase):
     contenido_news = models.TextField(blank=True, null=True, help_text="Contenido de texto para News")
     video_youtube_news = models.URLField(blank=True, null=True, help_text="Video de YouTube para News")
     
+    # Última modificación, usada para Last-Modified en las respuestas condicionales
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    # Slug para URLs amigables: se genera al crear y no cambia al editar el título
+    slug = models.SlugField(max_length=255, unique=True, null=True, blank=True)
+    
+    # Primera imagen de la galería, desnormalizada para las tarjetas de los listados
+    portada = models.URLField(max_length=500, blank=True, null=True)
+    
     def save(self, *args, **kwargs):
+        if not self.slug:
+            base = slug_base(self.titulo)
+            self.slug = slug_disponible(base, slugs_ocupados([base]))
+        
         if self.categoria == 'issues' and not self.numero_issue:
             ultimo_issue = Contenido.objects.filter(categoria='issues').aggregate(
                 Max('numero_issue')
@@ -431,39 +349,56 @@ class Contenido(ContenidoBase):
             self.numero_issue = (ultimo_issue or 0) + 1
         
         super().save(*args, **kwargs)
-        
-        if self.categoria == 'issues':
-            backstage_updated = self._process_backstage_images()
-            if backstage_updated:
-                super().save()
-    
-    def _process_backstage_images(self):
-        """Procesa las imágenes de backstage para Issues"""
-        images_updated = False
-        
-        for i in range(1, 31):
-            local_field_name = f'backstage_{i}_local'
-            url_field_name = f'backstage_{i}'
-            
-            local_field = getattr(self, local_field_name)
-            if local_field and hasattr(local_field, 'file'):
-                imgbb_url = upload_to_imgbb(local_field)
-                if imgbb_url:
-                    setattr(self, url_field_name, imgbb_url)
-                    setattr(self, local_field_name, None)
-                    images_updated = True
-                    print(f"Backstage {i} subida a ImgBB: {imgbb_url}")
-        
-        return images_updated
+    
+    def _imagenes_de(self, tipo):
+        """Imágenes de un tipo ordenadas por posición; usa el prefetch de 'imagenes' si está"""
+        return [imagen for imagen in self.imagenes.all() if imagen.tipo == tipo]
+    
+    def get_image_urls(self):
+        """Retorna una lista de todas las URLs de imágenes disponibles"""
+        return [imagen.url for imagen in self._imagenes_de(ContenidoImagen.TIPO_IMAGEN)]
     
     def get_backstage_urls(self):
         """Retorna una lista de todas las URLs de backstage disponibles"""
-        backstage_urls = []
-        for i in range(1, 31):
-            backstage_field = getattr(self, f'backstage_{i}')
-            if backstage_field:
-                backstage_urls.append(backstage_field)
-        return backstage_urls
+        return [imagen.url for imagen in self._imagenes_de(ContenidoImagen.TIPO_BACKSTAGE)]
+    
+    def imagen_en(self, tipo, posicion):
+        """URL de la imagen en esa posición o None; indexa el prefetch una sola vez por instancia"""
+        indice = self.__dict__.get('_indice_imagenes')
+        if indice is None:
+            indice = self._indice_imagenes = {
+                (imagen.tipo, imagen.posicion): imagen.url for imagen in self.imagenes.all()
+            }
+        return indice.get((tipo, posicion))
+    
+    def guardar_imagenes(self, cambios):
+        """
+        Aplica sobre la galería los cambios {(tipo, posicion): url | archivo | None}.
+        Los archivos se suben a ImgBB y una URL vacía elimina la posición. Recalcula
+        la portada pero no guarda el contenido: eso queda a cargo del llamador.
+        Retorna True si hubo cambios.
+        """
+        actualizadas = aplicar_cambios_imagenes(
+            ContenidoImagen,
+            {(imagen.tipo, imagen.posicion): imagen for imagen in self.imagenes.all()},
+            cambios,
+            carpeta=lambda clave: ContenidoImagen.CARPETAS[clave[0]],
+            nueva=lambda clave, **datos: ContenidoImagen(contenido=self, tipo=clave[0], posicion=clave[1], **datos),
+        )
+        if not actualizadas:
+            return False
+        
+        # El prefetch y su índice quedaron desactualizados
+        getattr(self, '_prefetched_objects_cache', {}).pop('imagenes', None)
+        self.__dict__.pop('_indice_imagenes', None)
+        self.actualizar_portada()
+        return True
+    
+    def actualizar_portada(self):
+        """Toma como portada la primera imagen de la galería (no guarda)"""
+        self.portada = self.imagenes.filter(
+            tipo=ContenidoImagen.TIPO_IMAGEN
+        ).values_list('url', flat=True).first()
     
     def get_tags_marcas_list(self):
         """Convierte los tags de marcas en una lista"""
@@ -481,6 +416,136 @@ class Contenido(ContenidoBase):
         ordering = ['-fecha_publicacion']
         verbose_name = "Contenido"
         verbose_name_plural = "Contenidos"
+        # Índices para las consultas públicas: categoría + estado publicado + orden
+        indexes = [
+            models.Index(fields=['categoria', 'estado', '-fecha_publicacion'], name='contenido_cat_est_fecha_idx'),
+            models.Index(fields=['estado', '-fecha_publicacion'], name='contenido_est_fecha_idx'),
+            models.Index(fields=['categoria', 'estado', '-contador_visitas_total'], name='contenido_cat_est_total_idx'),
+            models.Index(fields=['estado', '-contador_visitas_total'], name='contenido_est_total_idx'),
+            models.Index(fields=['estado', '-contador_visitas'], name='contenido_est_semana_idx'),
+            # Número de issue: solo existe en la categoría issues
+            models.Index(
+                fields=['numero_issue'], name='contenido_numero_issue_idx',
+                condition=Q(categoria='issues')
+            ),
+        ]
+
+
+# MODELO PARA LA GALERÍA DE IMÁGENES DEL CONTENIDO
+class ContenidoImagen(models.Model):
+    """Imagen de la galería (o del backstage de un Issue) en una posición ordenada"""
+    TIPO_IMAGEN = 'imagen'
+    TIPO_BACKSTAGE = 'backstage'
+    
+    TIPO_CHOICES = [
+        (TIPO_IMAGEN, 'Imagen'),
+        (TIPO_BACKSTAGE, 'Backstage'),
+    ]
+    
+    # Carpeta del storage local usada si falla la subida a ImgBB
+    CARPETAS = {TIPO_IMAGEN: 'images', TIPO_BACKSTAGE: 'backstage'}
+    
+    # Posiciones que se siguen devolviendo como claves imagen_N / backstage_N
+    POSICIONES_LEGADO = 30
+    POSICION_MAXIMA = 500
+    
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='imagenes')
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, default=TIPO_IMAGEN)
+    posicion = models.PositiveIntegerField()
+    url = models.URLField(max_length=500)
+    ancho = models.PositiveIntegerField(null=True, blank=True)
+    alto = models.PositiveIntegerField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['contenido', 'tipo', 'posicion']
+        ordering = ['tipo', 'posicion']
+        verbose_name = "Imagen de Contenido"
+        verbose_name_plural = "Imágenes de Contenido"
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.posicion} -> {self.url}"
+
+
+PATRON_CAMPO_IMAGEN = re.compile(r'^(imagen|backstage)_(\d+)(_local)?$')
+
+
+def cambios_de_imagenes(datos, tipos=(ContenidoImagen.TIPO_IMAGEN, ContenidoImagen.TIPO_BACKSTAGE)):
+    """
+    Extrae de los datos recibidos las claves imagen_N / backstage_N (URL) e
+    imagen_N_local / backstage_N_local (archivo) de los tipos indicados.
+    Retorna {(tipo, posicion): valor} para guardar_imagenes; si llegan ambas gana el archivo.
+    """
+    validar_url = URLValidator()
+    cambios = {}
+    for clave, valor in datos.items():
+        coincidencia = PATRON_CAMPO_IMAGEN.match(clave)
+        if not coincidencia:
+            continue
+        tipo, posicion, local = coincidencia.group(1), int(coincidencia.group(2)), coincidencia.group(3)
+        if tipo not in tipos:
+            continue
+        if not 1 <= posicion <= ContenidoImagen.POSICION_MAXIMA:
+            raise ValidationError({clave: f'La posición debe estar entre 1 y {ContenidoImagen.POSICION_MAXIMA}.'})
+        if isinstance(valor, list):
+            valor = valor[0] if valor else ''
+        
+        if local:
+            if hasattr(valor, 'read'):
+                cambios[(tipo, posicion)] = valor
+        elif not hasattr(cambios.get((tipo, posicion)), 'read'):
+            if valor:
+                try:
+                    validar_url(valor)
+                except ValidationError:
+                    raise ValidationError({clave: 'Ingrese una URL válida.'})
+            cambios[(tipo, posicion)] = valor or None
+    return cambios
+
+
+def aplicar_cambios_imagenes(modelo, existentes, cambios, carpeta, nueva):
+    """
+    Aplica {clave: url | archivo | None} sobre las imágenes existentes ({clave: imagen}).
+    Los archivos se suben con subir_imagen(archivo, carpeta(clave)) guardando su tamaño,
+    una URL vacía elimina la imagen y nueva(clave, url=, ancho=, alto=) arma las que faltan.
+    Retorna True si hubo cambios.
+    """
+    nuevas, modificadas, eliminadas = [], [], []
+    
+    for clave, valor in sorted(cambios.items()):
+        ancho = alto = None
+        if hasattr(valor, 'read'):
+            ancho, alto = get_image_dimensions(valor)
+            valor = subir_imagen(valor, carpeta(clave))
+        
+        existente = existentes.get(clave)
+        if not valor:
+            if existente:
+                eliminadas.append(existente.pk)
+        elif existente is None:
+            nuevas.append(nueva(clave, url=valor, ancho=ancho, alto=alto))
+        elif (existente.url, existente.ancho, existente.alto) != (valor, ancho, alto):
+            existente.url, existente.ancho, existente.alto = valor, ancho, alto
+            modificadas.append(existente)
+    
+    if not (nuevas or modificadas or eliminadas):
+        return False
+    
+    with transaction.atomic():
+        modelo.objects.filter(pk__in=eliminadas).delete()
+        modelo.objects.bulk_update(modificadas, ['url', 'ancho', 'alto'])
+        modelo.objects.bulk_create(nuevas)
+    return True
+
+
+def subir_imagen(archivo, carpeta):
+    """Sube la imagen a ImgBB; si falla la guarda en el storage local. Retorna la URL"""
+    url = upload_to_imgbb(archivo)
+    if url:
+        return url
+    archivo.seek(0)
+    ruta = default_storage.save(os.path.join(carpeta, os.path.basename(archivo.name)), archivo)
+    print(f"Imagen guardada localmente: {ruta}")
+    return default_storage.url(ruta)
 
 
 # MODELO PARA LINKS DE IMAGEN EN MADEINARG
@@ -537,12 +602,29 @@ class TiendaMadeInArg(models.Model):
     
     def get_total_productos(self):
         """Retorna el total de productos activos"""
+        if hasattr(self, 'total_productos_activos'):
+            return self.total_productos_activos
         return self.productos.filter(activo=True).count()
     
+    @classmethod
+    def anotar_total_productos(cls, queryset=None):
+        """Anota el total de productos activos con una subconsulta para evitar un COUNT por tienda"""
+        if queryset is None:
+            queryset = cls.objects.all()
+        productos_activos = ProductoMadeInArg.objects.filter(
+            tienda=OuterRef('pk'), activo=True
+        ).order_by().values('tienda').annotate(total=Count('id')).values('total')
+        return queryset.annotate(
+            total_productos_activos=Coalesce(Subquery(productos_activos), 0)
+        )
+    
     class Meta:
         ordering = ['-fecha_creacion']
         verbose_name = "Tienda MadeInArg"
         verbose_name_plural = "Tiendas MadeInArg"
+        indexes = [
+            models.Index(fields=['activa', '-fecha_creacion'], name='tienda_activa_fecha_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
@@ -598,6 +680,9 @@ class ProductoMadeInArg(models.Model):
         ordering = ['orden', '-fecha_creacion']
         verbose_name = "Producto MadeInArg"
         verbose_name_plural = "Productos MadeInArg"
+        indexes = [
+            models.Index(fields=['categoria', 'activo', 'tienda'], name='producto_cat_activo_tienda_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tienda.titulo} - {self.nombre}"
@@ -611,47 +696,9 @@ class ArtistaMadeInArg(models.Model):
     
     video_youtube = models.URLField(blank=True, null=True, help_text="URL del video de YouTube")
     
-    # Galería de imágenes (hasta 20 imágenes)
-    imagen_1 = models.URLField(blank=True, null=True)
-    imagen_1_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_2 = models.URLField(blank=True, null=True)
-    imagen_2_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_3 = models.URLField(blank=True, null=True)
-    imagen_3_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_4 = models.URLField(blank=True, null=True)
-    imagen_4_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_5 = models.URLField(blank=True, null=True)
-    imagen_5_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_6 = models.URLField(blank=True, null=True)
-    imagen_6_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_7 = models.URLField(blank=True, null=True)
-    imagen_7_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_8 = models.URLField(blank=True, null=True)
-    imagen_8_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_9 = models.URLField(blank=True, null=True)
-    imagen_9_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_10 = models.URLField(blank=True, null=True)
-    imagen_10_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_11 = models.URLField(blank=True, null=True)
-    imagen_11_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_12 = models.URLField(blank=True, null=True)
-    imagen_12_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_13 = models.URLField(blank=True, null=True)
-    imagen_13_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_14 = models.URLField(blank=True, null=True)
-    imagen_14_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_15 = models.URLField(blank=True, null=True)
-    imagen_15_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_16 = models.URLField(blank=True, null=True)
-    imagen_16_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_17 = models.URLField(blank=True, null=True)
-    imagen_17_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_18 = models.URLField(blank=True, null=True)
-    imagen_18_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_19 = models.URLField(blank=True, null=True)
-    imagen_19_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
-    imagen_20 = models.URLField(blank=True, null=True)
-    imagen_20_local = models.ImageField(upload_to='artistas/', blank=True, null=True)
+    # Resumen de la galería (ArtistaImagen), mantenido al escribirla para los listados
+    imagen_principal = models.URLField(max_length=500, blank=True, null=True)
+    total_imagenes = models.PositiveIntegerField(default=0)
     
     # Links sociales
     link_instagram = models.URLField(blank=True, null=True, help_text="Instagram del artista")
@@ -665,48 +712,80 @@ class ArtistaMadeInArg(models.Model):
     
     creado_por = models.ForeignKey('Trabajador', on_delete=models.CASCADE, related_name='artistas_creados')
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        images_updated = self._process_images()
-        if images_updated:
-            super().save()
-    
-    def _process_images(self):
-        """Procesa todas las imágenes de la galería"""
-        images_updated = False
-        
-        for i in range(1, 21):
-            local_field_name = f'imagen_{i}_local'
-            url_field_name = f'imagen_{i}'
-            
-            local_field = getattr(self, local_field_name)
-            if local_field and hasattr(local_field, 'file'):
-                uploaded_url = upload_to_imgbb(local_field)
-                if uploaded_url:
-                    setattr(self, url_field_name, uploaded_url)
-                    setattr(self, local_field_name, None)
-                    images_updated = True
-        
-        return images_updated
-    
     def get_imagenes_galeria(self):
         """Retorna lista de URLs de imágenes de la galería"""
-        imagenes = []
-        for i in range(1, 21):
-            imagen = getattr(self, f'imagen_{i}')
-            if imagen:
-                imagenes.append(imagen)
-        return imagenes
+        return [imagen.url for imagen in self.imagenes.all()]
+    
+    def imagen_en(self, posicion):
+        """URL de la imagen en esa posición o None; indexa el prefetch una sola vez por instancia"""
+        indice = self.__dict__.get('_indice_imagenes')
+        if indice is None:
+            indice = self._indice_imagenes = {imagen.posicion: imagen.url for imagen in self.imagenes.all()}
+        return indice.get(posicion)
+    
+    def guardar_imagenes(self, cambios):
+        """
+        Aplica sobre la galería los cambios {posicion: url | archivo | None} y
+        recalcula imagen_principal y total_imagenes (no guarda el artista).
+        Retorna True si hubo cambios.
+        """
+        actualizadas = aplicar_cambios_imagenes(
+            ArtistaImagen,
+            {imagen.posicion: imagen for imagen in self.imagenes.all()},
+            cambios,
+            carpeta=lambda posicion: ArtistaImagen.CARPETA,
+            nueva=lambda posicion, **datos: ArtistaImagen(artista=self, posicion=posicion, **datos),
+        )
+        if not actualizadas:
+            return False
+        
+        getattr(self, '_prefetched_objects_cache', {}).pop('imagenes', None)
+        self.__dict__.pop('_indice_imagenes', None)
+        self.actualizar_resumen_galeria()
+        return True
+    
+    def actualizar_resumen_galeria(self):
+        """Recalcula imagen_principal y total_imagenes desde la galería (no guarda)"""
+        urls = list(self.imagenes.values_list('url', flat=True))
+        self.imagen_principal = urls[0] if urls else None
+        self.total_imagenes = len(urls)
     
     class Meta:
         ordering = ['-fecha_creacion']
         verbose_name = "Artista MadeInArg"
         verbose_name_plural = "Artistas MadeInArg"
+        indexes = [
+            models.Index(fields=['activo', '-fecha_creacion'], name='artista_activo_fecha_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
 
 
+# MODELO PARA LA GALERÍA DE ARTISTAS
+class ArtistaImagen(models.Model):
+    """Imagen de la galería de un artista en una posición ordenada"""
+    CARPETA = 'artistas'
+    
+    # Posiciones que se siguen devolviendo como claves imagen_N
+    POSICIONES_LEGADO = 20
+    
+    artista = models.ForeignKey(ArtistaMadeInArg, on_delete=models.CASCADE, related_name='imagenes')
+    posicion = models.PositiveIntegerField()
+    url = models.URLField(max_length=500)
+    ancho = models.PositiveIntegerField(null=True, blank=True)
+    alto = models.PositiveIntegerField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['artista', 'posicion']
+        ordering = ['posicion']
+        verbose_name = "Imagen de Artista"
+        verbose_name_plural = "Imágenes de Artistas"
+    
+    def __str__(self):
+        return f"Imagen {self.posicion} -> {self.url}"
+
+
 # MODELO PARA TOKENS DE RECUPERACIÓN DE CONTRASEÑA
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -756,10 +835,10 @@ class ContenidoManager(models.Manager):
         return self.filter(categoria='club_pompa')
     
     def publicados(self):
-        return self.filter(estado__nombre_estado='publicado')
+        return self.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
     
     def por_categoria_y_publicados(self, categoria):
-        return self.filter(categoria=categoria, estado__nombre_estado='publicado')
+        return self.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO), categoria=categoria)
 
 # Agregar el manager al modelo Contenido
 Contenido.add_to_class('objects', ContenidoManager())
@@ -768,15 +847,146 @@ Contenido.add_to_class('objects', ContenidoManager())
 # MODELO DE VISITAS
 class ContenidoVisita(models.Model):
     contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='visitas')
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Se asigna al registrar la visita, no al volcarla desde el buffer
+    fecha = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['fecha']),
             models.Index(fields=['contenido']),
+            # Deduplicación en la base (opcional, VISITAS_DEDUPLICACION_EN_BASE)
+            models.Index(fields=['contenido', 'ip_address', 'fecha'], name='visita_contenido_ip_fecha_idx'),
+        ]
+
+
+# MODELO DE VISITAS CONSOLIDADAS
+class ContenidoVisitaDiaria(models.Model):
+    """Visitas por contenido y día; se consolidan desde ContenidoVisita con el comando consolidar_visitas"""
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='visitas_diarias')
+    fecha = models.DateField()
+    visitas = models.PositiveIntegerField(default=0)
+    # IPs distintas del día
+    unicos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['contenido', 'fecha']
+        ordering = ['-fecha', 'contenido']
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.contenido_id} - {self.fecha}: {self.visitas}"
+
+
+# MODELO DE VISITAS POR HORA
+class ContenidoVisitaHora(models.Model):
+    """Visitas por contenido y hora: se suman al volcar el buffer y alimentan las ventanas deslizantes"""
+    # Campo anotado por anotar_visitas_recientes -> duración de la ventana
+    VENTANAS = {
+        'visitas_24h': timedelta(hours=24),
+        'visitas_7d': timedelta(days=7),
+        'visitas_30d': timedelta(days=30),
+    }
+
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='visitas_por_hora')
+    hora = models.DateTimeField()
+    visitas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['contenido', 'hora']
+        indexes = [
+            models.Index(fields=['hora']),
         ]
 
+    @staticmethod
+    def truncar(fecha):
+        return fecha.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def desde(cls, campo, ahora=None):
+        """Hora a partir de la cual (excluida) se suman los buckets de la ventana"""
+        return cls.truncar(ahora or timezone.now()) - cls.VENTANAS[campo]
+
+    @classmethod
+    def sumar(cls, conteos):
+        """Suma {(contenido_id, hora): visitas} a los buckets con un upsert, sin perder incrementos entre workers"""
+        tabla = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {tabla} (contenido_id, hora, visitas) VALUES (%s, %s, %s) '
+                f'ON CONFLICT (contenido_id, hora) DO UPDATE SET visitas = {tabla}.visitas + excluded.visitas',
+                [
+                    (contenido_id, connection.ops.adapt_datetimefield_value(hora), cantidad)
+                    for (contenido_id, hora), cantidad in conteos.items()
+                ]
+            )
+
+
+# MODELO DE RANKINGS MATERIALIZADOS
+class RankingContenido(models.Model):
+    """Posiciones precalculadas del contenido más visto por categoría y ventana de tiempo"""
+    VENTANA_DIA = 'dia'
+    VENTANA_SEMANA = 'semana'
+    VENTANA_MES = 'mes'
+    VENTANA_TOTAL = 'total'
+    VENTANA_CHOICES = [
+        (VENTANA_DIA, 'Último día'),
+        (VENTANA_SEMANA, 'Última semana'),
+        (VENTANA_MES, 'Último mes'),
+        (VENTANA_TOTAL, 'Histórico'),
+    ]
+    # Ventanas deslizantes y su campo en anotar_visitas_recientes; la histórica usa contador_visitas_total
+    CAMPOS_VENTANA = {
+        VENTANA_DIA: 'visitas_24h',
+        VENTANA_SEMANA: 'visitas_7d',
+        VENTANA_MES: 'visitas_30d',
+    }
+
+    # Ranking general, sin filtrar por categoría
+    TODAS = 'todas'
+    # Posiciones que se guardan por ranking: límites mayores se calculan en vivo
+    TAMANO = 50
+    CATEGORIA_CHOICES = [(TODAS, 'Todas')] + ContenidoBase.CATEGORIA_CHOICES
+
+    categoria = models.CharField(max_length=20, choices=CATEGORIA_CHOICES)
+    ventana = models.CharField(max_length=10, choices=VENTANA_CHOICES)
+    posicion = models.PositiveIntegerField()
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='rankings')
+    visitas = models.PositiveIntegerField(default=0)
+    fecha_calculo = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['ventana', 'categoria', 'posicion']
+        ordering = ['ventana', 'categoria', 'posicion']
+
+    def __str__(self):
+        return f"{self.get_ventana_display()} - {self.categoria} #{self.posicion}"
+
+    @classmethod
+    def ids_rankeados(cls, ventana, categoria=None, limit=10):
+        """Retorna los ids del ranking en orden; lista vacía si todavía no se calculó"""
+        return list(
+            cls.objects.filter(ventana=ventana, categoria=categoria or cls.TODAS)
+            .order_by('posicion')
+            .values_list('contenido_id', flat=True)[:limit]
+        )
+
+    @classmethod
+    def ids_por_ventana(cls, categoria, limites):
+        """Como ids_rankeados para varias ventanas ({ventana: limit}) en una sola consulta; retorna {ventana: ids}"""
+        ids = {ventana: [] for ventana in limites}
+        if not limites:
+            return ids
+        filas = cls.objects.filter(
+            ventana__in=list(limites), categoria=categoria or cls.TODAS, posicion__lte=max(limites.values())
+        ).order_by('posicion').values_list('ventana', 'contenido_id')
+        for ventana, contenido_id in filas:
+            if len(ids[ventana]) < limites[ventana]:
+                ids[ventana].append(contenido_id)
+        return ids
+
 
 # MODELOS MANTENIDOS DEL CÓDIGO ORIGINAL
 class Usuario(models.Model):
@@ -811,16 +1021,9 @@ from django.dispatch import receiver
 @receiver(pre_delete, sender=Contenido)
 def limpiar_imagenes_contenido(sender, instance, **kwargs):
     """Limpia las imágenes cuando se elimina un contenido"""
-    for i in range(1, 31):
-        url_field = getattr(instance, f'imagen_{i}')
-        if url_field and ('ibb.co' in url_field or 'imgur.com' in url_field):
-            delete_from_imgbb(url_field)
-    
-    if instance.categoria == 'issues':
-        for i in range(1, 31):
-            backstage_field = getattr(instance, f'backstage_{i}')
-            if backstage_field and ('ibb.co' in backstage_field or 'imgur.com' in backstage_field):
-                delete_from_imgbb(backstage_field)
+    for url in instance.imagenes.values_list('url', flat=True):
+        if 'ibb.co' in url or 'imgur.com' in url:
+            delete_from_imgbb(url)
 
 @receiver(pre_delete, sender=TiendaMadeInArg)
 def limpiar_imagenes_tienda(sender, instance, **kwargs):
@@ -837,43 +1040,391 @@ def limpiar_imagenes_producto(sender, instance, **kwargs):
 @receiver(pre_delete, sender=ArtistaMadeInArg)
 def limpiar_imagenes_artista(sender, instance, **kwargs):
     """Limpia las imágenes de la galería cuando se elimina un artista"""
-    for i in range(1, 21):
-        imagen = getattr(instance, f'imagen_{i}')
-        if imagen and ('ibb.co' in imagen or 'imgur.com' in imagen):
-            delete_from_imgbb(imagen)
+    for url in instance.imagenes.values_list('url', flat=True):
+        if 'ibb.co' in url or 'imgur.com' in url:
+            delete_from_imgbb(url)
+
+
+# SEÑALES PARA INVALIDAR LA CACHE DE FEEDS
+from django.db.models.signals import pre_save, post_save, post_delete
+from .cache_utils import (
+    invalidar_categorias, invalidar_contenidos, invalidar_ambitos, clave_slug, marcar_visita,
+    version_actual, VISITAS_DEDUPLICACION, AMBITO_ESTADOS, AMBITO_MADEINARG, AMBITO_RANKING
+)
+from django.core.cache import cache
+from .snapshots import exportar_rankings, programar_exportacion
+from .particiones import eliminar_particiones_anteriores
+
+CAMPOS_CONTADORES = {'contador_visitas', 'contador_visitas_total', 'ultima_actualizacion_contador'}
+
+@receiver(post_save, sender=EstadoPublicacion)
+@receiver(post_delete, sender=EstadoPublicacion)
+def limpiar_registro_estados(sender, **kwargs):
+    """Fuerza a recargar el registro de estados en este proceso"""
+    EstadoPublicacion.limpiar_registro()
+
+@receiver(pre_save, sender=Contenido)
+def recordar_categoria_anterior(sender, instance, **kwargs):
+    """Guarda la categoría previa para invalidar también el feed de origen si cambia"""
+    if instance.pk:
+        instance._categoria_anterior = Contenido.objects.filter(pk=instance.pk).values_list(
+            'categoria', flat=True
+        ).first()
+
+@receiver(post_save, sender=Contenido)
+@receiver(post_delete, sender=Contenido)
+def invalidar_cache_contenido(sender, instance, **kwargs):
+    """Invalida los feeds de la categoría del contenido guardado o eliminado"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= CAMPOS_CONTADORES:
+        # Los contadores de visitas no invalidan la cache (expira por tiempo)
+        return
+    invalidar_categorias(instance.categoria, getattr(instance, '_categoria_anterior', None))
+    invalidar_contenidos(instance.pk)
+    if instance.slug and kwargs.get('signal') is post_delete:
+        cache.delete(clave_slug(instance.slug))
+
+@receiver(post_save, sender=Contenido)
+@receiver(post_delete, sender=Contenido)
+def exportar_snapshots_contenido(sender, instance, **kwargs):
+    """Regenera los snapshots estáticos al publicar, editar o eliminar contenido (si está activo)"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= CAMPOS_CONTADORES:
+        return
+    programar_exportacion(instance.pk, categorias=(instance.categoria, getattr(instance, '_categoria_anterior', None)))
+
+@receiver(post_save, sender=EspacioReferencia)
+@receiver(post_delete, sender=EspacioReferencia)
+@receiver(post_save, sender=ImagenLink)
+@receiver(post_delete, sender=ImagenLink)
+@receiver(post_save, sender=ContenidoImagen)
+@receiver(post_delete, sender=ContenidoImagen)
+def invalidar_cache_relacionados(sender, instance, **kwargs):
+    """Invalida los feeds y el detalle del contenido al que pertenece el espacio, link o imagen"""
+    categoria = Contenido.objects.filter(pk=instance.contenido_id).values_list(
+        'categoria', flat=True
+    ).first()
+    invalidar_categorias(categoria)
+    invalidar_contenidos(instance.contenido_id)
+
+@receiver(post_save, sender=TiendaMadeInArg)
+@receiver(post_delete, sender=TiendaMadeInArg)
+@receiver(post_save, sender=ProductoMadeInArg)
+@receiver(post_delete, sender=ProductoMadeInArg)
+@receiver(post_save, sender=ArtistaMadeInArg)
+@receiver(post_delete, sender=ArtistaMadeInArg)
+@receiver(post_save, sender=ArtistaImagen)
+@receiver(post_delete, sender=ArtistaImagen)
+def invalidar_cache_madeinarg(sender, instance, **kwargs):
+    """Invalida las respuestas cacheadas de MadeInArg al modificar tiendas, productos, artistas o sus galerías"""
+    invalidar_ambitos(AMBITO_MADEINARG)
 
 
 # FUNCIONES DE UTILIDAD
 def incrementar_visitas_contenido(contenido_instance, ip_address=None):
     """Función para incrementar visitas de contenido"""
-    if timezone.now() - contenido_instance.ultima_actualizacion_contador > timedelta(days=7):
-        contenido_instance.contador_visitas = 0
-        contenido_instance.ultima_actualizacion_contador = timezone.now()
-        contenido_instance.save()
+    return registrar_visita_contenido(contenido_instance.pk, ip_address=ip_address)
+
+
+class BufferVisitas:
+    """
+    Acumula las visitas del proceso en memoria y las vuelca juntas.
+
+    Cada volcado inserta las filas de ContenidoVisita con un bulk_create, suma
+    los buckets por hora con un upsert y el contador histórico con un UPDATE
+    basado en F() por cada cantidad distinta, así que no se pierden
+    incrementos entre workers y una visita ya no cuesta tres consultas.
+
+    Lo vuelca un hilo del proceso cada VISITAS_VOLCADO_INTERVALO segundos, o
+    antes si se juntan VISITAS_VOLCADO_MAXIMO visitas (el request solo lo
+    despierta, nunca escribe), y al terminar el proceso. Si el worker muere
+    con SIGKILL se pierden a lo sumo las visitas de ese intervalo.
+    """
+    # Tope de visitas retenidas mientras la base falla; se descartan las más viejas
+    PENDIENTES_MAXIMO = 50000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._visitas = []
+        self._despertar = threading.Event()
+        self._fallando = False
+        self._hilo = None
+
+    def agregar(self, contenido_id, ip_address, fecha):
+        with self._lock:
+            self._visitas.append(ContenidoVisita(contenido_id=contenido_id, ip_address=ip_address, fecha=fecha))
+            # Mientras la base falla solo se reintenta por intervalo, no en cada visita
+            if not self._fallando and len(self._visitas) >= getattr(settings, 'VISITAS_VOLCADO_MAXIMO', 500):
+                self._despertar.set()
+            # El hilo se crea con la primera visita: así también existe en los workers forkeados
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._volcar_periodicamente, daemon=True)
+                self._hilo.start()
+
+    def _volcar_periodicamente(self):
+        """Vuelca lo pendiente cada VISITAS_VOLCADO_INTERVALO segundos o cuando agregar lo despierta"""
+        while True:
+            self._despertar.wait(getattr(settings, 'VISITAS_VOLCADO_INTERVALO', 10))
+            self._despertar.clear()
+            try:
+                self.volcar()
+            except Exception as e:
+                print(f"Error al volcar visitas: {str(e)}")
+            finally:
+                # La conexión de este hilo no la cierra el ciclo de request de Django
+                connection.close()
+
+    def volcar(self):
+        """Escribe las visitas acumuladas; retorna cuántas se registraron"""
+        with self._lock:
+            pendientes, self._visitas = self._visitas, []
+        if not pendientes:
+            return 0
+
+        try:
+            # Las visitas a contenidos eliminados mientras estaban en el buffer se descartan
+            existentes = set(Contenido.objects.filter(
+                pk__in={visita.contenido_id for visita in pendientes}
+            ).values_list('pk', flat=True))
+            visitas = [visita for visita in pendientes if visita.contenido_id in existentes]
+
+            por_cantidad = {}
+            for contenido_id, cantidad in Counter(visita.contenido_id for visita in visitas).items():
+                por_cantidad.setdefault(cantidad, []).append(contenido_id)
+
+            por_hora = Counter(
+                (visita.contenido_id, ContenidoVisitaHora.truncar(visita.fecha)) for visita in visitas
+            )
 
+            ahora = timezone.now()
+            with transaction.atomic():
+                ContenidoVisita.objects.bulk_create(visitas, batch_size=1000)
+                if por_hora:
+                    ContenidoVisitaHora.sumar(por_hora)
+                # contador_visitas se recalcula desde los buckets recién sumados (ventana de 7 días);
+                # el de los contenidos sin visitas nuevas lo pone al día actualizar_rankings
+                for cantidad, ids in por_cantidad.items():
+                    Contenido.objects.filter(pk__in=ids).update(
+                        contador_visitas=_suma_ventana('visitas_7d', ahora),
+                        contador_visitas_total=F('contador_visitas_total') + cantidad,
+                        ultima_actualizacion_contador=ahora,
+                    )
+        except Exception as e:
+            # El lote vuelve al buffer y se reintenta en el próximo volcado
+            with self._lock:
+                self._visitas = (pendientes + self._visitas)[-self.PENDIENTES_MAXIMO:]
+                self._fallando = True
+            print(f"Error al volcar {len(pendientes)} visitas, se reintenta en el próximo volcado: {str(e)}")
+            return 0
+
+        self._fallando = False
+        return len(visitas)
+
+
+buffer_visitas = BufferVisitas()
+# Lo que quede en el buffer se escribe al terminar el worker
+atexit.register(buffer_visitas.volcar)
+
+
+def volcar_visitas():
+    """Escribe ya las visitas acumuladas en este proceso; retorna cuántas se registraron"""
+    return buffer_visitas.volcar()
+
+
+def _visita_reciente_en_base(contenido_id, ip_address):
+    """Retorna si ya hay una visita volcada de la IP al contenido dentro de la ventana de deduplicación"""
+    return ContenidoVisita.objects.filter(
+        contenido_id=contenido_id,
+        ip_address=ip_address,
+        fecha__gte=timezone.now() - timedelta(seconds=VISITAS_DEDUPLICACION)
+    ).exists()
+
+
+def registrar_visita_contenido(contenido_id, ip_address=None, fecha=None):
+    """Registra una visita en el buffer; retorna si se contó"""
     if ip_address:
-        hace_5_minutos = timezone.now() - timedelta(minutes=5)
-        visita_reciente = ContenidoVisita.objects.filter(
-            contenido=contenido_instance,
-            ip_address=ip_address,
-            fecha__gte=hace_5_minutos
-        ).exists()
-        
-        if visita_reciente:
+        # Las visitas repetidas de una IP se descartan con una marca con TTL en la cache
+        if not marcar_visita(contenido_id, ip_address):
+            return False
+        # Opcional: sin cache compartida la marca es de este worker y se consulta también la base
+        en_base = getattr(settings, 'VISITAS_DEDUPLICACION_EN_BASE', False)
+        if en_base and _visita_reciente_en_base(contenido_id, ip_address):
             return False
 
-    ContenidoVisita.objects.create(
-        contenido=contenido_instance,
-        ip_address=ip_address
-    )
-    
-    contenido_instance.contador_visitas += 1
-    contenido_instance.contador_visitas_total += 1
-    contenido_instance.save(update_fields=['contador_visitas', 'contador_visitas_total'])
-    
+    buffer_visitas.agregar(contenido_id, ip_address, fecha or timezone.now())
     return True
 
 
+def _suma_ventana(campo, ahora=None):
+    """Visitas del contenido (OuterRef) en la ventana deslizante `campo`"""
+    suma = ContenidoVisitaHora.objects.filter(
+        contenido=OuterRef('pk'), hora__gt=ContenidoVisitaHora.desde(campo, ahora)
+    ).order_by().values('contenido').annotate(total=Sum('visitas')).values('total')
+    return Coalesce(Subquery(suma), 0)
+
+
+def anotar_visitas_recientes(queryset, *campos, ahora=None):
+    """
+    Anota en un queryset de Contenido las visitas de las ventanas deslizantes
+    pedidas (visitas_24h, visitas_7d, visitas_30d; todas si no se indican).
+
+    Todas las ventanas terminan en la misma hora, así que los contenidos se
+    comparan sobre el mismo período sin importar cuándo fue su última visita.
+    """
+    return queryset.annotate(**{
+        campo: _suma_ventana(campo, ahora) for campo in campos or ContenidoVisitaHora.VENTANAS
+    })
+
+
+def inicio_del_dia(fecha):
+    """Primer instante del día en la zona horaria actual"""
+    return timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+
+
+def consolidar_visitas(desde=None):
+    """
+    Suma las visitas crudas por contenido y día en ContenidoVisitaDiaria; retorna las filas escritas.
+
+    Es incremental: sin `desde` se recalcula a partir del día anterior al último
+    consolidado, porque las visitas llegan con atraso (buffer y beacon) y ese
+    día pudo quedar incompleto. Las filas existentes se actualizan con un upsert.
+    """
+    if desde is None:
+        ultimo = ContenidoVisitaDiaria.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+        desde = ultimo - timedelta(days=1) if ultimo else None
+
+    crudas = ContenidoVisita.objects.all()
+    if desde:
+        crudas = crudas.filter(fecha__gte=inicio_del_dia(desde))
+    filas = [
+        ContenidoVisitaDiaria(contenido_id=contenido_id, fecha=dia, visitas=visitas, unicos=unicos)
+        for contenido_id, dia, visitas, unicos in crudas.annotate(dia=TruncDate('fecha'))
+        .values('contenido_id', 'dia')
+        .annotate(visitas=Count('id'), unicos=Count('ip_address', distinct=True))
+        .order_by()
+        .values_list('contenido_id', 'dia', 'visitas', 'unicos')
+    ]
+    ContenidoVisitaDiaria.objects.bulk_create(
+        filas, batch_size=1000, update_conflicts=True,
+        unique_fields=['contenido', 'fecha'], update_fields=['visitas', 'unicos']
+    )
+    return len(filas)
+
+
+def purgar_visitas(dias=None, lote=None):
+    """
+    Borra las visitas crudas anteriores a la ventana de retención; retorna (filas, particiones) eliminadas.
+
+    Solo se borran días completos y ya consolidados. Con la tabla particionada
+    se eliminan primero las particiones enteras; el resto se borra en lotes de
+    VISITAS_PURGA_LOTE filas para no bloquear la tabla con un DELETE enorme.
+    """
+    # consolidar_visitas relee el día anterior al último: siempre se conservan dos días
+    dias = max(dias or getattr(settings, 'VISITAS_RETENCION_DIAS', 90), 2)
+    lote = lote or getattr(settings, 'VISITAS_PURGA_LOTE', 5000)
+
+    # Los buckets por hora solo hacen falta para la ventana más larga
+    campo_mas_largo = max(ContenidoVisitaHora.VENTANAS, key=ContenidoVisitaHora.VENTANAS.get)
+    ContenidoVisitaHora.objects.filter(hora__lte=ContenidoVisitaHora.desde(campo_mas_largo)).delete()
+
+    ultimo = ContenidoVisitaDiaria.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+    if ultimo is None:
+        return 0, 0
+    # consolidar_visitas vuelve a leer el día anterior al último consolidado
+    limite = inicio_del_dia(min(timezone.localdate() - timedelta(days=dias), ultimo - timedelta(days=1)))
+
+    particiones = eliminar_particiones_anteriores(ContenidoVisita, limite)
+    filas = 0
+    while True:
+        ids = list(ContenidoVisita.objects.filter(fecha__lt=limite).values_list('pk', flat=True)[:lote])
+        if not ids:
+            break
+        filas += ContenidoVisita.objects.filter(pk__in=ids).delete()[0]
+    return filas, particiones
+
+
+# Largo máximo de la base del slug, deja lugar para el sufijo numérico
+SLUG_LARGO_BASE = 200
+
+
+def slug_base(titulo):
+    """Retorna el slug del título sin garantizar unicidad"""
+    return slugify(titulo or '')[:SLUG_LARGO_BASE].strip('-') or 'contenido'
+
+
+def slugs_ocupados(bases):
+    """Retorna los slugs existentes que pueden chocar con las bases indicadas"""
+    ocupados = set(Contenido.objects.filter(slug__in=set(bases)).values_list('slug', flat=True))
+    # Solo se buscan sufijos (base-2, base-3...) de las bases ya usadas o repetidas
+    repetidas = ocupados | {base for base in bases if bases.count(base) > 1}
+    for base in repetidas:
+        ocupados.update(
+            Contenido.objects.filter(slug__startswith=f'{base}-').values_list('slug', flat=True)
+        )
+    return ocupados
+
+
+def slug_disponible(base, ocupados):
+    """Retorna la base o la primera variante base-N que no esté ocupada"""
+    slug, numero = base, 2
+    while slug in ocupados:
+        slug = f'{base}-{numero}'
+        numero += 1
+    return slug
+
+
+def actualizar_rankings(tamano=None):
+    """Recalcula los rankings materializados de todas las categorías y ventanas; retorna las filas creadas"""
+    tamano = tamano or RankingContenido.TAMANO
+    ahora = timezone.now()
+    publicados = Contenido.objects.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
+
+    # Por ventana: consulta (id, visitas) ordenada y el campo por el que se filtra la categoría.
+    # Las ventanas deslizantes suman los buckets por hora hasta la misma hora para todos los contenidos
+    fuentes = {
+        ventana: (
+            ContenidoVisitaHora.objects.filter(
+                EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO, campo='contenido__estado'),
+                hora__gt=ContenidoVisitaHora.desde(campo, ahora)
+            ).values('contenido_id').annotate(valor=Sum('visitas'))
+            .order_by('-valor', '-contenido_id').values_list('contenido_id', 'valor'),
+            'contenido__categoria',
+        )
+        for ventana, campo in RankingContenido.CAMPOS_VENTANA.items()
+    }
+    fuentes[RankingContenido.VENTANA_TOTAL] = (
+        publicados.order_by('-contador_visitas_total', '-id').values_list('id', 'contador_visitas_total'),
+        'categoria',
+    )
+
+    filas = []
+    for ventana, (consulta, campo_categoria) in fuentes.items():
+        for categoria, _ in RankingContenido.CATEGORIA_CHOICES:
+            if categoria != RankingContenido.TODAS:
+                consulta_categoria = consulta.filter(**{campo_categoria: categoria})
+            else:
+                consulta_categoria = consulta
+            for posicion, (contenido_id, valor) in enumerate(consulta_categoria[:tamano], start=1):
+                filas.append(RankingContenido(
+                    categoria=categoria, ventana=ventana, posicion=posicion,
+                    contenido_id=contenido_id, visitas=valor, fecha_calculo=ahora
+                ))
+
+    # contador_visitas queda con la ventana de 7 días del mismo cálculo (solo se escriben los que cambian)
+    semana = _suma_ventana('visitas_7d', ahora)
+    desactualizados = Contenido.objects.annotate(semana=semana).exclude(contador_visitas=F('semana'))
+
+    # Se reemplaza todo en una transacción para que los lectores nunca vean un ranking a medias
+    with transaction.atomic():
+        RankingContenido.objects.all().delete()
+        RankingContenido.objects.bulk_create(filas)
+        Contenido.objects.filter(pk__in=desactualizados.values('pk')).update(contador_visitas=semana)
+
+    invalidar_ambitos(AMBITO_RANKING)
+    exportar_rankings()
+    return len(filas)
+
+
 def get_madeinarg_stats():
     """Retorna estadísticas generales de MadeInArg"""
     stats = {
@@ -909,7 +1460,7 @@ def get_madeinarg_stats():
 
 def obtener_imagen_portada(contenido):
     """Obtiene la primera imagen disponible para usar como portada"""
-    return contenido.imagen_1 or '/static/img/default-image.jpg'
+    return contenido.portada or '/static/img/default-image.jpg'
 
 
 def obtener_resumen_contenido(contenido, max_chars=150):
@@ -956,6 +1507,9 @@ class Suscriptor(models.Model):
         ordering = ['-fecha_suscripcion']
         verbose_name = "Suscriptor"
         verbose_name_plural = "Suscriptores"
+        indexes = [
+            models.Index(fields=['activo'], name='suscriptor_activo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.email}"
@@ -1099,12 +1653,6 @@ def save(self, *args, **kwargs):
     # Llamar al save original
     super().save(*args, **kwargs)
     
-    # Procesar imágenes (código existente)
-    if self.categoria == 'issues':
-        backstage_updated = self._process_backstage_images()
-        if backstage_updated:
-            super().save()
-    
     # Enviar newsletter si es una nueva publicación
     if es_nueva_publicacion:
         self.enviar_newsletter_automatico()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) para los feeds de contenido.
+
+    En lugar de OFFSET filtra a partir de la última fila vista sobre (campo, id),
+    por lo que una página profunda del archivo cuesta lo mismo que la primera.
+    No calcula el total de resultados. Solo se activa si la request trae
+    ?cursor= o ?page_size=; sin ellos las vistas mantienen su comportamiento.
+    """
+    page_size = 12
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    default_ordering = '-fecha_publicacion'
+
+    # Ordenamientos soportados (los mismos que ?ordering= en los feeds, todos con índice):
+    # el id se usa como desempate para que el orden sea total
+    ORDENAMIENTOS = ('fecha_publicacion', 'contador_visitas_total', 'contador_visitas')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self._get_page_size(request)
+        self.ordering = params.get(self.ordering_query_param) or self.default_ordering
+        self.descendente = self.ordering.startswith('-')
+        self.campo = self.ordering.lstrip('-')
+
+        if self.campo not in self.ORDENAMIENTOS:
+            raise ValidationError({
+                'ordering': f'La paginación por cursor solo admite: {", ".join(self.ORDENAMIENTOS)}'
+            })
+
+        # El valor del cursor se anota para no depender de los campos cargados con .only()
+        prefijo = '-' if self.descendente else ''
+        queryset = queryset.annotate(valor_cursor=F(self.campo)).order_by(
+            f'{prefijo}{self.campo}', f'{prefijo}id'
+        )
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            valor, ultimo_id = self._decode_cursor(cursor, queryset.model)
+            comparador = 'lt' if self.descendente else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.campo}__{comparador}': valor}) |
+                Q(**{self.campo: valor, f'id__{comparador}': ultimo_id})
+            )
+
+        # Se pide una fila extra para saber si hay página siguiente sin hacer COUNT
+        resultados = list(queryset[:self.page_size + 1])
+        self.hay_siguiente = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        self.ultimo = resultados[-1] if resultados else None
+        return resultados
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri-reference'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.hay_siguiente or self.ultimo is None:
+            return None
+        cursor = self._encode_cursor(self.ultimo.valor_cursor, self.ultimo.pk)
+        # Relativo: la respuesta se guarda en la cache compartida sin distinguir el host
+        return replace_query_param(self.request.get_full_path(), self.cursor_query_param, cursor)
+
+    def _get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def _encode_cursor(self, valor, pk):
+        """El cursor es opaco para el cliente: JSON con la última posición en base64"""
+        if hasattr(valor, 'isoformat'):
+            valor = valor.isoformat()
+        datos = json.dumps([valor, pk], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(datos).decode('ascii').rstrip('=')
+
+    def _decode_cursor(self, cursor, modelo):
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            valor, pk = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            valor = modelo._meta.get_field(self.campo).to_python(valor)
+            return valor, int(pk)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound('Cursor inválido')
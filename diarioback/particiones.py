@@ -0,0 +1,165 @@
+import re
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Meses que se crean por adelantado: sin su partición las filas caen en la partición por defecto
+MESES_ADELANTE = 2
+
+
+def _mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def _inicio_mes(mes):
+    """Literal SQL del primer instante del mes (los límites se generan acá, no vienen del usuario)"""
+    return "'%s'" % timezone.make_aware(datetime(mes.year, mes.month, 1)).isoformat()
+
+
+def _nombre_particion(tabla, mes):
+    return f'{tabla}_p{mes:%Y%m}'
+
+
+def esta_particionada(modelo):
+    """Retorna si la tabla del modelo es una tabla particionada de PostgreSQL"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [modelo._meta.db_table]
+        )
+        return cursor.fetchone() is not None
+
+
+def _tiene_filas(cursor, tabla, condicion):
+    cursor.execute(f'SELECT 1 FROM {connection.ops.quote_name(tabla)} WHERE {condicion} LIMIT 1')
+    return cursor.fetchone() is not None
+
+
+def _crear_particiones(cursor, tabla, desde, hasta):
+    """Crea las particiones mensuales de `desde` a `hasta` (inclusive) que no existan; retorna sus nombres"""
+    qn = connection.ops.quote_name
+    default = f'{tabla}_default'
+    cursor.execute('SELECT to_regclass(%s)', [default])
+    hay_default = cursor.fetchone()[0] is not None
+
+    creadas = []
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        nombre = _nombre_particion(tabla, mes)
+        cursor.execute('SELECT to_regclass(%s)', [nombre])
+        if cursor.fetchone()[0] is None:
+            inicio, fin = _inicio_mes(mes), _inicio_mes(_mes_siguiente(mes))
+            crear = f'CREATE TABLE {qn(nombre)} PARTITION OF {qn(tabla)} FOR VALUES FROM ({inicio}) TO ({fin})'
+            rango = f'fecha >= {inicio} AND fecha < {fin}'
+            if hay_default and _tiene_filas(cursor, default, rango):
+                # Filas del mes que cayeron en la partición por defecto (un cron que no corrió o
+                # fechas futuras): PostgreSQL no crea la partición mientras estén ahí, así que se
+                # separa el default, se crea el mes y se mueven antes de volver a adjuntarlo
+                with transaction.atomic():
+                    cursor.execute(f'ALTER TABLE {qn(tabla)} DETACH PARTITION {qn(default)}')
+                    cursor.execute(crear)
+                    cursor.execute(
+                        f'WITH movidas AS (DELETE FROM {qn(default)} WHERE {rango} RETURNING *) '
+                        f'INSERT INTO {qn(tabla)} SELECT * FROM movidas'
+                    )
+                    cursor.execute(f'ALTER TABLE {qn(tabla)} ATTACH PARTITION {qn(default)} DEFAULT')
+            else:
+                cursor.execute(crear)
+            creadas.append(nombre)
+        mes = _mes_siguiente(mes)
+    return creadas
+
+
+def _ultimo_mes(meses):
+    mes = timezone.localdate().replace(day=1)
+    for _ in range(meses):
+        mes = _mes_siguiente(mes)
+    return mes
+
+
+def crear_particiones(modelo, meses=MESES_ADELANTE):
+    """Crea las particiones del mes actual y los `meses` siguientes; retorna las creadas"""
+    if not esta_particionada(modelo):
+        return []
+    with connection.cursor() as cursor:
+        return _crear_particiones(cursor, modelo._meta.db_table, timezone.localdate(), _ultimo_mes(meses))
+
+
+def eliminar_particiones_anteriores(modelo, limite):
+    """Elimina las particiones mensuales que terminan antes de `limite`; retorna cuántas se eliminaron"""
+    if not esta_particionada(modelo):
+        return 0
+    tabla = modelo._meta.db_table
+    patron = re.compile(rf'{re.escape(tabla)}_p(\d{{4}})(\d{{2}})')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s',
+            [tabla]
+        )
+        eliminadas = 0
+        for (nombre,) in cursor.fetchall():
+            match = patron.fullmatch(nombre)
+            if not match:
+                continue
+            fin = _mes_siguiente(date(int(match.group(1)), int(match.group(2)), 1))
+            if timezone.make_aware(datetime(fin.year, fin.month, 1)) <= limite:
+                cursor.execute(f'DROP TABLE {connection.ops.quote_name(nombre)}')
+                eliminadas += 1
+    return eliminadas
+
+
+def particionar(modelo, meses=MESES_ADELANTE):
+    """
+    Convierte la tabla del modelo en una tabla particionada por mes según `fecha`.
+
+    Es un paso opcional que se hace una sola vez (consolidar_visitas
+    --particionar): la tabla se copia a la particionada dentro de una
+    transacción y se recrean los índices de Meta.indexes y la FK (solo la
+    constraint: el índice sobre contenido ya está en Meta.indexes).
+    PostgreSQL exige que la clave primaria incluya la columna de partición,
+    así que pasa a ser (id, fecha); `id` sigue saliendo de una secuencia.
+    Retorna False si la base no es PostgreSQL o la tabla ya está particionada.
+    """
+    if connection.vendor != 'postgresql' or esta_particionada(modelo):
+        return False
+
+    qn = connection.ops.quote_name
+    tabla = modelo._meta.db_table
+    antigua = f'{tabla}_antigua'
+    secuencia = f'{tabla}_id_seq'
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {qn(tabla)} IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'ALTER TABLE {qn(tabla)} RENAME TO {qn(antigua)}')
+            # Sin INCLUDING IDENTITY: la identidad de la tabla vieja se reemplaza por una secuencia
+            cursor.execute(f'CREATE TABLE {qn(tabla)} (LIKE {qn(antigua)} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)')
+
+            cursor.execute(f'SELECT min(fecha) FROM {qn(antigua)}')
+            minima = cursor.fetchone()[0]
+            desde = timezone.localtime(minima).date() if minima else timezone.localdate()
+            _crear_particiones(cursor, tabla, desde, _ultimo_mes(meses))
+            cursor.execute(f'CREATE TABLE {qn(tabla + "_default")} PARTITION OF {qn(tabla)} DEFAULT')
+
+            cursor.execute(f'INSERT INTO {qn(tabla)} SELECT * FROM {qn(antigua)}')
+            # Al borrar la tabla vieja se liberan los nombres de sus índices, constraints y secuencia
+            cursor.execute(f'DROP TABLE {qn(antigua)}')
+
+            cursor.execute(f'CREATE SEQUENCE {qn(secuencia)} OWNED BY {qn(tabla)}.id')
+            cursor.execute(f'SELECT setval(%s, COALESCE((SELECT max(id) FROM {qn(tabla)}), 0) + 1, false)', [secuencia])
+            cursor.execute(f'ALTER TABLE {qn(tabla)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)', [secuencia])
+            cursor.execute(f'ALTER TABLE {qn(tabla)} ADD PRIMARY KEY (id, fecha)')
+
+        with connection.schema_editor(atomic=False) as editor:
+            for indice in modelo._meta.indexes:
+                editor.add_index(modelo, indice)
+            for campo in modelo._meta.local_fields:
+                if campo.remote_field:
+                    editor.execute(editor._create_fk_sql(modelo, campo, '_fk_%(to_table)s_%(to_column)s'))
+    return True
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import (
     Newsletter, Suscriptor, Trabajador, UserProfile, Usuario, Contenido, EstadoPublicacion, 
-    Publicidad, EspacioReferencia, ImagenLink, upload_to_imgbb,
+    Publicidad, EspacioReferencia, ImagenLink, ContenidoImagen, ArtistaImagen, cambios_de_imagenes, upload_to_imgbb,
     PasswordResetToken, TiendaMadeInArg, ProductoMadeInArg, ArtistaMadeInArg,
     get_madeinarg_stats
 )
@@ -9,10 +9,80 @@ import json
 from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.utils.text import slugify
 import json
 
 User = get_user_model()
 
+
+# ==================== CAMPOS DINÁMICOS (?fields= / ?exclude=) ====================
+
+def campos_solicitados(request):
+    """Retorna (campos, excluidos) pedidos en la URL; campos es None si no se limitaron"""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, set()
+    
+    def parsear(parametro):
+        valor = request.query_params.get(parametro, '')
+        return {campo.strip() for campo in valor.split(',') if campo.strip()}
+    
+    return parsear('fields') or None, parsear('exclude')
+
+
+class CamposDinamicosMixin:
+    """Recorta los campos de salida del serializer según ?fields= y ?exclude="""
+    
+    # Columnas del modelo que usa cada campo calculado (permite aplicar .only() sobre ellos)
+    DEPENDENCIAS_CAMPOS = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos, excluidos = campos_solicitados(self.context.get('request'))
+        if campos is None and not excluidos:
+            return
+        
+        for nombre in list(self.fields):
+            if (campos is not None and nombre not in campos) or nombre in excluidos:
+                self.fields.pop(nombre)
+    
+    def plan_de_consulta(self):
+        """
+        Retorna (columnas, select_related, prefetch_related) necesarios para los campos
+        actuales, o None si algún campo depende de datos que no se pueden determinar.
+        """
+        modelo = self.Meta.model
+        columnas, select, prefetch = {modelo._meta.pk.name}, set(), set()
+        
+        for nombre, campo in self.fields.items():
+            if campo.write_only:
+                continue
+            if nombre in self.DEPENDENCIAS_CAMPOS:
+                rutas = self.DEPENDENCIAS_CAMPOS[nombre]
+            elif isinstance(campo, serializers.SerializerMethodField) or campo.source == '*':
+                return None
+            else:
+                rutas = ['__'.join(campo.source_attrs)]
+            
+            for ruta in rutas:
+                partes = ruta.split('__')
+                try:
+                    campo_modelo = modelo._meta.get_field(partes[0])
+                except FieldDoesNotExist:
+                    return None
+                
+                if campo_modelo.many_to_many or campo_modelo.one_to_many:
+                    prefetch.add(partes[0])
+                elif not campo_modelo.concrete or len(partes) > 2:
+                    return None
+                elif len(partes) == 2:
+                    select.add(partes[0])
+                    columnas.update([partes[0], ruta])
+                else:
+                    columnas.add(ruta)
+        
+        return columnas, select, prefetch
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -186,7 +256,20 @@ class ImagenLinkSerializer(serializers.ModelSerializer):
         model = ImagenLink
         fields = ['id', 'numero_imagen', 'url_tienda', 'texto_descripcion']
 
-class ContenidoSerializer(serializers.ModelSerializer):
+class ImagenPosicionField(serializers.Field):
+    """Expone la imagen de una posición de la galería con su antigua clave imagen_N / backstage_N"""
+    
+    def __init__(self, *clave, **kwargs):
+        # (tipo, posicion) para Contenido, (posicion,) para la galería de artistas
+        self.clave = clave
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+    
+    def to_representation(self, obj):
+        return obj.imagen_en(*self.clave)
+
+
+class ContenidoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     autor = serializers.PrimaryKeyRelatedField(queryset=Trabajador.objects.all())
     estado = serializers.PrimaryKeyRelatedField(queryset=EstadoPublicacion.objects.all())
     
@@ -211,11 +294,26 @@ class ContenidoSerializer(serializers.ModelSerializer):
     # ADD READ-ONLY FIELD FOR RESPONSE
     espacios_referencia_display = serializers.SerializerMethodField(read_only=True)
 
+    DEPENDENCIAS_CAMPOS = {
+        'autor_data': ['autor__nombre', 'autor__apellido', 'autor__foto_perfil', 'autor__foto_perfil_local'],
+        'estado_data': ['estado'],
+        'imagenes_urls': ['imagenes'],
+        'backstage_urls': ['categoria', 'imagenes'],
+        'tags_marcas_list': ['categoria', 'tags_marcas'],
+        'espacios_referencia_display': ['espacios_referencia'],
+        # Claves imagen_N / backstage_N generadas en get_fields
+        **{
+            f'{tipo}_{i}': ['imagenes']
+            for tipo, _ in ContenidoImagen.TIPO_CHOICES
+            for i in range(1, ContenidoImagen.POSICIONES_LEGADO + 1)
+        },
+    }
+    
     class Meta:
         model = Contenido
         fields = [
             # Campos básicos heredados de ContenidoBase
-            'id', 'categoria', 'titulo', 'autor', 'fecha_publicacion', 'estado',
+            'id', 'categoria', 'titulo', 'slug', 'autor', 'fecha_publicacion', 'estado',
             
             # Campos específicos por categoría
             'numero_issue', 'nombre_modelo', 'subtitulo_issue', 'frase_final_issue', 
@@ -232,26 +330,21 @@ class ContenidoSerializer(serializers.ModelSerializer):
             # Datos calculados
             'autor_data', 'estado_data', 'imagenes_urls', 'backstage_urls', 
             'tags_marcas_list',
-        ] + [
-            # Campos de imágenes principales heredados (1-30)
-            f'imagen_{i}' for i in range(1, 31)
-        ] + [
-            # Campos de imágenes locales (write-only)
-            f'imagen_{i}_local' for i in range(1, 31)
-        ] + [
-            # Campos de backstage para Issues (1-30)
-            f'backstage_{i}' for i in range(1, 31)
-        ] + [
-            # Campos de backstage locales (write-only)
-            f'backstage_{i}_local' for i in range(1, 31)
         ]
         
         extra_kwargs = {
-            # Hacer que los campos locales sean write-only
-            **{f'imagen_{i}_local': {'write_only': True, 'required': False} for i in range(1, 31)},
-            **{f'backstage_{i}_local': {'write_only': True, 'required': False} for i in range(1, 31)},
+            # El slug se genera al crear el contenido
+            'slug': {'read_only': True},
         }
 
+    def get_fields(self):
+        """Agrega las claves imagen_N / backstage_N que la API devolvía cuando eran columnas"""
+        campos = super().get_fields()
+        for tipo, _ in ContenidoImagen.TIPO_CHOICES:
+            for posicion in range(1, ContenidoImagen.POSICIONES_LEGADO + 1):
+                campos[f'{tipo}_{posicion}'] = ImagenPosicionField(tipo, posicion)
+        return campos
+
     def get_espacios_referencia_display(self, obj):
         """Return espacios_referencia for read operations"""
         return EspacioReferenciaSerializer(obj.espacios_referencia.all(), many=True).data
@@ -321,7 +414,15 @@ class ContenidoSerializer(serializers.ModelSerializer):
                 except json.JSONDecodeError:
                     raise ValidationError({'espacios_referencia': 'Formato JSON inválido.'})
         
-        return super().to_internal_value(processed_data)
+        # Las imágenes (imagen_N, imagen_N_local, backstage_N...) van a la tabla ContenidoImagen
+        try:
+            imagenes = cambios_de_imagenes(processed_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        
+        validated_data = super().to_internal_value(processed_data)
+        validated_data['imagenes'] = imagenes
+        return validated_data
 
     def get_autor_data(self, obj):
         """Retorna datos del autor si se solicita"""
@@ -336,11 +437,13 @@ class ContenidoSerializer(serializers.ModelSerializer):
 
     def get_estado_data(self, obj):
         """Retorna datos del estado"""
-        if obj.estado:
+        # Se resuelve con el registro de estados para no depender del join
+        nombre = EstadoPublicacion.nombre_de(obj.estado_id)
+        if nombre:
             return {
-                'id': obj.estado.id,
-                'nombre': obj.estado.nombre_estado,
-                'display': obj.estado.get_nombre_estado_display(),
+                'id': obj.estado_id,
+                'nombre': nombre,
+                'display': dict(EstadoPublicacion.ESTADO_CHOICES).get(nombre, nombre),
             }
         return None
 
@@ -396,32 +499,14 @@ class ContenidoSerializer(serializers.ModelSerializer):
         espacios_referencia_data = validated_data.pop('espacios_referencia', [])
         imagen_links_data = validated_data.pop('imagen_links', [])
         
-        # Extraer imágenes locales
-        imagenes_locales = {}
-        backstage_locales = {}
-        
-        for i in range(1, 31):
-            local_field = f'imagen_{i}_local'
-            backstage_field = f'backstage_{i}_local'
-            
-            if local_field in validated_data:
-                imagenes_locales[i] = validated_data.pop(local_field)
-            
-            if backstage_field in validated_data:
-                backstage_locales[i] = validated_data.pop(backstage_field)
+        # Extraer imágenes (URLs y archivos)
+        imagenes = validated_data.pop('imagenes', {})
 
         # Crear el contenido
         contenido = Contenido.objects.create(**validated_data)
 
-        # Asignar imágenes locales
-        for i, imagen in imagenes_locales.items():
-            setattr(contenido, f'imagen_{i}_local', imagen)
-        
-        for i, backstage in backstage_locales.items():
-            setattr(contenido, f'backstage_{i}_local', backstage)
-
-        # Guardar para procesar imágenes
-        if imagenes_locales or backstage_locales:
+        # Guardar la galería y la portada
+        if contenido.guardar_imagenes(imagenes):
             contenido.save()
 
         # Crear espacios de referencia
@@ -490,19 +575,8 @@ class ContenidoSerializer(serializers.ModelSerializer):
                 update_data[field] = value
                 print(f"Processed {field}: {value}")
         
-        # Handle image fields
-        image_fields = []
-        for i in range(1, 31):
-            image_field = f'imagen_{i}_local'
-            if image_field in request.FILES:
-                image_fields.append((i, request.FILES[image_field]))
-        
-        # Handle backstage fields for issues
-        backstage_fields = []
-        for i in range(1, 31):
-            backstage_field = f'backstage_{i}_local'
-            if backstage_field in request.FILES:
-                backstage_fields.append((i, request.FILES[backstage_field]))
+        # Handle image fields (imagen_N / backstage_N and their _local files)
+        imagenes = cambios_de_imagenes(request.data)
         
         try:
             # Update basic fields using Django ORM
@@ -531,11 +605,7 @@ class ContenidoSerializer(serializers.ModelSerializer):
                     setattr(instance, field, value)
             
             # Handle image uploads
-            for i, image_file in image_fields:
-                setattr(instance, f'imagen_{i}_local', image_file)
-            
-            for i, backstage_file in backstage_fields:
-                setattr(instance, f'backstage_{i}_local', backstage_file)
+            instance.guardar_imagenes(imagenes)
             
             # Save the instance
             instance.save()
@@ -590,12 +660,16 @@ class ContenidoSerializer(serializers.ModelSerializer):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # NUEVO: Serializers para TiendaMadeInArg y ProductoMadeInArg
-class ProductoMadeInArgSerializer(serializers.ModelSerializer):
+class ProductoMadeInArgSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     imagen_local = serializers.ImageField(write_only=True, required=False)
     imagen = serializers.URLField(read_only=True)
     tienda_nombre = serializers.CharField(source='tienda.titulo', read_only=True)
     precio_formatted = serializers.SerializerMethodField(read_only=True)
     
+    DEPENDENCIAS_CAMPOS = {
+        'precio_formatted': ['precio', 'moneda'],
+    }
+    
     class Meta:
         model = ProductoMadeInArg
         fields = [
@@ -607,9 +681,8 @@ class ProductoMadeInArgSerializer(serializers.ModelSerializer):
     def get_precio_formatted(self, obj):
         return obj.get_precio_formatted()
 
-class ArtistaMadeInArgListSerializer(serializers.ModelSerializer):
-    imagen_principal = serializers.SerializerMethodField(read_only=True)
-    total_imagenes = serializers.SerializerMethodField(read_only=True)
+class ArtistaMadeInArgListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # imagen_principal y total_imagenes son columnas mantenidas al escribir la galería
     
     class Meta:
         model = ArtistaMadeInArg
@@ -617,13 +690,10 @@ class ArtistaMadeInArgListSerializer(serializers.ModelSerializer):
             'id', 'titulo', 'subtitulo', 'imagen_principal', 'total_imagenes',
             'fecha_creacion', 'activo', 'video_youtube'
         ]
+        read_only_fields = ['imagen_principal', 'total_imagenes']
     
-    def get_imagen_principal(self, obj):
-        imagenes = obj.get_imagenes_galeria()
-        return imagenes[0] if imagenes else None
-    
-    def get_total_imagenes(self, obj):
-        return len(obj.get_imagenes_galeria())
+    # Columnas que se cargan con .only() en los listados
+    CAMPOS_QUERYSET = Meta.fields
 
 # Serializer completo que incluye tiendas y artistas para MadeInArg
 class MadeInArgCompletaSerializer(ContenidoSerializer):
@@ -640,7 +710,9 @@ class MadeInArgCompletaSerializer(ContenidoSerializer):
         return TiendaMadeInArgListSerializer(tiendas, many=True).data
     
     def get_artistas_activos(self, obj):
-        artistas = ArtistaMadeInArg.objects.filter(activo=True).order_by('-fecha_creacion')[:10]
+        artistas = ArtistaMadeInArg.objects.filter(activo=True).only(
+            *ArtistaMadeInArgListSerializer.CAMPOS_QUERYSET
+        ).order_by('-fecha_creacion')[:10]
         return ArtistaMadeInArgListSerializer(artistas, many=True).data
     
     def get_estadisticas(self, obj):
@@ -664,7 +736,7 @@ class MadeInArgSerializer(ContenidoSerializer):
             self.initial_data = {**self.initial_data, 'categoria': 'madeinarg'}
 
 
-class TiendaMadeInArgSerializer(serializers.ModelSerializer):
+class TiendaMadeInArgSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     imagen_portada_local = serializers.ImageField(write_only=True, required=False)
     imagen_portada = serializers.URLField(read_only=True)
     productos = ProductoMadeInArgSerializer(many=True, read_only=True)
@@ -672,6 +744,12 @@ class TiendaMadeInArgSerializer(serializers.ModelSerializer):
     productos_por_categoria = serializers.SerializerMethodField(read_only=True)
     creado_por_nombre = serializers.CharField(source='creado_por.nombre', read_only=True)
     
+    # total_productos viene anotado; productos_por_categoria agrupa el prefetch de productos
+    DEPENDENCIAS_CAMPOS = {
+        'total_productos': [],
+        'productos_por_categoria': ['productos'],
+    }
+    
     class Meta:
         model = TiendaMadeInArg
         fields = [
@@ -688,12 +766,18 @@ class TiendaMadeInArgSerializer(serializers.ModelSerializer):
         return obj.get_total_productos()
     
     def get_productos_por_categoria(self, obj):
+        # Se agrupan los productos del prefetch en lugar de consultar cada categoría
+        por_categoria = {}
+        for producto in obj.productos.all():
+            if producto.activo:
+                por_categoria.setdefault(producto.categoria, []).append(producto)
+
         result = {}
         for categoria, nombre in ProductoMadeInArg.CATEGORIA_CHOICES:
-            productos = obj.get_productos_por_categoria(categoria)
+            productos = por_categoria.get(categoria, [])
             result[categoria] = {
                 'nombre': nombre,
-                'count': productos.count(),
+                'count': len(productos),
                 'productos': ProductoMadeInArgSerializer(productos, many=True).data
             }
         return result
@@ -733,33 +817,17 @@ class TiendaMadeInArgSerializer(serializers.ModelSerializer):
         return instance
 
 # NUEVO: Serializer para ArtistaMadeInArg
-class ArtistaMadeInArgSerializer(serializers.ModelSerializer):
-    # Campos de imágenes locales (write-only) - solo los primeros 20
-    imagen_1_local = serializers.ImageField(write_only=True, required=False)
-    imagen_2_local = serializers.ImageField(write_only=True, required=False)
-    imagen_3_local = serializers.ImageField(write_only=True, required=False)
-    imagen_4_local = serializers.ImageField(write_only=True, required=False)
-    imagen_5_local = serializers.ImageField(write_only=True, required=False)
-    imagen_6_local = serializers.ImageField(write_only=True, required=False)
-    imagen_7_local = serializers.ImageField(write_only=True, required=False)
-    imagen_8_local = serializers.ImageField(write_only=True, required=False)
-    imagen_9_local = serializers.ImageField(write_only=True, required=False)
-    imagen_10_local = serializers.ImageField(write_only=True, required=False)
-    imagen_11_local = serializers.ImageField(write_only=True, required=False)
-    imagen_12_local = serializers.ImageField(write_only=True, required=False)
-    imagen_13_local = serializers.ImageField(write_only=True, required=False)
-    imagen_14_local = serializers.ImageField(write_only=True, required=False)
-    imagen_15_local = serializers.ImageField(write_only=True, required=False)
-    imagen_16_local = serializers.ImageField(write_only=True, required=False)
-    imagen_17_local = serializers.ImageField(write_only=True, required=False)
-    imagen_18_local = serializers.ImageField(write_only=True, required=False)
-    imagen_19_local = serializers.ImageField(write_only=True, required=False)
-    imagen_20_local = serializers.ImageField(write_only=True, required=False)
-    
+class ArtistaMadeInArgSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Campos calculados
     imagenes_galeria = serializers.SerializerMethodField(read_only=True)
     creado_por_nombre = serializers.CharField(source='creado_por.nombre', read_only=True)
     
+    DEPENDENCIAS_CAMPOS = {
+        'imagenes_galeria': ['imagenes'],
+        # Claves imagen_N generadas en get_fields
+        **{f'imagen_{i}': ['imagenes'] for i in range(1, ArtistaImagen.POSICIONES_LEGADO + 1)},
+    }
+    
     class Meta:
         model = ArtistaMadeInArg
         fields = [
@@ -772,17 +840,8 @@ class ArtistaMadeInArgSerializer(serializers.ModelSerializer):
             # Metadatos
             'fecha_creacion', 'fecha_actualizacion', 'activo', 'creado_por', 'creado_por_nombre',
             
-            # Imágenes URLs (read-only) - las 20 imágenes
-            'imagen_1', 'imagen_2', 'imagen_3', 'imagen_4', 'imagen_5',
-            'imagen_6', 'imagen_7', 'imagen_8', 'imagen_9', 'imagen_10',
-            'imagen_11', 'imagen_12', 'imagen_13', 'imagen_14', 'imagen_15',
-            'imagen_16', 'imagen_17', 'imagen_18', 'imagen_19', 'imagen_20',
-            
-            # Imágenes locales (write-only)
-            'imagen_1_local', 'imagen_2_local', 'imagen_3_local', 'imagen_4_local', 'imagen_5_local',
-            'imagen_6_local', 'imagen_7_local', 'imagen_8_local', 'imagen_9_local', 'imagen_10_local',
-            'imagen_11_local', 'imagen_12_local', 'imagen_13_local', 'imagen_14_local', 'imagen_15_local',
-            'imagen_16_local', 'imagen_17_local', 'imagen_18_local', 'imagen_19_local', 'imagen_20_local',
+            # Resumen de la galería
+            'imagen_principal', 'total_imagenes',
             
             # Campos calculados
             'imagenes_galeria'
@@ -790,19 +849,35 @@ class ArtistaMadeInArgSerializer(serializers.ModelSerializer):
         
         # ADD THIS: Configure creado_por as read_only
         extra_kwargs = {
-            'creado_por': {'required': False, 'read_only': True}  # Make it read_only like in TiendaMadeInArgSerializer
+            'creado_por': {'required': False, 'read_only': True},  # Make it read_only like in TiendaMadeInArgSerializer
+            'imagen_principal': {'read_only': True},
+            'total_imagenes': {'read_only': True},
         }
     
+    def get_fields(self):
+        """Agrega las claves imagen_N que la API devolvía cuando eran columnas"""
+        campos = super().get_fields()
+        for posicion in range(1, ArtistaImagen.POSICIONES_LEGADO + 1):
+            campos[f'imagen_{posicion}'] = ImagenPosicionField(posicion)
+        return campos
+    
+    def to_internal_value(self, data):
+        # Las imágenes (imagen_N y imagen_N_local) van a la tabla ArtistaImagen
+        try:
+            imagenes = cambios_de_imagenes(data, tipos=(ContenidoImagen.TIPO_IMAGEN,))
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        
+        validated_data = super().to_internal_value(data)
+        validated_data['imagenes'] = {posicion: valor for (_, posicion), valor in imagenes.items()}
+        return validated_data
+    
     def get_imagenes_galeria(self, obj):
         return obj.get_imagenes_galeria()
     
     def create(self, validated_data):
-        # Extraer imágenes locales
-        imagenes_locales = {}
-        for i in range(1, 21):
-            local_field = f'imagen_{i}_local'
-            if local_field in validated_data:
-                imagenes_locales[i] = validated_data.pop(local_field)
+        # Extraer imágenes (URLs y archivos)
+        imagenes = validated_data.pop('imagenes', {})
         
         # Asignar el usuario autenticado como creador si no se especifica
         if 'creado_por' not in validated_data:
@@ -819,41 +894,34 @@ class ArtistaMadeInArgSerializer(serializers.ModelSerializer):
         # Crear el artista
         artista = ArtistaMadeInArg.objects.create(**validated_data)
         
-        # Asignar imágenes locales
-        for i, imagen in imagenes_locales.items():
-            setattr(artista, f'imagen_{i}_local', imagen)
-        
-        # Guardar para procesar imágenes
-        if imagenes_locales:
+        # Guardar la galería y su resumen
+        if artista.guardar_imagenes(imagenes):
             artista.save()
         
         return artista
     
     def update(self, instance, validated_data):
-        # Extraer imágenes locales
-        imagenes_locales = {}
-        for i in range(1, 21):
-            local_field = f'imagen_{i}_local'
-            if local_field in validated_data:
-                imagenes_locales[i] = validated_data.pop(local_field)
+        # Extraer imágenes (URLs y archivos)
+        imagenes = validated_data.pop('imagenes', {})
         
         # Actualizar campos básicos
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
-        # Asignar nuevas imágenes locales
-        for i, imagen in imagenes_locales.items():
-            setattr(instance, f'imagen_{i}_local', imagen)
-        
-        # Guardar para procesar imágenes
+        # La galería se escribe antes de guardar para que el resumen quede en la misma fila
+        instance.guardar_imagenes(imagenes)
         instance.save()
         return instance
 
 # Serializers simplificados para listas
-class TiendaMadeInArgListSerializer(serializers.ModelSerializer):
+class TiendaMadeInArgListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     total_productos = serializers.SerializerMethodField(read_only=True)
     imagen_portada = serializers.URLField(read_only=True)
     
+    DEPENDENCIAS_CAMPOS = {
+        'total_productos': [],
+    }
+    
     class Meta:
         model = TiendaMadeInArg
         fields = [
@@ -864,11 +932,15 @@ class TiendaMadeInArgListSerializer(serializers.ModelSerializer):
     def get_total_productos(self, obj):
         return obj.get_total_productos()
 
-class ProductoMadeInArgListSerializer(serializers.ModelSerializer):
+class ProductoMadeInArgListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     tienda_nombre = serializers.CharField(source='tienda.titulo', read_only=True)
     imagen = serializers.URLField(read_only=True)
     precio_formatted = serializers.SerializerMethodField(read_only=True)
     
+    DEPENDENCIAS_CAMPOS = {
+        'precio_formatted': ['precio', 'moneda'],
+    }
+    
     class Meta:
         model = ProductoMadeInArg
         fields = [
@@ -925,7 +997,8 @@ class ClubPompaSerializer(ContenidoSerializer):
     
     def get_espacios_referencia_display(self, obj):
         """Método para obtener espacios de referencia con formato personalizado"""
-        espacios = obj.espacios_referencia.all().order_by('orden')
+        # El orden por 'orden' viene del Meta del modelo; así se usa el prefetch
+        espacios = obj.espacios_referencia.all()
         return [{
             'id': espacio.id,
             'texto_descriptivo': espacio.texto_descriptivo,
@@ -940,7 +1013,7 @@ class ClubPompaSerializer(ContenidoSerializer):
         
         # Forzar la inclusión de espacios_referencia si no están presentes
         if 'espacios_referencia' not in data or not data['espacios_referencia']:
-            espacios = instance.espacios_referencia.all().order_by('orden')
+            espacios = instance.espacios_referencia.all()
             data['espacios_referencia'] = [{
                 'id': espacio.id,
                 'texto_descriptivo': espacio.texto_descriptivo,
@@ -951,6 +1024,40 @@ class ClubPompaSerializer(ContenidoSerializer):
         
         return data
 
+# Proyección liviana para tarjetas en listados
+class ContenidoCardSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Serializer de solo lectura con lo mínimo que necesita una tarjeta del frontend"""
+    slug = serializers.SerializerMethodField()
+    cover = serializers.URLField(source='portada', read_only=True)
+    autor = serializers.SerializerMethodField()
+
+    # Columnas que se cargan con .only() para no traer la fila completa de Contenido
+    CAMPOS_QUERYSET = [
+        'id', 'titulo', 'slug', 'portada', 'fecha_publicacion', 'categoria',
+        'autor__id', 'autor__nombre', 'autor__apellido',
+    ]
+
+    DEPENDENCIAS_CAMPOS = {
+        'slug': ['slug', 'titulo'],
+        'autor': ['autor__nombre', 'autor__apellido'],
+    }
+    
+    class Meta:
+        model = Contenido
+        fields = ['id', 'titulo', 'slug', 'cover', 'fecha_publicacion', 'autor', 'categoria']
+        read_only_fields = fields
+
+    def get_slug(self, obj):
+        # Contenido anterior a la columna slug que todavía no pasó por generar_slugs
+        return obj.slug or slugify(obj.titulo)
+
+    def get_autor(self, obj):
+        return {
+            'id': obj.autor.id,
+            'nombre': obj.autor.nombre,
+            'apellido': obj.autor.apellido,
+        }
+
 # Serializers para recuperación de contraseña
 class RequestPasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
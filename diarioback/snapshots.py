@@ -0,0 +1,278 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils._os import safe_join
+from rest_framework.test import APIRequestFactory
+from .renderers import ORJSONRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Directorio donde se escriben los snapshots; los sirve la vista servir_snapshot (diarioback/snapshots/)
+SNAPSHOTS_ROOT = getattr(settings, 'SNAPSHOTS_ROOT', os.path.join(settings.BASE_DIR, 'snapshots'))
+
+# Feeds públicos que se pre-renderizan, con la misma ruta que en la API.
+# Los generales listan contenido de todas las categorías
+RUTAS_GENERALES = (
+    'api/v1/home/',
+    'api/v1/contenido/recientes/',
+    'api/v1/contenido/destacados/',
+    'api/v1/contenido/mas_vistas/',
+    'api/v1/contenido/mas_leidas/',
+)
+RUTAS_POR_CATEGORIA = {
+    'editorials': (
+        'api/v1/contenido/editorials/',
+        'api/v1/editorials/',
+        'api/v1/editorials/recientes/',
+        'api/v1/editorials/destacados/',
+    ),
+    'issues': (
+        'api/v1/contenido/issues/',
+        'api/v1/issues/',
+        'api/v1/issues/recientes/',
+    ),
+    'madeinarg': (
+        'api/v1/contenido/madeinarg/',
+    ),
+    'news': (
+        'api/v1/contenido/news/',
+        'api/v1/news/',
+        'api/v1/news/recientes/',
+        'api/v1/news/destacadas/',
+    ),
+    'club_pompa': (
+        'api/v1/contenido/club_pompa/',
+        'api/v1/club-pompa/',
+        'api/v1/club-pompa/recientes/',
+        'api/v1/club-pompa/destacados/',
+    ),
+}
+RUTAS_FEEDS = (
+    RUTAS_GENERALES
+    + tuple(ruta for rutas in RUTAS_POR_CATEGORIA.values() for ruta in rutas)
+    + ('api/v1/madeinarg/resumen/',)
+)
+# Feeds que salen de los rankings materializados: se regeneran al recalcularlos
+RUTAS_RANKING = (
+    'api/v1/home/',
+    'api/v1/contenido/destacados/',
+    'api/v1/contenido/mas_vistas/',
+    'api/v1/contenido/mas_leidas/',
+    'api/v1/editorials/destacados/',
+    'api/v1/news/destacadas/',
+    'api/v1/club-pompa/destacados/',
+)
+
+ARCHIVO_INDICE = 'index.json'
+ARCHIVO_MANIFIESTO = 'manifest.json'
+
+DIRECTORIO_DETALLES = 'api/v1/contenido'
+_ruta_detalle_re = re.compile(r'^api/v1/contenido/\d+/$')
+
+# Las exportaciones en segundo plano se serializan para no pisar el manifiesto
+_lock_exportacion = threading.Lock()
+
+
+def _prefijo_api():
+    """Prefijo con el que está montada la app (ej: /diarioback/)"""
+    return reverse('home')[:-len('api/v1/home/')]
+
+
+def _temporal(nombre, datos):
+    """Escribe los datos en un temporal único junto a `nombre` (otro proceso puede estar exportando)"""
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(nombre), prefix='.tmp-')
+    with os.fdopen(descriptor, 'wb') as f:
+        f.write(datos)
+    os.chmod(temporal, 0o644)
+    return temporal
+
+
+def _escribir(destino, ruta, contenido):
+    """Escribe el archivo de forma atómica junto a sus versiones precomprimidas; retorna su hash"""
+    archivo = os.path.join(destino, ruta, ARCHIVO_INDICE)
+    os.makedirs(os.path.dirname(archivo), exist_ok=True)
+
+    variantes = {archivo: contenido, f'{archivo}.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes[f'{archivo}.br'] = brotli.compress(contenido)
+
+    # Primero se escriben todos los temporales y después se reemplazan juntos: un lector
+    # nunca ve un archivo a medias y las variantes quedan desfasadas el menor tiempo posible
+    temporales = {nombre: _temporal(nombre, datos) for nombre, datos in variantes.items()}
+    for nombre, temporal in temporales.items():
+        os.replace(temporal, nombre)
+
+    return hashlib.md5(contenido).hexdigest()[:12]
+
+
+def ruta_archivo(destino, ruta):
+    """
+    Archivo de disco de una ruta de snapshot ('api/v1/.../' o el manifiesto);
+    None si la ruta no corresponde a un snapshot o sale del directorio.
+    """
+    if ruta == ARCHIVO_MANIFIESTO:
+        return os.path.join(destino, ARCHIVO_MANIFIESTO)
+    if not ruta.endswith('/'):
+        return None
+    try:
+        return safe_join(destino, ruta, ARCHIVO_INDICE)
+    except SuspiciousFileOperation:
+        return None
+
+
+def rutas_de_categorias(*categorias):
+    """Feeds afectados al cambiar contenido de esas categorías: los generales y los de cada categoría"""
+    rutas = list(RUTAS_GENERALES)
+    for categoria in dict.fromkeys(categorias):
+        rutas.extend(RUTAS_POR_CATEGORIA.get(categoria, ()))
+    return tuple(rutas)
+
+
+def _eliminar(destino, ruta):
+    archivo = os.path.join(destino, ruta, ARCHIVO_INDICE)
+    for nombre in (archivo, f'{archivo}.gz', f'{archivo}.br'):
+        if os.path.exists(nombre):
+            os.remove(nombre)
+
+
+def _detalles_exportados(destino, archivos):
+    """Rutas de detalle que figuran en el manifiesto o que existen en disco"""
+    rutas = {ruta for ruta in archivos if _ruta_detalle_re.match(ruta)}
+    directorio = os.path.join(destino, DIRECTORIO_DETALLES)
+    if os.path.isdir(directorio):
+        rutas.update(f'{DIRECTORIO_DETALLES}/{nombre}/' for nombre in os.listdir(directorio) if nombre.isdigit())
+    return rutas
+
+
+def _renderizar_feed(factory, prefijo, ruta):
+    """Ejecuta la vista pública de la ruta y retorna el JSON o None si no respondió 200"""
+    url = prefijo + ruta
+    match = resolve(url)
+    response = match.func(factory.get(url), *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return None
+    return ORJSONRenderer().render(response.data)
+
+
+def _renderizar_detalle(contenido):
+    """Serializa el detalle igual que retrieve, sin registrar una visita"""
+    from .serializers import ContenidoSerializer
+
+    return ORJSONRenderer().render(
+        ContenidoSerializer(contenido, context={'request': None, 'include_autor': True}).data
+    )
+
+
+def exportar_snapshots(destino=None, contenidos=None, incluir_detalles=True, rutas=RUTAS_FEEDS):
+    """
+    Pre-renderiza los feeds públicos (`rutas`) y el detalle de cada contenido publicado.
+
+    Cada ruta de la API se escribe en <destino>/<ruta>/index.json con sus
+    variantes .gz (y .br si está instalado brotli). El manifiesto registra el
+    hash de cada archivo para versionar las URLs. Con `contenidos` solo se
+    regeneran esos detalles (eliminando los que ya no están publicados); en
+    una exportación completa se eliminan todos los detalles que ya no se
+    publican, aunque se hayan despublicado con la exportación automática apagada.
+    Retorna la cantidad de archivos escritos.
+    """
+    from .models import EstadoPublicacion
+    from .views import ContenidoViewSet
+
+    destino = destino or SNAPSHOTS_ROOT
+    factory = APIRequestFactory()
+    prefijo = _prefijo_api()
+
+    with _lock_exportacion:
+        ruta_manifiesto = os.path.join(destino, ARCHIVO_MANIFIESTO)
+        manifiesto = {'archivos': {}}
+        if os.path.exists(ruta_manifiesto):
+            with open(ruta_manifiesto) as f:
+                manifiesto = json.load(f)
+
+        completa = contenidos is None and incluir_detalles
+        if completa:
+            # Los detalles se vuelven a escribir; los que queden afuera se borran al final
+            anteriores = _detalles_exportados(destino, manifiesto['archivos'])
+            manifiesto['archivos'] = {
+                ruta: valor for ruta, valor in manifiesto['archivos'].items() if ruta not in anteriores
+            }
+
+        archivos = manifiesto['archivos']
+        escritos = 0
+        for ruta in rutas:
+            contenido = _renderizar_feed(factory, prefijo, ruta)
+            if contenido is not None:
+                archivos[ruta] = _escribir(destino, ruta, contenido)
+                escritos += 1
+
+        if incluir_detalles:
+            publicados = ContenidoViewSet.queryset.filter(
+                EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO)
+            )
+            if contenidos is not None:
+                publicados = publicados.filter(pk__in=contenidos)
+                for pk in set(contenidos) - set(publicados.values_list('pk', flat=True)):
+                    ruta = f'api/v1/contenido/{pk}/'
+                    _eliminar(destino, ruta)
+                    archivos.pop(ruta, None)
+
+            for contenido in publicados.iterator(chunk_size=200):
+                ruta = f'api/v1/contenido/{contenido.pk}/'
+                archivos[ruta] = _escribir(destino, ruta, _renderizar_detalle(contenido))
+                escritos += 1
+
+        if completa:
+            for ruta in anteriores - set(archivos):
+                _eliminar(destino, ruta)
+
+        manifiesto['generado'] = timezone.now().isoformat()
+        _escribir_manifiesto(ruta_manifiesto, manifiesto)
+
+    return escritos
+
+
+def _escribir_manifiesto(ruta, manifiesto):
+    datos = json.dumps(manifiesto, indent=2, sort_keys=True).encode('utf-8')
+    os.replace(_temporal(ruta, datos), ruta)
+
+
+def programar_exportacion(*pks, categorias=None):
+    """
+    Regenera los snapshots afectados por los contenidos indicados en segundo
+    plano, después del commit: sus detalles, los feeds generales y los de
+    `categorias` (todos los feeds si no se indican). Solo actúa si
+    SNAPSHOTS_AUTOEXPORTAR está activo.
+    """
+    if not getattr(settings, 'SNAPSHOTS_AUTOEXPORTAR', False):
+        return
+    rutas = RUTAS_FEEDS if categorias is None else rutas_de_categorias(*filter(None, categorias))
+
+    def tarea():
+        try:
+            exportar_snapshots(contenidos=list(pks), rutas=rutas)
+        except Exception as e:
+            print(f"Error al exportar snapshots: {str(e)}")
+        finally:
+            connection.close()
+
+    transaction.on_commit(lambda: threading.Thread(target=tarea, daemon=True).start())
+
+
+def exportar_rankings():
+    """Regenera los feeds que salen de los rankings (si SNAPSHOTS_AUTOEXPORTAR está activo); retorna los escritos"""
+    if not getattr(settings, 'SNAPSHOTS_AUTOEXPORTAR', False):
+        return 0
+    return exportar_snapshots(incluir_detalles=False, rutas=RUTAS_RANKING)
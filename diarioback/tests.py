@@ -1,3 +1,1063 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .cache_utils import AMBITO_RANKING, _contexto_separado, construir_clave_respuesta, invalidar_ambitos
+from .middleware import RegistroConsultas
+from .particiones import crear_particiones, eliminar_particiones_anteriores, esta_particionada, particionar
+from .renderers import MessagePackParser, ORJSONRenderer, msgpack
+from .snapshots import (
+    RUTAS_FEEDS, RUTAS_GENERALES, RUTAS_POR_CATEGORIA, RUTAS_RANKING, exportar_snapshots, rutas_de_categorias
+)
+from .models import (
+    Trabajador, Contenido, ContenidoImagen, EstadoPublicacion, EspacioReferencia, ImagenLink,
+    TiendaMadeInArg, ProductoMadeInArg, ArtistaMadeInArg, ContenidoVisita, ContenidoVisitaDiaria,
+    ContenidoVisitaHora, RankingContenido, actualizar_rankings, anotar_visitas_recientes, buffer_visitas,
+    consolidar_visitas, purgar_visitas, registrar_visita_contenido, volcar_visitas
+)
+
+
+def crear_datos(cantidad, autor):
+    """Crea contenido publicado en todas las categorías y datos de MadeInArg"""
+    publicado = EstadoPublicacion.objects.get(nombre_estado=EstadoPublicacion.PUBLICADO)
+    hoy = timezone.now().date()
+
+    for categoria, _ in Contenido.CATEGORIA_CHOICES:
+        for i in range(cantidad):
+            contenido = Contenido.objects.create(
+                categoria=categoria,
+                titulo=f'{categoria} {i}',
+                autor=autor,
+                fecha_publicacion=hoy,
+                estado=publicado,
+                portada='https://example.com/imagen.jpg',
+                tags_marcas='marca, otra',
+                subcategoria_madeinarg='calzado' if categoria == 'madeinarg' else None,
+            )
+            ContenidoImagen.objects.create(
+                contenido=contenido, posicion=1, url='https://example.com/imagen.jpg'
+            )
+            EspacioReferencia.objects.create(
+                contenido=contenido, texto_mostrar='Ver', url='https://example.com', orden=1
+            )
+            ImagenLink.objects.create(
+                contenido=contenido, numero_imagen=1, url_tienda='https://example.com'
+            )
+            ContenidoVisita.objects.create(contenido=contenido, ip_address='127.0.0.1')
+            ContenidoVisitaHora.objects.create(
+                contenido=contenido, hora=ContenidoVisitaHora.truncar(timezone.now()), visitas=1
+            )
+
+    for i in range(cantidad):
+        tienda = TiendaMadeInArg.objects.create(titulo=f'Tienda {i}', subtitulo='Sub', creado_por=autor)
+        for categoria, _ in ProductoMadeInArg.CATEGORIA_CHOICES[:3]:
+            ProductoMadeInArg.objects.create(
+                tienda=tienda, nombre=f'Producto {i}', categoria=categoria,
+                link_producto='https://example.com', precio=100
+            )
+        artista = ArtistaMadeInArg.objects.create(
+            titulo=f'Artista {i}', subtitulo='Sub', descripcion='Desc', creado_por=autor,
+            video_youtube='https://youtube.com/x'
+        )
+        artista.guardar_imagenes({1: 'https://example.com/artista.jpg'})
+        artista.save()
+
+
+# Sin volcados del buffer de visitas en medio de una medición de consultas
+@override_settings(VISITAS_VOLCADO_INTERVALO=3600)
+class DatosPublicadosTestCase(TestCase):
+    """Base de los tests: estados, un autor y CANTIDAD contenidos publicados por categoría"""
+    PREFIJO = '/diarioback/api/v1/'
+    CANTIDAD = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, _ in EstadoPublicacion.ESTADO_CHOICES:
+            EstadoPublicacion.objects.create(nombre_estado=nombre)
+        user = User.objects.create_user(username='redactor', password='clave')
+        cls.autor = Trabajador.objects.create(
+            user=user, nombre='Ana', apellido='Pérez', correo='ana@example.com',
+            foto_perfil='https://example.com/perfil.png'
+        )
+        crear_datos(cls.CANTIDAD, cls.autor)
+        # El registro de estados es del proceso: se carga acá y no dentro de una medición
+        EstadoPublicacion.registro()
+        cls.ids = {
+            'contenido': Contenido.objects.filter(categoria='club_pompa').first().pk,
+            'tienda': TiendaMadeInArg.objects.first().pk,
+            'producto': ProductoMadeInArg.objects.first().pk,
+            'artista': ArtistaMadeInArg.objects.first().pk,
+        }
+        cls.ids['slug'] = Contenido.objects.get(pk=cls.ids['contenido']).slug
+
+    def setUp(self):
+        cache.clear()
+        self.numero_ip = 0
+
+    def tearDown(self):
+        # Las visitas que quedaron en el buffer se escriben dentro de la transacción del test
+        volcar_visitas()
+
+    def _pedir(self, ruta):
+        """Hace el GET con la cache vacía y una IP nueva; retorna (response, consultas)"""
+        cache.clear()
+        self.numero_ip += 1
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(
+                self.PREFIJO + ruta.format(**self.ids),
+                REMOTE_ADDR=f'10.0.{self.numero_ip // 250}.{self.numero_ip % 250 + 1}'
+            )
+        return response, consultas
+
+
+class PresupuestoConsultasTestCase(DatosPublicadosTestCase):
+    """Controla la cantidad de consultas SQL de los endpoints públicos para detectar N+1"""
+
+    # (ruta, máximo de consultas con la cache vacía)
+    ENDPOINTS = [
+        ('contenido/', 1),
+        ('contenido/?vista=completa', 4),
+        ('contenido/{contenido}/', 8),
+        ('contenido/{contenido}-titulo/', 8),
+        ('contenido/{contenido}/?fields=id,titulo', 5),
+        ('contenido/slug/{slug}/', 9),
+        ('contenido/mas_vistas/', 3),
+        ('contenido/mas_vistas/?ventana=dia', 3),
+        ('contenido/mas_leidas/', 3),
+        ('contenido/recientes/', 2),
+        ('contenido/destacados/', 3),
+        ('contenido/estadisticas_visitas/', 1),
+        ('contenido/buscar/?q=news', 1),
+        ('contenido/editorials/', 2),
+        ('contenido/issues/', 2),
+        ('contenido/madeinarg/', 2),
+        ('contenido/news/', 2),
+        ('contenido/news/?vista=completa', 5),
+        ('contenido/news/?page_size=2', 2),
+        ('contenido/news/?ordering=-contador_visitas_total', 2),
+        ('contenido/club_pompa/', 2),
+        ('contenido/club_pompa/?vista=completa', 5),
+        ('home/', 16),
+        ('news/recientes/', 2),
+        ('news/destacadas/', 3),
+        ('club-pompa/destacados/', 3),
+        ('tiendas/', 5),
+        ('tiendas/{tienda}/', 6),
+        ('tiendas/destacadas/', 1),
+        ('tiendas/con_productos_categoria/?categoria=calzado', 1),
+        ('tiendas/{tienda}/productos-por-categoria/', 5),
+        ('productos/', 4),
+        ('productos/{producto}/', 4),
+        ('productos/por_categoria/?categoria=calzado', 1),
+        ('productos/destacados/', 1),
+        ('artistas/', 4),
+        ('artistas/{artista}/', 5),
+        ('artistas/destacados/', 1),
+        ('artistas/con_video/', 1),
+        ('artistas/{artista}/galeria/', 2),
+        ('madeinarg/resumen/', 16),
+        ('madeinarg/categoria/?categoria=calzado', 1),
+        ('madeinarg/estadisticas/', 8),
+        ('madeinarg/buscar/?q=Tienda', 3),
+        ('newsletter/', 1),
+    ]
+
+    # Búsquedas con icontains: no hay índice que evite el recorrido secuencial
+    SIN_EXPLAIN = {'contenido/buscar/?q=news', 'madeinarg/buscar/?q=Tienda'}
+
+    SEQ_SCAN = re.compile(r'Seq Scan on (diarioback_contenido|diarioback_contenidovisita)(\s|$)')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        actualizar_rankings()
+
+    def _medir(self):
+        return {ruta: len(self._pedir(ruta)[1]) for ruta, _ in self.ENDPOINTS}
+
+    def test_presupuesto_de_consultas(self):
+        for ruta, maximo in self.ENDPOINTS:
+            with self.subTest(ruta=ruta):
+                response, consultas = self._pedir(ruta)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(consultas), maximo,
+                    '\n'.join(consulta['sql'] for consulta in consultas.captured_queries)
+                )
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        antes = self._medir()
+        crear_datos(6, self.autor)
+        despues = self._medir()
+
+        for ruta, _ in self.ENDPOINTS:
+            with self.subTest(ruta=ruta):
+                self.assertEqual(antes[ruta], despues[ruta])
+
+    def test_feeds_publicos_no_hacen_join_con_estado(self):
+        for ruta, _ in self.ENDPOINTS:
+            _, consultas = self._pedir(ruta)
+            for consulta in consultas.captured_queries:
+                with self.subTest(ruta=ruta):
+                    self.assertNotIn('diarioback_estadopublicacion', consulta['sql'])
+
+    def test_presupuesto_de_consultas_por_request(self):
+        ruta = self.PREFIJO + 'contenido/?vista=completa'
+        response, consultas = self._pedir('contenido/?vista=completa')
+        total = len(consultas)
+        self.assertEqual(response['X-Consultas-SQL'], str(total))
+
+        with self.settings(PRESUPUESTO_CONSULTAS=1, PRESUPUESTO_CONSULTAS_MODO='rechazar'):
+            cache.clear()
+            with self.assertLogs('diarioback.middleware', 'WARNING') as logs:
+                response = Client().get(ruta)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['consultas'], total)
+        # El SQL va al log, nunca a la respuesta
+        self.assertNotIn(b'SELECT', response.content)
+        self.assertIn(f'{total} consultas', logs.output[0])
+
+        # Un IN con distinta cantidad de ids es la misma consulta
+        registro = RegistroConsultas()
+        for ids in ([1], [1, 2], [1, 2, 3]):
+            sql = 'SELECT * FROM t WHERE id IN (%s)' % ', '.join(['%s'] * len(ids))
+            registro(lambda *args: None, sql, ids, False, {})
+        self.assertEqual(registro.repetidas(2), [('SELECT * FROM t WHERE id IN (%s, ...)', 3)])
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN solo se valida en PostgreSQL')
+    def test_sin_seq_scan_en_contenido_ni_visitas(self):
+        for ruta, _ in self.ENDPOINTS:
+            if ruta in self.SIN_EXPLAIN:
+                continue
+            _, consultas = self._pedir(ruta)
+            for consulta in consultas.captured_queries:
+                sql = consulta['sql']
+                if not sql.startswith('SELECT') or 'diarioback_contenido' not in sql:
+                    continue
+                with self.subTest(ruta=ruta, sql=sql[:200]):
+                    with connection.cursor() as cursor:
+                        # Con tablas chicas el planner prefiere seq scan; así solo aparece si no hay índice
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                        cursor.execute(f'EXPLAIN {sql}')
+                        plan = '\n'.join(fila[0] for fila in cursor.fetchall())
+                    self.assertIsNone(self.SEQ_SCAN.search(plan), plan)
+
+
+class CacheRespuestasTestCase(DatosPublicadosTestCase):
+    """Cache de feeds y agregados: aciertos, invalidación por categoría y recálculo"""
+
+    def test_feeds_cacheados_no_consultan_la_base(self):
+        for ruta in ('contenido/news/', 'contenido/recientes/', 'home/', 'madeinarg/resumen/'):
+            with self.subTest(ruta=ruta):
+                self.client.get(self.PREFIJO + ruta)
+                with CaptureQueriesContext(connection) as consultas:
+                    response = self.client.get(self.PREFIJO + ruta)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(consultas), 0)
+
+    def test_guardar_contenido_invalida_solo_los_feeds_de_su_categoria(self):
+        editorials = self.PREFIJO + 'contenido/editorials/'
+        news = self.PREFIJO + 'contenido/news/'
+        for ruta in (editorials, news):
+            self.client.get(ruta)
+
+        contenido = Contenido.objects.filter(categoria='news').first()
+        contenido.titulo = 'Título editado'
+        contenido.save()
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(editorials)
+        self.assertEqual(len(consultas), 0)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(news)
+        self.assertGreater(len(consultas), 0)
+        self.assertIn('Título editado', [fila['titulo'] for fila in response.data])
+
+        # Al cambiar de categoría se invalidan el feed de origen y el de destino
+        for ruta in (editorials, news):
+            self.client.get(ruta)
+        contenido.categoria = 'editorials'
+        contenido.save()
+        for ruta in (editorials, news):
+            with self.subTest(ruta=ruta):
+                with CaptureQueriesContext(connection) as consultas:
+                    response = self.client.get(ruta)
+                self.assertGreater(len(consultas), 0)
+                self.assertEqual(contenido.pk in [fila['id'] for fila in response.data], ruta == editorials)
+
+    def test_agregados_vencidos_se_sirven_mientras_se_recalculan(self):
+        ruta = self.PREFIJO + 'madeinarg/estadisticas/'
+        total = self.client.get(ruta).data['totales']['tiendas']
+        TiendaMadeInArg.objects.create(titulo='Nueva', subtitulo='Sub', creado_por=self.autor)
+        
+        separados = []
+
+        def separar(*args):
+            separados.append(_contexto_separado(*args))
+            return separados[-1]
+
+        with mock.patch('diarioback.cache_utils._contexto_separado', side_effect=separar):
+            with mock.patch('diarioback.cache_utils._recalcular_en_segundo_plano') as recalcular:
+                for _ in range(3):
+                    with CaptureQueriesContext(connection) as consultas:
+                        response = self.client.get(ruta)
+                    self.assertEqual(response.data['totales']['tiendas'], total)
+                    self.assertEqual(len(consultas), 0)
+        # Un único worker toma el lock y recalcula, con un request propio y no el ya respondido
+        recalcular.assert_called_once()
+        self.assertIsNot(separados[0][1]._request, response.wsgi_request)
+        self.assertEqual(recalcular.call_args.args[3]().data['totales']['tiendas'], total + 1)
+
+    def test_agregados_en_calculo_se_esperan(self):
+        ruta = self.PREFIJO + 'madeinarg/estadisticas/'
+        clave = construir_clave_respuesta('swr:MadeInArgViewSet.estadisticas', [], ([], []))
+        self.client.get(ruta)
+        entrada = cache.get(clave)
+        cache.clear()
+        # Otro worker tiene el lock: se espera su resultado en lugar de consultar la base
+        cache.add(f'lock:{clave}', 1)
+        with mock.patch('diarioback.cache_utils.time.sleep', side_effect=lambda _: cache.set(clave, entrada)):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(ruta)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, entrada[0])
+        self.assertEqual(len(consultas), 0)
+
+    def test_espera_de_agregados_acotada(self):
+        ruta = self.PREFIJO + 'madeinarg/estadisticas/'
+        clave = construir_clave_respuesta('swr:MadeInArgViewSet.estadisticas', [], ([], []))
+        # Otro worker tomó el lock y nunca guarda el resultado: se calcula en el request
+        cache.add(f'lock:{clave}', 1)
+        inicio = time.monotonic()
+        response = self.client.get(ruta)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('totales', response.data)
+        self.assertLess(time.monotonic() - inicio, 2)
+
+
+class RankingsTestCase(DatosPublicadosTestCase):
+    """Rankings materializados y su uso en los feeds y la home"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        actualizar_rankings()
+
+    def test_rankings_materializados(self):
+        rutas = (
+            'contenido/mas_vistas/', 'contenido/mas_vistas/?ventana=dia',
+            'contenido/mas_leidas/', 'contenido/destacados/', 'news/destacadas/',
+        )
+        # Sin rankings calculados se responde en vivo con el mismo orden
+        RankingContenido.objects.all().delete()
+        en_vivo = {ruta: [item['id'] for item in self._pedir(ruta)[0].data] for ruta in rutas}
+        
+        Contenido.objects.filter(pk=self.ids['contenido']).update(contador_visitas_total=1000)
+        en_vivo['contenido/mas_leidas/'].remove(self.ids['contenido'])
+        en_vivo['contenido/mas_leidas/'].insert(0, self.ids['contenido'])
+        actualizar_rankings()
+        
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                response, consultas = self._pedir(ruta)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.data)
+                self.assertLessEqual(len(consultas), 3)
+                # El contenido se trae por id: ya no se ordena la tabla completa
+                self.assertFalse(any(
+                    'ORDER BY "diarioback_contenido"' in c['sql'] for c in consultas.captured_queries
+                ))
+                if ruta == 'contenido/mas_leidas/':
+                    self.assertEqual([item['id'] for item in response.data], en_vivo[ruta])
+
+    def test_recalcular_rankings_invalida_la_cache(self):
+        ruta = self.PREFIJO + 'contenido/mas_leidas/'
+        actualizar_rankings()
+        primero = self.client.get(ruta).data[0]['id']
+        otro = Contenido.objects.exclude(pk=primero).first().pk
+        Contenido.objects.filter(pk=otro).update(contador_visitas_total=1000)
+        
+        self.assertEqual(self.client.get(ruta).data[0]['id'], primero)
+        actualizar_rankings()
+        self.assertEqual(self.client.get(ruta).data[0]['id'], otro)
+        self.assertEqual(
+            RankingContenido.objects.get(ventana=RankingContenido.VENTANA_TOTAL, categoria='todas', posicion=1).contenido_id,
+            otro
+        )
+
+    def test_home_usa_los_mismos_rankings_que_sus_endpoints(self):
+        # Visitas que ordenan distinto la semana y el histórico, con empates
+        for posicion, pk in enumerate(Contenido.objects.filter(categoria='news').values_list('pk', flat=True)):
+            Contenido.objects.filter(pk=pk).update(contador_visitas_total=posicion % 2, contador_visitas=posicion)
+
+        def ids(datos):
+            return [fila['id'] for fila in datos]
+
+        for materializado in (False, True):
+            with self.subTest(materializado=materializado):
+                if materializado:
+                    actualizar_rankings()
+                else:
+                    RankingContenido.objects.all().delete()
+                    invalidar_ambitos(AMBITO_RANKING)
+                home = self.client.get(self.PREFIJO + 'home/').data['news']
+                destacadas = self.client.get('/diarioback/api/v1/news/destacadas/').data
+                mas_vistas = self.client.get(self.PREFIJO + 'contenido/mas_vistas/?categoria=news').data
+                self.assertEqual(ids(home['destacados']), ids(destacadas))
+                self.assertEqual(ids(home['mas_vistas']), ids(mas_vistas))
+
+    def test_home_cambia_de_etag_al_recalcular_rankings(self):
+        ruta = self.PREFIJO + 'home/'
+        primera = self.client.get(ruta)
+        self.assertEqual(self.client.get(ruta, HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+
+        invalidar_ambitos(AMBITO_RANKING)
+        response = self.client.get(ruta, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], primera['ETag'])
+
+
+class SnapshotsTestCase(DatosPublicadosTestCase):
+    """Exportación de snapshots estáticos y su servido"""
+
+    def test_exportar_snapshots(self):
+        visitas = ContenidoVisita.objects.count()
+        with tempfile.TemporaryDirectory() as destino:
+            exportar_snapshots(destino)
+            # Exportar el detalle no cuenta como visita
+            self.assertEqual(ContenidoVisita.objects.count(), visitas)
+            with open(os.path.join(destino, 'manifest.json')) as f:
+                archivos = json.load(f)['archivos']
+            self.assertLessEqual(set(RUTAS_FEEDS), set(archivos))
+            
+            ruta = f"api/v1/contenido/{self.ids['contenido']}/index.json"
+            with gzip.open(os.path.join(destino, ruta + '.gz')) as f:
+                detalle = json.load(f)
+            response = self.client.get(self.PREFIJO + 'contenido/{contenido}/'.format(**self.ids))
+            self.assertEqual(detalle, json.loads(response.content))
+
+            # Despublicado con la exportación automática apagada: la exportación completa lo borra
+            borrador = EstadoPublicacion.objects.get(nombre_estado=EstadoPublicacion.BORRADOR)
+            Contenido.objects.filter(pk=self.ids['contenido']).update(estado=borrador)
+            exportar_snapshots(destino)
+            for sufijo in ('', '.gz'):
+                self.assertFalse(os.path.exists(os.path.join(destino, ruta + sufijo)))
+            with open(os.path.join(destino, 'manifest.json')) as f:
+                archivos = json.load(f)['archivos']
+            self.assertNotIn(f"api/v1/contenido/{self.ids['contenido']}/", archivos)
+            self.assertLessEqual(set(RUTAS_FEEDS), set(archivos))
+
+            # Los snapshots se sirven en diarioback/snapshots/ con la variante precomprimida
+            with mock.patch('diarioback.views.SNAPSHOTS_ROOT', destino):
+                ruta = '/diarioback/snapshots/api/v1/contenido/recientes/'
+                response = self.client.get(ruta, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertIn('Accept-Encoding', response['Vary'])
+                feed = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+                self.assertEqual(feed, json.loads(self.client.get(self.PREFIJO + 'contenido/recientes/').content))
+
+                response = self.client.get(ruta, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(self.client.get('/diarioback/snapshots/manifest.json').status_code, 200)
+                for ruta in ('api/v1/../../../settings.py', '../', 'api/v1/no-existe/'):
+                    self.assertEqual(self.client.get('/diarioback/snapshots/' + ruta).status_code, 404)
+            # Sin temporales sueltos
+            self.assertFalse([n for _, _, nombres in os.walk(destino) for n in nombres if n.startswith('.tmp')])
+
+    def test_exportacion_automatica_por_categoria(self):
+        contenido = Contenido.objects.get(pk=self.ids['contenido'])
+        with mock.patch('diarioback.models.programar_exportacion') as programar:
+            contenido.categoria = 'news' if contenido.categoria != 'news' else 'editorials'
+            anterior = Contenido.objects.values_list('categoria', flat=True).get(pk=contenido.pk)
+            contenido.save()
+        programar.assert_called_once_with(contenido.pk, categorias=(contenido.categoria, anterior))
+
+        # Solo los feeds generales y los de las categorías del contenido, no los 22
+        rutas = rutas_de_categorias('news', 'news', None)
+        self.assertEqual(set(rutas), set(RUTAS_GENERALES) | set(RUTAS_POR_CATEGORIA['news']))
+        self.assertNotIn('api/v1/editorials/', rutas)
+
+    @override_settings(SNAPSHOTS_AUTOEXPORTAR=True)
+    def test_recalcular_rankings_reexporta_sus_feeds(self):
+        with tempfile.TemporaryDirectory() as destino:
+            with mock.patch('diarioback.snapshots.SNAPSHOTS_ROOT', destino):
+                actualizar_rankings()
+            with open(os.path.join(destino, 'manifest.json')) as f:
+                self.assertEqual(set(json.load(f)['archivos']), set(RUTAS_RANKING))
+
+
+class SlugsTestCase(DatosPublicadosTestCase):
+    """Generación de slugs y duplicado de contenido"""
+
+    def test_generar_slugs_por_lotes(self):
+        Contenido.objects.filter(categoria='news').update(slug=None, titulo='Mismo título')
+        call_command('generar_slugs', lote=2, stdout=io.StringIO())
+        
+        slugs = list(Contenido.objects.values_list('slug', flat=True))
+        self.assertNotIn(None, slugs)
+        self.assertEqual(len(slugs), len(set(slugs)))
+        self.assertEqual(
+            set(Contenido.objects.filter(categoria='news').values_list('slug', flat=True)),
+            {'mismo-titulo', 'mismo-titulo-2', 'mismo-titulo-3'}
+        )
+
+    def test_duplicar_contenido_con_slug(self):
+        original = Contenido.objects.get(pk=self.ids['contenido'])
+        cliente = APIClient()
+        cliente.force_authenticate(self.autor.user)
+
+        response = cliente.post(self.PREFIJO + f'contenido/{original.pk}/duplicar/')
+        self.assertEqual(response.status_code, 201)
+        copia = Contenido.objects.get(pk=response.data['id'])
+        self.assertEqual(copia.titulo, f'Copia de {original.titulo}')
+        self.assertTrue(copia.slug)
+        self.assertNotEqual(copia.slug, original.slug)
+
+
+class GaleriasTestCase(DatosPublicadosTestCase):
+    """Galerías normalizadas de contenido y artistas"""
+    CANTIDAD = 1
+
+    def test_duplicar_contenido_copia_la_galeria(self):
+        original = Contenido.objects.get(pk=self.ids['contenido'])
+        ContenidoImagen.objects.create(
+            contenido=original, tipo=ContenidoImagen.TIPO_BACKSTAGE, posicion=1, url='https://example.com/b.jpg'
+        )
+        cliente = APIClient()
+        cliente.force_authenticate(self.autor.user)
+
+        response = cliente.post(self.PREFIJO + f'contenido/{original.pk}/duplicar/')
+        self.assertEqual(response.status_code, 201)
+        def filas(pk):
+            return list(ContenidoImagen.objects.filter(contenido_id=pk).values_list('tipo', 'posicion', 'url'))
+
+        self.assertEqual(filas(response.data['id']), filas(original.pk))
+        self.assertEqual(len(filas(original.pk)), 2)
+        self.assertEqual(response.data['imagen_1'], 'https://example.com/imagen.jpg')
+
+    def test_editar_la_galeria_invalida_el_detalle(self):
+        contenido = Contenido.objects.get(pk=self.ids['contenido'])
+        imagen = ContenidoImagen.objects.create(
+            contenido=contenido, tipo=ContenidoImagen.TIPO_IMAGEN, posicion=2, url='https://example.com/2.jpg'
+        )
+        ruta = self.PREFIJO + f'contenido/{contenido.pk}/'
+        self.client.get(ruta)
+
+        # Una imagen que no es la portada, como la edita el inline del admin
+        imagen.url = 'https://example.com/nueva.jpg'
+        imagen.save()
+        self.assertEqual(self.client.get(ruta).data['imagen_2'], 'https://example.com/nueva.jpg')
+
+        imagen.delete()
+        self.assertIsNone(self.client.get(ruta).data['imagen_2'])
+
+    def test_galeria_normalizada_conserva_las_claves_imagen_n(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.autor.user)
+        png = io.BytesIO()
+        Image.new('RGB', (3, 2)).save(png, 'PNG')
+        archivo = SimpleUploadedFile('foto.png', png.getvalue(), content_type='image/png')
+
+        with mock.patch('diarioback.models.upload_to_imgbb', return_value='https://i.ibb.co/foto.png'):
+            response = cliente.post(self.PREFIJO + 'contenido/', {
+                'categoria': 'editorials', 'titulo': 'Galería', 'autor': self.autor.pk,
+                'fecha_publicacion': '2024-01-01',
+                'estado': EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO),
+                'imagen_1': 'https://example.com/1.jpg',
+                'imagen_31': 'https://example.com/31.jpg',
+                'backstage_2_local': archivo,
+            })
+        self.assertEqual(response.status_code, 201, response.data)
+        contenido = Contenido.objects.get(pk=response.data['id'])
+        self.assertEqual(contenido.portada, 'https://example.com/1.jpg')
+        self.assertEqual(contenido.get_image_urls(), ['https://example.com/1.jpg', 'https://example.com/31.jpg'])
+        backstage = contenido.imagenes.get(tipo=ContenidoImagen.TIPO_BACKSTAGE)
+        self.assertEqual((backstage.posicion, backstage.url, backstage.ancho, backstage.alto),
+                         (2, 'https://i.ibb.co/foto.png', 3, 2))
+
+        detalle = self.client.get(self.PREFIJO + f'contenido/{contenido.pk}/').data
+        self.assertEqual(detalle['imagen_1'], 'https://example.com/1.jpg')
+        self.assertIsNone(detalle['imagen_2'])
+        self.assertEqual(detalle['backstage_2'], 'https://i.ibb.co/foto.png')
+        self.assertEqual(detalle['imagenes_urls'], contenido.get_image_urls())
+
+        response = cliente.patch(self.PREFIJO + f'contenido/{contenido.pk}/', {
+            'imagen_1': '', 'imagen_5': 'https://example.com/5.jpg'
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        contenido.refresh_from_db()
+        self.assertEqual(contenido.portada, 'https://example.com/5.jpg')
+        self.assertEqual(contenido.get_image_urls(), ['https://example.com/5.jpg', 'https://example.com/31.jpg'])
+
+    def test_galeria_de_artista_mantiene_el_resumen(self):
+        artista = ArtistaMadeInArg.objects.get(pk=self.ids['artista'])
+        self.assertEqual((artista.imagen_principal, artista.total_imagenes), ('https://example.com/artista.jpg', 1))
+
+        cliente = APIClient()
+        cliente.force_authenticate(self.autor.user)
+        response = cliente.patch(self.PREFIJO + f'artistas/{artista.pk}/', {
+            'imagen_1': '', 'imagen_3': 'https://example.com/3.jpg', 'imagen_25': 'https://example.com/25.jpg'
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(response.data['imagen_1'])
+        self.assertEqual(response.data['imagen_3'], 'https://example.com/3.jpg')
+        self.assertEqual(response.data['imagenes_galeria'], ['https://example.com/3.jpg', 'https://example.com/25.jpg'])
+
+        artista.refresh_from_db()
+        self.assertEqual((artista.imagen_principal, artista.total_imagenes), ('https://example.com/3.jpg', 2))
+        listado = self.client.get(self.PREFIJO + 'artistas/').data
+        fila = next(a for a in listado if a['id'] == artista.pk)
+        self.assertEqual((fila['imagen_principal'], fila['total_imagenes']), ('https://example.com/3.jpg', 2))
+
+
+class ParametrosListadoTestCase(DatosPublicadosTestCase):
+    """Parámetros de los listados: ordering, fields/exclude, cursor y batch"""
+
+    def test_ordering_solo_admite_ordenamientos_indexados(self):
+        response = self.client.get(self.PREFIJO + 'contenido/news/?ordering=titulo')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+
+    def test_fields_y_exclude_recortan_la_respuesta(self):
+        pk = self.ids['contenido']
+        detalle = self.PREFIJO + f'contenido/{pk}/'
+        completo = self.client.get(detalle).data
+
+        response = self.client.get(detalle + '?fields=id,titulo')
+        self.assertEqual(response.data, {'id': pk, 'titulo': completo['titulo']})
+
+        response = self.client.get(detalle + '?exclude=contenido_news,imagenes_urls')
+        self.assertEqual(set(response.data), set(completo) - {'contenido_news', 'imagenes_urls'})
+        self.assertEqual(response.data['titulo'], completo['titulo'])
+
+        # Los campos calculados traen las columnas y relaciones de las que dependen (DEPENDENCIAS_CAMPOS)
+        response = self.client.get(detalle + '?fields=id,autor_data,imagen_1,imagenes_urls')
+        self.assertEqual(set(response.data), {'id', 'autor_data', 'imagen_1', 'imagenes_urls'})
+        for campo in ('autor_data', 'imagen_1', 'imagenes_urls'):
+            self.assertEqual(response.data[campo], completo[campo])
+
+        madeinarg = Contenido.objects.filter(categoria='madeinarg').first()
+        Contenido.objects.filter(pk=madeinarg.pk).update(tags_marcas='Marca A, Marca B')
+        cache.clear()
+        ruta = self.PREFIJO + 'contenido/madeinarg/?vista=completa&fields=id,tags_marcas_list'
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(ruta)
+        fila = next(fila for fila in response.data if fila['id'] == madeinarg.pk)
+        self.assertEqual(fila, {'id': madeinarg.pk, 'tags_marcas_list': ['Marca A', 'Marca B']})
+        # categoria y tags_marcas vienen en el SELECT recortado: ninguna carga diferida por fila
+        selects = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('SELECT DISTINCT')]
+        self.assertEqual(len(selects), 1, selects)
+        self.assertIn('"tags_marcas"', selects[0])
+        self.assertNotIn('"contenido"', selects[0])
+
+    def test_paginacion_por_cursor(self):
+        crear_datos(4, self.autor)
+        publicados = Contenido.objects.filter(
+            EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO), categoria='news'
+        )
+        # Empates en el campo de orden: el id los desempata sin repetir ni saltear filas
+        ids = list(publicados.order_by('pk').values_list('pk', flat=True))
+        for posicion, pk in enumerate(ids):
+            Contenido.objects.filter(pk=pk).update(contador_visitas=posicion // 3)
+
+        for ordering in ('-fecha_publicacion', 'fecha_publicacion', '-contador_visitas', 'contador_visitas_total'):
+            with self.subTest(ordering=ordering):
+                esperados = list(publicados.order_by(
+                    ordering, f"{'-' if ordering.startswith('-') else ''}id"
+                ).values_list('pk', flat=True))
+                ruta = self.PREFIJO + f'contenido/news/?ordering={ordering}&page_size=2'
+                vistos = []
+                while ruta:
+                    response = self.client.get(ruta)
+                    self.assertEqual(response.status_code, 200, response.content)
+                    self.assertLessEqual(len(response.data['results']), 2)
+                    vistos.extend(fila['id'] for fila in response.data['results'])
+                    ruta = response.data['next']
+                    # Relativo: la respuesta cacheada sirve para cualquier host
+                    self.assertTrue(ruta is None or ruta.startswith(self.PREFIJO), ruta)
+                self.assertEqual(vistos, esperados)
+
+        ruta = self.PREFIJO + 'contenido/news/?page_size=2&cursor='
+        self.assertEqual(self.client.get(ruta + 'no-es-un-cursor').status_code, 404)
+        self.assertEqual(self.client.get(ruta + 'WyJ4IiwxXQ').status_code, 404)  # ["x",1]
+        self.assertEqual(self.client.get(ruta[:-len('&cursor=')] + '&ordering=titulo').status_code, 400)
+
+    def test_batch_de_contenidos(self):
+        ids = list(Contenido.objects.order_by('-pk').values_list('pk', flat=True)[:4])
+        ruta = self.PREFIJO + 'contenido/batch/?ids=' + ','.join(map(str, ids + [999999]))
+        visitas = ContenidoVisita.objects.count()
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(ruta)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], ids)
+        # Una consulta para los contenidos y una por cada prefetch, sin importar cuántos ids
+        self.assertLessEqual(len(consultas), 4)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas)
+
+        # Comparte la cache con retrieve: con el detalle cacheado no consulta la base
+        detalle = self.client.get(self.PREFIJO + f'contenido/{ids[0]}/')
+        self.assertEqual(json.loads(detalle.content), json.loads(response.content)[0])
+        with CaptureQueriesContext(connection) as consultas:
+            cacheado = self.client.get(self.PREFIJO + 'contenido/batch/?ids=' + ','.join(map(str, ids)))
+        self.assertEqual(len(consultas), 0)
+        self.assertEqual(cacheado.content, response.content)
+
+        volcar_visitas()
+        visitas = ContenidoVisita.objects.count()
+        self.client.get(ruta + '&contar_visitas=true', REMOTE_ADDR='10.9.9.9')
+        volcar_visitas()
+        self.assertEqual(ContenidoVisita.objects.count(), visitas + len(ids))
+        self.assertEqual(self.client.get(self.PREFIJO + 'contenido/batch/?ids=1,x').status_code, 400)
+
+
+class EstadosPublicacionTestCase(DatosPublicadosTestCase):
+    """Registro en memoria de los estados de publicación"""
+    CANTIDAD = 1
+
+    def test_registro_de_estados_se_invalida_al_cambiar(self):
+        publicado = EstadoPublicacion.objects.get(nombre_estado=EstadoPublicacion.PUBLICADO)
+        self.assertEqual(EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO), publicado.pk)
+        with self.assertNumQueries(0):
+            EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO)
+
+        publicado.nombre_estado = EstadoPublicacion.EN_PAPELERA
+        # El rollback del test no dispara la señal: el registro se limpia a mano al terminar
+        self.addCleanup(EstadoPublicacion.limpiar_registro)
+        publicado.save()
+        self.assertIsNone(EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO))
+        self.assertFalse(Contenido.objects.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO)).exists())
+
+    def test_registro_de_estados_se_invalida_en_otros_workers(self):
+        publicado = EstadoPublicacion.objects.get(nombre_estado=EstadoPublicacion.PUBLICADO)
+        EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO)
+        # Otro worker renombra el estado: este proceso no recibe la señal, solo ve la versión en la cache
+        registro_local = EstadoPublicacion._registro
+        self.addCleanup(EstadoPublicacion.limpiar_registro)
+        EstadoPublicacion.objects.filter(pk=publicado.pk).update(nombre_estado=EstadoPublicacion.EN_PAPELERA)
+        EstadoPublicacion.limpiar_registro()
+        EstadoPublicacion._registro = registro_local
+        self.assertIsNone(EstadoPublicacion.id_de(EstadoPublicacion.PUBLICADO))
+
+
+class FormatosRespuestaTestCase(DatosPublicadosTestCase):
+    """Renderers (orjson, msgpack) y compresión de respuestas"""
+    CANTIDAD = 1
+
+    def test_orjson_produce_el_mismo_json_que_drf(self):
+        for ruta in ('contenido/recientes/?vista=completa', 'madeinarg/resumen/', 'contenido/{contenido}/'):
+            with self.subTest(ruta=ruta):
+                data = self.client.get(self.PREFIJO + ruta.format(**self.ids)).data
+                self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_compresion_de_respuestas(self):
+        ruta = self.PREFIJO + 'contenido/recientes/?vista=completa'
+        plano = self.client.get(ruta)
+        response = self.client.get(ruta, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plano.content)
+
+        # El ETag débil de la respuesta comprimida sigue validando
+        self.assertTrue(response['ETag'].startswith('W/'))
+        revalidada = self.client.get(ruta, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidada.status_code, 304)
+
+        with self.settings(COMPRESION_TAMANO_MINIMO=len(plano.content) + 1):
+            response = Client().get(ruta, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        # Nada con credenciales se comprime (BREACH): ni el token JWT ni los requests autenticados
+        with self.settings(COMPRESION_TAMANO_MINIMO=0):
+            cliente = Client()
+            response = cliente.post('/diarioback/token/', {
+                'username': self.autor.user.username, 'password': 'clave'
+            }, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+            autorizacion = f"Bearer {response.json()['access']}"
+            response = cliente.get(ruta, HTTP_ACCEPT_ENCODING='gzip', HTTP_AUTHORIZATION=autorizacion)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(cliente.get(ruta, HTTP_ACCEPT_ENCODING='gzip')['Content-Encoding'], 'gzip')
+
+    @skipUnless(msgpack, 'msgpack no está instalado')
+    def test_formato_msgpack(self):
+        ruta = self.PREFIJO + 'contenido/recientes/?vista=completa'
+        en_json = self.client.get(ruta)
+        for pedido in ({'path': ruta + '&format=msgpack'}, {'path': ruta, 'HTTP_ACCEPT': 'application/msgpack'}):
+            with self.subTest(pedido=pedido):
+                response = self.client.get(**pedido)
+                self.assertEqual(response['Content-Type'], 'application/msgpack')
+                self.assertIn('Accept', response['Vary'])
+                self.assertNotEqual(response['ETag'], en_json['ETag'])
+                self.assertEqual(msgpack.unpackb(response.content), json.loads(en_json.content))
+
+        datos = {'titulo': 'Título', 'ids': [1, 2]}
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(msgpack.packb(datos))), datos)
+
+
+class VisitasTestCase(DatosPublicadosTestCase):
+    """Registro, volcado, ventanas y retención de visitas"""
+
+    def test_visitas_se_acumulan_y_se_vuelcan_juntas(self):
+        pk = self.ids['contenido']
+        ruta = self.PREFIJO + f'contenido/{pk}/'
+        antes = Contenido.objects.values_list('contador_visitas_total', flat=True).get(pk=pk)
+        visitas = ContenidoVisita.objects.count()
+
+        for ip in ('10.1.0.1', '10.1.0.2', '10.1.0.3', '10.1.0.1'):
+            self.client.get(ruta, REMOTE_ADDR=ip)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(volcar_visitas(), 3)
+        # Contenidos existentes, bulk insert, upsert de buckets y un UPDATE (más los savepoints del atomic)
+        self.assertLessEqual(len([c for c in consultas.captured_queries if 'SAVEPOINT' not in c['sql']]), 4)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas + 3)
+        self.assertEqual(Contenido.objects.values_list('contador_visitas_total', flat=True).get(pk=pk), antes + 3)
+        self.assertEqual(
+            ContenidoVisitaHora.objects.get(contenido_id=pk, hora=ContenidoVisitaHora.truncar(timezone.now())).visitas,
+            1 + 3
+        )
+        # El contador semanal se mantiene al día con la ventana de 7 días
+        self.assertEqual(Contenido.objects.values_list('contador_visitas', flat=True).get(pk=pk), 1 + 3)
+
+        # Con el detalle cacheado, registrar o descartar una visita no consulta la base
+        for ip in ('10.1.0.2', '10.1.0.4'):
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.get(ruta, REMOTE_ADDR=ip)
+            self.assertEqual(len(consultas), 0)
+        self.assertEqual(volcar_visitas(), 1)
+
+    @override_settings(VISITAS_DEDUPLICACION_EN_BASE=True)
+    def test_visitas_se_deduplican_en_base_sin_cache_compartida(self):
+        pk = self.ids['contenido']
+        self.assertTrue(registrar_visita_contenido(pk, '10.3.0.1'))
+        self.assertEqual(volcar_visitas(), 1)
+
+        # Otro worker no ve la marca de la cache local, pero sí la visita ya volcada
+        cache.clear()
+        self.assertFalse(registrar_visita_contenido(pk, '10.3.0.1'))
+        self.assertTrue(registrar_visita_contenido(pk, '10.3.0.2'))
+        self.assertEqual(volcar_visitas(), 1)
+
+    @override_settings(VISITAS_VOLCADO_MAXIMO=2)
+    def test_buffer_lleno_se_vuelca_fuera_del_request(self):
+        pk = self.ids['contenido']
+        # Un evento propio para que el hilo de volcado real no se despierte durante el test
+        with mock.patch.object(buffer_visitas, '_despertar', threading.Event()) as despertar:
+            with CaptureQueriesContext(connection) as consultas:
+                for ip in ('10.5.0.1', '10.5.0.2', '10.5.0.3'):
+                    registrar_visita_contenido(pk, ip)
+            self.assertEqual(len(consultas), 0)
+            self.assertTrue(despertar.is_set())
+        self.assertEqual(volcar_visitas(), 3)
+
+    def test_visitas_se_reintentan_si_falla_el_volcado(self):
+        pk = self.ids['contenido']
+        visitas = ContenidoVisita.objects.count()
+        self.client.get(self.PREFIJO + f'contenido/{pk}/', REMOTE_ADDR='10.4.0.1')
+
+        with mock.patch.object(ContenidoVisita.objects, 'bulk_create', side_effect=Exception('base caída')):
+            self.assertEqual(volcar_visitas(), 0)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas)
+        # El lote volvió al buffer y entra en el siguiente volcado
+        self.assertEqual(volcar_visitas(), 1)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas + 1)
+
+    def test_beacon_de_visitas(self):
+        pk = self.ids['contenido']
+        ruta = self.PREFIJO + 'visitas/'
+        ahora_ms = int(timezone.now().timestamp() * 1000)
+        visitas = ContenidoVisita.objects.count()
+
+        eventos = [
+            {'contenido_id': pk, 'ts': ahora_ms},
+            {'contenido_id': pk},  # misma IP: se descarta
+            {'contenido_id': 'x'},  # inválido
+            {'contenido_id': pk, 'ts': ahora_ms - 2 * 86400000},  # demasiado viejo
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(ruta, json.dumps(eventos), content_type='application/json', REMOTE_ADDR='10.2.0.1')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'registradas': 1, 'descartadas': 3})
+        self.assertEqual(len(consultas), 0)
+
+        # sendBeacon envía text/plain para evitar el preflight
+        response = self.client.post(
+            ruta, json.dumps({'eventos': [{'contenido_id': pk}]}), content_type='text/plain', REMOTE_ADDR='10.2.0.2'
+        )
+        self.assertEqual(response.json(), {'registradas': 1, 'descartadas': 0})
+        self.assertEqual(volcar_visitas(), 2)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas + 2)
+
+        with self.settings(VISITAS_BEACON_MAXIMO=1):
+            response = self.client.post(ruta, json.dumps(eventos), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        # Con el beacon activo el detalle queda como un GET puro
+        with self.settings(VISITAS_CONTAR_EN_DETALLE=False):
+            self.client.get(self.PREFIJO + f'contenido/{pk}/', REMOTE_ADDR='10.2.0.3')
+        self.assertEqual(volcar_visitas(), 0)
+
+    def test_ventanas_deslizantes_de_visitas(self):
+        reciente, mensual = Contenido.objects.filter(categoria='news').values_list('pk', flat=True)[:2]
+        ContenidoVisitaHora.objects.all().delete()
+        hora = ContenidoVisitaHora.truncar(timezone.now())
+        ContenidoVisitaHora.objects.bulk_create([
+            ContenidoVisitaHora(contenido_id=reciente, hora=hora, visitas=2),
+            ContenidoVisitaHora(contenido_id=reciente, hora=hora - timedelta(days=3), visitas=1),
+            ContenidoVisitaHora(contenido_id=mensual, hora=hora - timedelta(days=10), visitas=9),
+            # Fuera de todas las ventanas
+            ContenidoVisitaHora(contenido_id=mensual, hora=hora - timedelta(days=40), visitas=50),
+        ])
+
+        anotados = {
+            c.pk: (c.visitas_24h, c.visitas_7d, c.visitas_30d)
+            for c in anotar_visitas_recientes(Contenido.objects.filter(pk__in=[reciente, mensual]))
+        }
+        self.assertEqual(anotados, {reciente: (2, 3, 3), mensual: (0, 0, 9)})
+
+        # El contador semanal sale de la misma ventana, sin reinicios por contenido
+        Contenido.objects.filter(pk=mensual).update(contador_visitas=500)
+        actualizar_rankings()
+        self.assertEqual(
+            dict(Contenido.objects.filter(pk__in=[reciente, mensual]).values_list('pk', 'contador_visitas')),
+            {reciente: 3, mensual: 0}
+        )
+        for ventana, primero in (('dia', reciente), ('semana', reciente), ('mes', mensual)):
+            with self.subTest(ventana=ventana):
+                self.assertEqual(RankingContenido.ids_rankeados(ventana, limit=1), [primero])
+                data = self.client.get(self.PREFIJO + f'contenido/mas_vistas/?ventana={ventana}').data
+                self.assertEqual(data[0]['id'], primero)
+
+        # En vivo (sin ranking materializado) se ordena por la misma ventana
+        RankingContenido.objects.all().delete()
+        cache.clear()
+        data = self.client.get(self.PREFIJO + 'contenido/mas_vistas/?ventana=mes').data
+        self.assertEqual([item['id'] for item in data], [mensual, reciente])
+
+        # Los buckets más viejos que la ventana más larga se purgan
+        purgar_visitas()
+        self.assertFalse(ContenidoVisitaHora.objects.filter(hora__lt=hora - timedelta(days=30)).exists())
+
+    def test_consolidacion_y_retencion_de_visitas(self):
+        pk = self.ids['contenido']
+        ContenidoVisita.objects.all().delete()
+        ahora = timezone.now()
+        ContenidoVisita.objects.bulk_create([
+            ContenidoVisita(contenido_id=pk, ip_address=ip, fecha=ahora - timedelta(days=dias))
+            for dias, ip in [(100, '10.3.0.1'), (100, '10.3.0.1'), (100, '10.3.0.2'), (1, '10.3.0.1'), (0, None)]
+        ])
+
+        self.assertEqual(consolidar_visitas(), 3)
+        viejo = ContenidoVisitaDiaria.objects.get(contenido_id=pk, fecha=(ahora - timedelta(days=100)).date())
+        self.assertEqual((viejo.visitas, viejo.unicos), (3, 2))
+
+        # Incremental: solo relee desde el día anterior al último consolidado y actualiza en el lugar
+        ContenidoVisita.objects.create(contenido_id=pk, ip_address='10.3.0.3', fecha=ahora)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(consolidar_visitas(), 2)
+        self.assertTrue(any('>=' in c['sql'] for c in consultas.captured_queries))
+        hoy = ContenidoVisitaDiaria.objects.get(contenido_id=pk, fecha=ahora.date())
+        self.assertEqual((hoy.visitas, hoy.unicos), (2, 1))
+
+        self.assertEqual(purgar_visitas(dias=30, lote=1), (3, 0))
+        self.assertEqual(ContenidoVisita.objects.count(), 3)
+        self.assertEqual(ContenidoVisitaDiaria.objects.filter(contenido_id=pk).count(), 3)
+
+        salida = io.StringIO()
+        call_command('consolidar_visitas', stdout=salida)
+        self.assertIn('Visitas crudas borradas: 0 filas', salida.getvalue())
+
+
+class ParticionesTestCase(DatosPublicadosTestCase):
+    """Particionado mensual de las visitas crudas"""
+    CANTIDAD = 1
+
+    @skipUnless(connection.vendor == 'postgresql', 'Las particiones solo existen en PostgreSQL')
+    def test_particionar_visitas(self):
+        pk = self.ids['contenido']
+        tabla = ContenidoVisita._meta.db_table
+        ContenidoVisita.objects.create(contenido_id=pk, fecha=timezone.now() - timedelta(days=90), ip_address='10.4.0.1')
+        filas = set(ContenidoVisita.objects.values_list('id', 'contenido_id', 'fecha', 'ip_address'))
+
+        self.assertTrue(particionar(ContenidoVisita))
+        self.assertTrue(esta_particionada(ContenidoVisita))
+        self.assertFalse(particionar(ContenidoVisita))
+
+        # Se copian todas las filas y los ids nuevos siguen saliendo de la secuencia
+        self.assertEqual(set(ContenidoVisita.objects.values_list('id', 'contenido_id', 'fecha', 'ip_address')), filas)
+        nueva = ContenidoVisita.objects.create(contenido_id=pk)
+        self.assertGreater(nueva.pk, max(fila[0] for fila in filas))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s', [tabla])
+            indices = dict(cursor.fetchall())
+            cursor.execute("SELECT count(*) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [tabla])
+            claves_foraneas = cursor.fetchone()[0]
+        # Los índices de Meta.indexes, sin un segundo índice sobre contenido_id, y la FK
+        for indice in ContenidoVisita._meta.indexes:
+            self.assertIn(indice.name, indices)
+        self.assertEqual(len([d for d in indices.values() if d.endswith('(contenido_id)')]), 1)
+        self.assertEqual(claves_foraneas, 1)
+
+        # Los meses siguientes ya tienen partición y las viejas se eliminan con sus filas
+        self.assertEqual(crear_particiones(ContenidoVisita), [])
+        self.assertGreater(eliminar_particiones_anteriores(ContenidoVisita, timezone.now() - timedelta(days=40)), 0)
+        self.assertFalse(ContenidoVisita.objects.filter(ip_address='10.4.0.1').exists())
+        self.assertTrue(ContenidoVisita.objects.filter(pk=nueva.pk).exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'Las particiones solo existen en PostgreSQL')
+    def test_particion_nueva_absorbe_las_filas_del_default(self):
+        pk = self.ids['contenido']
+        tabla = ContenidoVisita._meta.db_table
+        self.assertTrue(particionar(ContenidoVisita, meses=0))
+
+        # Sin la partición del mes siguiente (el cron no corrió) la fila cae en el default
+        proximo_mes = (timezone.localdate().replace(day=1) + timedelta(days=32)).replace(day=15)
+        fecha = timezone.make_aware(datetime.combine(proximo_mes, datetime.min.time()))
+        visita = ContenidoVisita.objects.create(contenido_id=pk, fecha=fecha, ip_address='10.4.0.2')
+
+        def particion_de(visita_pk):
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT tableoid::regclass::text FROM {tabla} WHERE id = %s', [visita_pk])
+                return cursor.fetchone()[0]
+
+        self.assertEqual(particion_de(visita.pk), f'{tabla}_default')
+        self.assertEqual(crear_particiones(ContenidoVisita, meses=1), [f'{tabla}_p{proximo_mes:%Y%m}'])
+        self.assertEqual(particion_de(visita.pk), f'{tabla}_p{proximo_mes:%Y%m}')
+        self.assertEqual(ContenidoVisita.objects.filter(pk=visita.pk).count(), 1)
+        # El default sigue adjunto para las fechas sin partición
+        lejana = ContenidoVisita.objects.create(contenido_id=pk, fecha=fecha + timedelta(days=400))
+        self.assertEqual(particion_de(lejana.pk), f'{tabla}_default')
+
+    @skipIf(connection.vendor == 'postgresql', 'En PostgreSQL se prueba la partición real')
+    def test_particiones_no_operan_fuera_de_postgresql(self):
+        visitas = ContenidoVisita.objects.count()
+        self.assertFalse(particionar(ContenidoVisita))
+        self.assertFalse(esta_particionada(ContenidoVisita))
+        self.assertEqual(crear_particiones(ContenidoVisita), [])
+        self.assertEqual(eliminar_particiones_anteriores(ContenidoVisita, timezone.now()), 0)
+        self.assertEqual(ContenidoVisita.objects.count(), visitas)
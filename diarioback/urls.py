@@ -6,6 +6,7 @@ from .views import (
     # ViewSets principales
     ContenidoViewSet,
     NewsletterPublicoView,
+    VisitasBeaconView,
     NewsletterViewSet,
     SuscriptorViewSet,
     TiendaMadeInArgViewSet,
@@ -111,6 +112,11 @@ urlpatterns = [
             ContenidoViewSet.as_view({'get': 'retrieve'}), 
             name='contenido-detail-slug'),
     
+    # Detalle solo por slug, resuelto por el índice único de la columna
+    re_path(r'^api/v1/contenido/slug/(?P<slug>[-\w]+)/$', 
+            ContenidoViewSet.as_view({'get': 'retrieve'}), 
+            name='contenido-detail-por-slug'),
+    
     # Acciones estadísticas de contenido
     path('api/v1/contenido/estadisticas/', 
          ContenidoViewSet.as_view({'get': 'estadisticas_visitas'}), 
@@ -306,6 +312,9 @@ path('api/v1/madeinarg/estadisticas/',
     
     # ================== URLS ESPECIALIZADAS POR CATEGORÍA ==================
     
+    # Home: recientes, destacados y más vistas de todas las categorías en una sola respuesta
+    path('api/v1/home/', ContenidoViewSet.as_view({'get': 'home'}), name='home'),
+    
     # Editorials
     path('api/v1/editorials/', include([
         path('', ContenidoViewSet.as_view({'get': 'editorials'}), name='editorials-list'),
@@ -340,6 +349,12 @@ path('api/v1/madeinarg/estadisticas/',
 
 
 
+    # Beacon de visitas del front-end (lotes de {contenido_id, ts})
+    path('api/v1/visitas/', VisitasBeaconView.as_view(), name='visitas-beacon'),
+
+    # Snapshots JSON exportados (exportar_snapshots), con la misma ruta que en la API
+    re_path(r'^snapshots/(?P<ruta>.*)$', views.servir_snapshot, name='snapshots'),
+
      # Newsletter público (información general)
     path('api/v1/newsletter/', NewsletterPublicoView.as_view(), name='newsletter-publico'),
     
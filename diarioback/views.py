@@ -10,20 +10,37 @@ from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.models import User
 from django.shortcuts import redirect, get_object_or_404
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Count, Sum, Avg, Max
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.core.mail import send_mail
 from django.conf import settings
-from datetime import timedelta
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from datetime import datetime, timedelta, timezone as dt_timezone
 import uuid
 import os
 
 from .models import (
     ArtistaMadeInArg, Newsletter, ProductoMadeInArg, Suscriptor, TiendaMadeInArg, Trabajador, 
     UserProfile, Usuario, Contenido, EstadoPublicacion, 
-    Publicidad, EspacioReferencia, ImagenLink, PasswordResetToken,
-    incrementar_visitas_contenido, upload_to_imgbb, get_madeinarg_stats
+    Publicidad, EspacioReferencia, ImagenLink, PasswordResetToken, RankingContenido, ContenidoImagen,
+    anotar_visitas_recientes, cambios_de_imagenes, incrementar_visitas_contenido, registrar_visita_contenido, upload_to_imgbb, get_madeinarg_stats
+)
+from .middleware import _codificaciones_aceptadas
+from .pagination import KeysetPagination
+from .renderers import ORJSONParser, TextoJSONParser
+from .snapshots import SNAPSHOTS_ROOT, ruta_archivo
+from .cache_utils import (
+    cachear_feed, cachear_madeinarg, cachear_con_revalidacion, responder_con_cache, obtener_versiones,
+    ambito_contenido, ambito_categoria, clave_detalle, clave_slug, clave_snapshot_home,
+    construir_clave_respuesta, obtener_detalles, ultima_modificacion_contenido,
+    AMBITO_MADEINARG, AMBITO_RANKING, DETALLE_CACHE_TIMEOUT, HOME_CACHE_TIMEOUT, PARAMETROS_FEED
 )
 from .serializers import (
     ActualizarPreferenciasSerializer, ArtistaMadeInArgListSerializer, ArtistaMadeInArgSerializer, DesuscripcionSerializer, NewsletterSerializer, 
@@ -35,18 +52,40 @@ from .serializers import (
     EspacioReferenciaSerializer, ImagenLinkSerializer, 
     RequestPasswordResetSerializer, VerifyTokenSerializer, ResetPasswordSerializer, 
     EditorialsSerializer, IssuesSerializer, MadeInArgSerializer, 
-    NewsSerializer, ClubPompaSerializer
+    NewsSerializer, ClubPompaSerializer, ContenidoCardSerializer, campos_solicitados
 )
 
 User = get_user_model()
 
 
+# ==================== CAMPOS DINÁMICOS ====================
+
+class CamposDinamicosViewSetMixin:
+    """Lleva los campos pedidos con ?fields= / ?exclude= al SQL: .only() y solo las relaciones necesarias"""
+
+    def recortar_queryset(self, queryset):
+        campos, excluidos = campos_solicitados(self.request)
+        if campos is None and not excluidos:
+            return queryset
+        
+        plan = self.get_serializer().plan_de_consulta()
+        if plan is None:
+            return queryset
+        
+        columnas, select, prefetch = plan
+        queryset = queryset.select_related(None).prefetch_related(None)
+        # select_related() sin argumentos seguiría todas las FK, por eso solo se aplica si hace falta
+        if select:
+            queryset = queryset.select_related(*select)
+        return queryset.prefetch_related(*prefetch).only(*columnas)
+
+
 # ==================== VIEWSETS PRINCIPALES ====================
 
-class ContenidoViewSet(viewsets.ModelViewSet):
+class ContenidoViewSet(CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     """ViewSet principal para manejo de todo el contenido"""
-    queryset = Contenido.objects.select_related('autor', 'estado').prefetch_related(
-        'espacios_referencia', 'imagen_links'
+    queryset = Contenido.objects.select_related('autor').prefetch_related(
+        'espacios_referencia', 'imagen_links', 'imagenes'
     )
     serializer_class = ContenidoSerializer
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
@@ -54,15 +93,25 @@ class ContenidoViewSet(viewsets.ModelViewSet):
     ordering = ['-fecha_publicacion']
     search_fields = ['titulo', 'tags_marcas', 'contenido_news', 'nombre_modelo']
     lookup_field = 'pk'
+
+    # Acciones de listado que responden con la proyección de tarjetas (salvo ?vista=completa)
+    acciones_tarjeta = [
+        'list', 'editorials', 'issues', 'madeinarg', 'news', 'club_pompa',
+        'mas_vistas', 'mas_leidas', 'recientes', 'destacados', 'buscar'
+    ]
     lookup_value_regex = r'[0-9]+(?:-[a-zA-Z0-9-_]+)?'
     
+    # Ordenamientos de ?ordering= en los feeds por categoría respaldados por un índice
+    # (los mismos que admite la paginación por cursor)
+    ordenamientos_indexados = KeysetPagination.ORDENAMIENTOS
+    
     def get_permissions(self):
         """Permisos personalizados por acción"""
         # Acciones que deben ser públicas (sin autenticación)
         public_actions = [
             'list', 'retrieve', 'editorials', 'issues', 'madeinarg', 
             'news', 'club_pompa', 'mas_vistas', 'mas_leidas', 
-            'recientes', 'destacados', 'estadisticas_visitas', 'buscar'
+            'recientes', 'destacados', 'estadisticas_visitas', 'buscar', 'home', 'batch'
         ]
         
         if self.action in public_actions:
@@ -73,7 +122,13 @@ class ContenidoViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Personaliza el queryset basado en parámetros de consulta"""
-        queryset = self.queryset.all()
+        if self._usa_tarjetas():
+            # Solo las columnas de la tarjeta, sin prefetch de relaciones
+            queryset = Contenido.objects.select_related('autor').only(
+                *ContenidoCardSerializer.CAMPOS_QUERYSET
+            )
+        else:
+            queryset = self.queryset.all()
         
         # Filtros específicos
         filters = {
@@ -91,7 +146,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         # Filtro por estado usando el nombre del estado
         estado = self.request.query_params.get('estado')
         if estado:
-            queryset = queryset.filter(estado__nombre_estado=estado)
+            queryset = queryset.filter(EstadoPublicacion.filtro(estado))
         
         # Filtros de fecha
         fecha_desde = self.request.query_params.get('fecha_desde')
@@ -111,10 +166,20 @@ class ContenidoViewSet(viewsets.ModelViewSet):
                 query |= Q(tags_marcas__icontains=tag)
             queryset = queryset.filter(query)
         
-        return queryset.distinct()
+        return self.recortar_queryset(queryset.distinct())
+
+    def _usa_tarjetas(self):
+        """Indica si la acción actual responde con la proyección liviana de tarjetas"""
+        return (
+            self.action in self.acciones_tarjeta
+            and self.request.query_params.get('vista') != 'completa'
+        )
 
     def get_serializer_class(self):
         """Retorna serializer específico según categoría"""
+        if self._usa_tarjetas():
+            return ContenidoCardSerializer
+        
         serializer_map = {
             'editorials': EditorialsSerializer,
             'issues': IssuesSerializer,
@@ -156,26 +221,85 @@ class ContenidoViewSet(viewsets.ModelViewSet):
                 raise ValidationError("Solo los trabajadores pueden crear contenido")
 
     def retrieve(self, request, *args, **kwargs):
-        """Override retrieve para incrementar visitas"""
-        instance = self.get_object()
+        """Override retrieve: sirve el detalle desde cache y registra la visita por separado"""
+        pk = self._get_pk_from_kwargs()
         
-        # Obtener IP del cliente
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0].strip()
+        # Con filtros de consulta se usa el camino normal para respetar get_queryset
+        if set(request.query_params) & set(PARAMETROS_FEED):
+            response = Response(self.get_serializer(self.get_object()).data)
         else:
-            ip = request.META.get('REMOTE_ADDR')
+            version, = obtener_versiones([ambito_contenido(pk)])
+            response = responder_con_cache(
+                request,
+                clave_detalle(pk, version),
+                lambda: Response(self.get_serializer(self.get_object()).data),
+                lambda: Contenido.objects.filter(pk=pk).values_list('fecha_actualizacion', flat=True).first(),
+                DETALLE_CACHE_TIMEOUT,
+            )
         
-        # Incrementar contador de visitas
-        incrementar_visitas_contenido(instance, ip_address=ip)
+        # Incrementar contador de visitas sin cargar el contenido (también en respuestas 304).
+        # Con el beacon de visitas en el front-end se desactiva y el detalle queda como un GET puro
+        if getattr(settings, 'VISITAS_CONTAR_EN_DETALLE', True):
+            registrar_visita_contenido(pk, ip_address=self._get_client_ip(request))
         
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        return response
 
-    def get_object(self):
+    # Máximo de ids por pedido a contenido/batch/
+    BATCH_MAXIMO = 50
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Retorna varios contenidos (?ids=1,2,3) en el orden pedido, con el mismo
+        detalle que retrieve. Los que están en la cache del detalle no se consultan;
+        el resto se trae en una sola consulta. Las visitas solo se registran con
+        ?contar_visitas=true.
+        """
+        try:
+            ids = list(dict.fromkeys(
+                int(valor) for valor in request.query_params.get('ids', '').split(',') if valor.strip()
+            ))
+        except ValueError:
+            return Response(
+                {'error': 'ids debe ser una lista de números separados por coma'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ids or len(ids) > self.BATCH_MAXIMO:
+            return Response(
+                {'error': f'Debe indicar entre 1 y {self.BATCH_MAXIMO} ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def generar(faltantes):
+            contenidos = list(self.filter_queryset(self.get_queryset()).filter(pk__in=faltantes))
+            data = self.get_serializer(contenidos, many=True).data
+            return [(c.pk, item, c.fecha_actualizacion) for c, item in zip(contenidos, data)]
+
+        # Con filtros de consulta se omite la cache, igual que en retrieve
+        if set(request.query_params) & set(PARAMETROS_FEED):
+            detalles = {pk: data for pk, data, _ in generar(ids)}
+        else:
+            detalles = obtener_detalles(ids, generar, DETALLE_CACHE_TIMEOUT)
+
+        if request.query_params.get('contar_visitas') == 'true':
+            ip_address = self._get_client_ip(request)
+            for pk in detalles:
+                registrar_visita_contenido(pk, ip_address=ip_address)
+
+        return Response([detalles[pk] for pk in ids if pk in detalles])
+
+    def _get_client_ip(self, request):
+        """Obtiene la IP del cliente considerando proxies"""
+        return ip_del_cliente(request)
+
+    def _get_pk_from_kwargs(self):
         """Soporte para pk o formato pk-slug en la URL"""
         pk_value = self.kwargs.get(self.lookup_field)
         
+        # Ruta contenido/slug/<slug>/: se resuelve el id por el índice del slug
+        if pk_value is None and self.kwargs.get('slug'):
+            return self._get_pk_from_slug(self.kwargs['slug'])
+        
         if pk_value and '-' in str(pk_value):
             # Extraer solo la parte numérica si está en formato 'id-slug'
             pk = str(pk_value).split('-', 1)[0]
@@ -183,9 +307,24 @@ class ContenidoViewSet(viewsets.ModelViewSet):
             pk = pk_value
         
         try:
-            pk = int(pk)
+            return int(pk)
         except (ValueError, TypeError):
             raise NotFound("ID de contenido inválido")
+
+    def _get_pk_from_slug(self, slug):
+        """Retorna el id del contenido con ese slug, cacheado para no consultar la base en cada visita"""
+        clave = clave_slug(slug)
+        pk = cache.get(clave)
+        if pk is None:
+            pk = Contenido.objects.filter(slug=slug).values_list('pk', flat=True).first()
+            if pk is None:
+                raise NotFound("Contenido no encontrado")
+            cache.set(clave, pk, DETALLE_CACHE_TIMEOUT)
+        return pk
+
+    def get_object(self):
+        """Soporte para pk o formato pk-slug en la URL"""
+        pk = self._get_pk_from_kwargs()
         
         queryset = self.filter_queryset(self.get_queryset())
         obj = get_object_or_404(queryset, pk=pk)
@@ -195,6 +334,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
     # ==================== ACCIONES ESPECÍFICAS POR CATEGORÍA ====================
     
     @action(detail=False, methods=['get'])
+    @cachear_feed('editorials')
     def editorials(self, request):
         """Retorna contenido de tipo Editorials"""
         self.action_categoria = 'editorials'
@@ -202,6 +342,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         return self._get_filtered_content(request, queryset)
 
     @action(detail=False, methods=['get'])
+    @cachear_feed('issues')
     def issues(self, request):
         """Retorna contenido de tipo Issues"""
         self.action_categoria = 'issues'
@@ -209,6 +350,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         return self._get_filtered_content(request, queryset)
 
     @action(detail=False, methods=['get'])
+    @cachear_feed('madeinarg')
     def madeinarg(self, request):
         """Retorna contenido de tipo MadeInArg"""
         self.action_categoria = 'madeinarg'
@@ -222,6 +364,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         return self._get_filtered_content(request, queryset)
 
     @action(detail=False, methods=['get'])
+    @cachear_feed('news')
     def news(self, request):
         """Retorna contenido de tipo News"""
         self.action_categoria = 'news'
@@ -229,6 +372,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         return self._get_filtered_content(request, queryset)
 
     @action(detail=False, methods=['get'])
+    @cachear_feed('club_pompa')
     def club_pompa(self, request):
         """Retorna contenido de tipo Club Pompa"""
         self.action_categoria = 'club_pompa'
@@ -238,38 +382,31 @@ class ContenidoViewSet(viewsets.ModelViewSet):
     # ==================== ACCIONES DE ESTADÍSTICAS ====================
 
     @action(detail=False, methods=['get'])
+    @cachear_feed(ambitos_extra=[AMBITO_RANKING])
     def mas_vistas(self, request):
-        """Retorna el contenido más visto de la semana pasada"""
+        """Retorna el contenido más visto de los últimos 7 días (?ventana=dia o mes para 24 horas o 30 días)"""
         limit = self._get_limit_from_request(request, 10)
-        hace_una_semana = timezone.now() - timedelta(days=7)
-        
-        contenido_mas_visto = self.get_queryset().filter(
-            estado__nombre_estado='publicado',
-            ultima_actualizacion_contador__gte=hace_una_semana
-        ).order_by('-contador_visitas')[:limit]
-        
-        serializer = self.get_serializer(contenido_mas_visto, many=True)
-        return Response(serializer.data)
+        ventana = request.query_params.get('ventana', RankingContenido.VENTANA_SEMANA)
+        return self._responder_ranking(request, ventana, request.query_params.get('categoria'), limit)
 
     @action(detail=False, methods=['get'])
+    @cachear_feed(ambitos_extra=[AMBITO_RANKING])
     def mas_leidas(self, request):
         """Retorna el contenido más leído de todos los tiempos"""
         limit = self._get_limit_from_request(request, 10)
-        
-        contenido_mas_leido = self.get_queryset().filter(
-            estado__nombre_estado='publicado'
-        ).order_by('-contador_visitas_total')[:limit]
-        
-        serializer = self.get_serializer(contenido_mas_leido, many=True)
-        return Response(serializer.data)
+        return self._responder_ranking(
+            request, RankingContenido.VENTANA_TOTAL, request.query_params.get('categoria'), limit
+        )
 
     @action(detail=False, methods=['get'])
-    def recientes(self, request):
+    @cachear_feed()
+    def recientes(self, request, categoria=None):
         """Retorna el contenido más reciente"""
         limit = self._get_limit_from_request(request, 10)
-        categoria = request.query_params.get('categoria')
+        # Las rutas api/v1/<categoria>/ pasan la categoría como kwarg
+        categoria = categoria or request.query_params.get('categoria')
         
-        queryset = self.get_queryset().filter(estado__nombre_estado='publicado')
+        queryset = self.get_queryset().filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
         if categoria:
             queryset = queryset.filter(categoria=categoria)
         
@@ -278,24 +415,129 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
-    def destacados(self, request):
+    @cachear_feed(ambitos_extra=[AMBITO_RANKING])
+    def destacados(self, request, categoria=None):
         """Retorna contenido destacado para carruseles"""
         limit = self._get_limit_from_request(request, 12)
-        categoria = request.query_params.get('categoria')
+        # Las rutas api/v1/<categoria>/ pasan la categoría como kwarg
+        categoria = categoria or request.query_params.get('categoria')
+        return self._responder_ranking(request, RankingContenido.VENTANA_TOTAL, categoria, limit)
+
+    # ==================== RANKINGS ====================
+
+    # Parámetros compatibles con el ranking materializado; con cualquier otro filtro se calcula en vivo
+    PARAMETROS_RANKING = {'limit', 'categoria', 'ventana', 'vista', 'fields', 'exclude'}
+
+    def _responder_ranking(self, request, ventana, categoria, limit):
+        """Sirve un ranking desde la tabla materializada o, si no está disponible, calculándolo en vivo"""
+        if ventana not in dict(RankingContenido.VENTANA_CHOICES):
+            raise ValidationError({
+                'ventana': f'Valores admitidos: {", ".join(dict(RankingContenido.VENTANA_CHOICES))}'
+            })
         
-        queryset = self.get_queryset().filter(estado__nombre_estado='publicado')
-        if categoria:
-            queryset = queryset.filter(categoria=categoria)
+        contenido = self._contenido_rankeado(request, ventana, categoria, limit)
+        if contenido is None:
+            queryset = self.get_queryset().filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
+            if categoria:
+                queryset = queryset.filter(categoria=categoria)
+            contenido = self._ranking_en_vivo(queryset, ventana)[:limit]
         
-        contenido_destacado = queryset.order_by('-contador_visitas_total')[:limit]
-        serializer = self.get_serializer(contenido_destacado, many=True)
+        serializer = self.get_serializer(contenido, many=True)
         return Response(serializer.data)
 
+    def _contenido_rankeado(self, request, ventana, categoria, limit):
+        """Retorna el contenido del ranking materializado en orden, o None si hay que calcularlo en vivo"""
+        filtros = set(request.query_params) & set(PARAMETROS_FEED)
+        if filtros - self.PARAMETROS_RANKING or limit > RankingContenido.TAMANO:
+            return None
+        
+        ids = RankingContenido.ids_rankeados(ventana, categoria, limit)
+        if not ids:
+            return None
+        
+        # Se filtra de nuevo por estado por si algo se despublicó después del último cálculo
+        contenidos = self.get_queryset().filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO)).order_by().in_bulk(ids)
+        return [contenidos[pk] for pk in ids if pk in contenidos]
+
+    def _ranking_en_vivo(self, queryset, ventana):
+        """Ordena el queryset según la ventana, con el mismo criterio que actualizar_rankings"""
+        campo = RankingContenido.CAMPOS_VENTANA.get(ventana)
+        if campo:
+            return anotar_visitas_recientes(queryset, campo).filter(
+                **{f'{campo}__gt': 0}
+            ).order_by(f'-{campo}', '-id')
+        return queryset.order_by('-contador_visitas_total', '-id')
+
+    @action(detail=False, methods=['get'])
+    def home(self, request):
+        """Retorna recientes, destacados y más vistas de todas las categorías en una sola respuesta"""
+        categorias = [valor for valor, _ in Contenido.CATEGORIA_CHOICES]
+        # destacados y más vistas dependen de los rankings: recalcularlos cambia la clave y el ETag
+        ambitos = [ambito_categoria(categoria) for categoria in categorias] + [AMBITO_RANKING]
+        versiones = obtener_versiones(ambitos)
+        limit = self._get_limit_from_request(request)
+        
+        return responder_con_cache(
+            request,
+            construir_clave_respuesta('home', list(zip(ambitos, versiones)), [('limit', limit)]),
+            lambda: Response(self._construir_home(categorias, versiones[:-1], versiones[-1], limit)),
+            lambda: ultima_modificacion_contenido(categorias),
+            HOME_CACHE_TIMEOUT,
+        )
+
+    def _construir_home(self, categorias, versiones, version_ranking, limit):
+        """Arma la home con los snapshots por categoría, reconstruyendo solo los que cambiaron"""
+        claves = {
+            categoria: clave_snapshot_home(categoria, version, version_ranking, limit)
+            for categoria, version in zip(categorias, versiones)
+        }
+        snapshots = cache.get_many(list(claves.values()))
+        
+        nuevos = {}
+        home = {}
+        for categoria, clave in claves.items():
+            if clave in snapshots:
+                home[categoria] = snapshots[clave]
+            else:
+                home[categoria] = nuevos[clave] = self._snapshot_categoria(categoria, limit)
+        
+        if nuevos:
+            cache.set_many(nuevos, HOME_CACHE_TIMEOUT)
+        return home
+
+    def _snapshot_categoria(self, categoria, limit):
+        """Calcula las listas de la home para una categoría usando la proyección de tarjetas"""
+        queryset = Contenido.objects.select_related('autor').only(
+            *ContenidoCardSerializer.CAMPOS_QUERYSET
+        ).filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO), categoria=categoria)
+        recientes = queryset.order_by('-fecha_publicacion')[:limit or 10]
+        
+        # Destacados y más vistas salen de los mismos rankings que sus endpoints: las dos
+        # ventanas en una consulta y sus contenidos en otra; en vivo si no están calculados
+        limites = {RankingContenido.VENTANA_TOTAL: limit or 12, RankingContenido.VENTANA_SEMANA: limit or 10}
+        ids = RankingContenido.ids_por_ventana(
+            categoria, {ventana: limite for ventana, limite in limites.items() if limite <= RankingContenido.TAMANO}
+        )
+        contenidos = queryset.order_by().in_bulk([pk for lista in ids.values() for pk in lista])
+        rankings = {}
+        for ventana, limite in limites.items():
+            if ids.get(ventana):
+                rankings[ventana] = [contenidos[pk] for pk in ids[ventana] if pk in contenidos]
+            else:
+                rankings[ventana] = self._ranking_en_vivo(queryset, ventana)[:limite]
+        
+        return {
+            'recientes': ContenidoCardSerializer(recientes, many=True).data,
+            'destacados': ContenidoCardSerializer(rankings[RankingContenido.VENTANA_TOTAL], many=True).data,
+            'mas_vistas': ContenidoCardSerializer(rankings[RankingContenido.VENTANA_SEMANA], many=True).data,
+        }
+
     @action(detail=False, methods=['get'])
+    @cachear_con_revalidacion()
     def estadisticas_visitas(self, request):
         """Retorna estadísticas generales de visitas"""
         categoria = request.query_params.get('categoria')
-        queryset = self.get_queryset().filter(estado__nombre_estado='publicado')
+        queryset = self.get_queryset().filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
         
         if categoria:
             queryset = queryset.filter(categoria=categoria)
@@ -336,7 +578,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         
         queryset = self.get_queryset().filter(
             search_query,
-            estado__nombre_estado='publicado'
+            EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO)
         )
         
         return self._get_filtered_content(request, queryset)
@@ -347,6 +589,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
     def duplicar(self, request, pk=None):
         """Duplica un contenido existente"""
         original = self.get_object()
+        imagenes = list(original.imagenes.all())
         
         # Crear una copia
         original.pk = None
@@ -354,15 +597,24 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         original.fecha_publicacion = timezone.now().date()
         original.contador_visitas = 0
         original.contador_visitas_total = 0
+        # El slug es único: Contenido.save genera uno nuevo a partir del título
+        original.slug = None
         
         # Cambiar estado a borrador
-        try:
-            borrador_estado = EstadoPublicacion.objects.get(nombre_estado='borrador')
-            original.estado = borrador_estado
-        except EstadoPublicacion.DoesNotExist:
-            pass
-        
-        original.save()
+        borrador_id = EstadoPublicacion.id_de(EstadoPublicacion.BORRADOR)
+        if borrador_id is not None:
+            original.estado_id = borrador_id
+        
+        # La galería (y el backstage) se copia junto con el contenido
+        with transaction.atomic():
+            original.save()
+            ContenidoImagen.objects.bulk_create([
+                ContenidoImagen(
+                    contenido=original, tipo=imagen.tipo, posicion=imagen.posicion,
+                    url=imagen.url, ancho=imagen.ancho, alto=imagen.alto
+                )
+                for imagen in imagenes
+            ])
         
         serializer = self.get_serializer(original)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -380,18 +632,22 @@ class ContenidoViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            nuevo_estado = EstadoPublicacion.objects.get(pk=nuevo_estado_id)
-            contenido.estado = nuevo_estado
-            contenido.save()
-            return Response({
-                'success': True, 
-                'nuevo_estado': nuevo_estado.nombre_estado
-            })
-        except EstadoPublicacion.DoesNotExist:
+            nuevo_estado_id = int(nuevo_estado_id)
+        except (TypeError, ValueError):
+            nuevo_estado_id = None
+        nombre_estado = EstadoPublicacion.nombre_de(nuevo_estado_id)
+        if nombre_estado is None:
             return Response(
                 {'error': 'Estado no encontrado'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        contenido.estado_id = nuevo_estado_id
+        contenido.save()
+        return Response({
+            'success': True, 
+            'nuevo_estado': nombre_estado
+        })
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def upload_image(self, request):
@@ -432,26 +688,30 @@ class ContenidoViewSet(viewsets.ModelViewSet):
         # Filtrar por estado publicado por defecto
         estado = request.query_params.get('estado', 'publicado')
         if estado == 'publicado':
-            queryset = queryset.filter(estado__nombre_estado='publicado')
+            queryset = queryset.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO))
         elif estado != 'todos':
-            queryset = queryset.filter(estado__nombre_estado=estado)
+            queryset = queryset.filter(EstadoPublicacion.filtro(estado))
+        
+        # Aplicar ordenamiento: solo los que tienen índice, con el id como desempate
+        ordering = request.query_params.get('ordering') or '-fecha_publicacion'
+        if ordering.lstrip('-') not in self.ordenamientos_indexados:
+            raise ValidationError({
+                'ordering': f'Ordenamientos admitidos: {", ".join(self.ordenamientos_indexados)} (con - para descendente)'
+            })
+        queryset = queryset.order_by(ordering, f"{'-' if ordering.startswith('-') else ''}id")
         
-        # Aplicar ordenamiento
-        ordering = request.query_params.get('ordering', '-fecha_publicacion')
-        if ordering:
-            queryset = queryset.order_by(ordering)
+        # Paginación por cursor (keyset) si se pide con ?cursor= o ?page_size=
+        paginador = KeysetPagination()
+        page = paginador.paginate_queryset(queryset, request, view=self)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return paginador.get_paginated_response(serializer.data)
         
         # Aplicar límite
         limit = self._get_limit_from_request(request)
         if limit:
             queryset = queryset[:limit]
         
-        # Paginación
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -557,17 +817,12 @@ class ContenidoViewSet(viewsets.ModelViewSet):
                     setattr(instance, field, value)
                     print(f"Set {field}: {value}")
             
-            # Manejar archivos de imagen
-            for i in range(1, 31):
-                image_field = f'imagen_{i}_local'
-                if image_field in request.FILES:
-                    setattr(instance, image_field, request.FILES[image_field])
-                    print(f"Set {image_field}")
-                
-                backstage_field = f'backstage_{i}_local'
-                if backstage_field in request.FILES:
-                    setattr(instance, backstage_field, request.FILES[backstage_field])
-                    print(f"Set {backstage_field}")
+            # Manejar imágenes: URLs imagen_N / backstage_N y archivos *_local
+            try:
+                imagenes = cambios_de_imagenes(request.data)
+            except DjangoValidationError as e:
+                return Response({'error': e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+            instance.guardar_imagenes(imagenes)
             
             # GUARDAR LA INSTANCIA PRIMERO
             instance.save()
@@ -622,7 +877,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
                 'titulo': instance.titulo,
                 'fecha_publicacion': str(instance.fecha_publicacion),
                 'autor': instance.autor.id if instance.autor else None,
-                'estado': instance.estado.id if instance.estado else None,
+                'estado': instance.estado_id,
                 'contador_visitas': instance.contador_visitas,
                 'contador_visitas_total': instance.contador_visitas_total,
             }
@@ -665,7 +920,7 @@ class ContenidoViewSet(viewsets.ModelViewSet):
 
 # ==================== VIEWSETS PARA MADEINARG ====================
 
-class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
+class TiendaMadeInArgViewSet(CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     """ViewSet para gestión de tiendas en MadeInArg - FILTRADO MEJORADO"""
     queryset = TiendaMadeInArg.objects.prefetch_related('productos')
     serializer_class = TiendaMadeInArgSerializer
@@ -680,7 +935,7 @@ class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        queryset = self.queryset.all()
+        queryset = TiendaMadeInArg.anotar_total_productos(self.queryset.all())
         
         # Filtrar solo tiendas activas por defecto
         activas_solo = self.request.query_params.get('activas', 'true')
@@ -705,7 +960,15 @@ class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
         if creador:
             queryset = queryset.filter(creado_por_id=creador)
         
-        return queryset
+        return self.recortar_queryset(queryset)
+
+    @cachear_madeinarg
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cachear_madeinarg
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -759,7 +1022,7 @@ class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        tiendas = TiendaMadeInArg.objects.filter(
+        tiendas = TiendaMadeInArg.anotar_total_productos().filter(
             activa=True,
             productos__categoria=categoria,
             productos__activo=True
@@ -791,7 +1054,7 @@ class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
         
         if categoria and categoria in dict(ProductoMadeInArg.CATEGORIA_CHOICES):
             # Tiendas destacadas de una categoría específica
-            tiendas = TiendaMadeInArg.objects.filter(
+            tiendas = TiendaMadeInArg.anotar_total_productos().filter(
                 activa=True,
                 productos__categoria=categoria,
                 productos__activo=True
@@ -803,7 +1066,7 @@ class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
             ).order_by('-num_productos_categoria')[:limit]
         else:
             # Tiendas destacadas generales
-            tiendas = TiendaMadeInArg.objects.filter(activa=True).annotate(
+            tiendas = TiendaMadeInArg.anotar_total_productos().filter(activa=True).annotate(
                 num_productos=Count('productos', filter=Q(productos__activo=True))
             ).order_by('-num_productos')[:limit]
         
@@ -811,7 +1074,7 @@ class TiendaMadeInArgViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ProductoMadeInArgViewSet(viewsets.ModelViewSet):
+class ProductoMadeInArgViewSet(CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     """ViewSet para gestión de productos en MadeInArg - FILTRADO MEJORADO"""
     queryset = ProductoMadeInArg.objects.select_related('tienda')
     serializer_class = ProductoMadeInArgSerializer
@@ -859,7 +1122,15 @@ class ProductoMadeInArgViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
-        return queryset
+        return self.recortar_queryset(queryset)
+
+    @cachear_madeinarg
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cachear_madeinarg
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -917,7 +1188,7 @@ class ProductoMadeInArgViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ArtistaMadeInArgViewSet(viewsets.ModelViewSet):
+class ArtistaMadeInArgViewSet(CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     """ViewSet para gestión de artistas en MadeInArg"""
     queryset = ArtistaMadeInArg.objects.all()
     serializer_class = ArtistaMadeInArgSerializer
@@ -926,13 +1197,19 @@ class ArtistaMadeInArgViewSet(viewsets.ModelViewSet):
     ordering = ['-fecha_creacion']
     search_fields = ['titulo', 'subtitulo', 'descripcion']
     
+    # Listados que solo leen el resumen de la galería (imagen_principal, total_imagenes)
+    acciones_listado = ['list', 'destacados', 'con_video']
+    
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'destacados', 'con_video', 'galeria']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        queryset = self.queryset.all()
+        if self.action in self.acciones_listado:
+            queryset = self.queryset.only(*ArtistaMadeInArgListSerializer.CAMPOS_QUERYSET)
+        else:
+            queryset = self.queryset.select_related('creado_por').prefetch_related('imagenes')
         
         # Filtrar solo artistas activos por defecto
         activos_solo = self.request.query_params.get('activos', 'true')
@@ -951,7 +1228,15 @@ class ArtistaMadeInArgViewSet(viewsets.ModelViewSet):
                 Q(video_youtube__isnull=True) | Q(video_youtube='')
             )
         
-        return queryset
+        return self.recortar_queryset(queryset)
+
+    @cachear_madeinarg
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cachear_madeinarg
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1026,16 +1311,19 @@ class MadeInArgViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]
 
     @action(detail=False, methods=['get'])
+    @cachear_con_revalidacion(ambitos=[AMBITO_MADEINARG])
     def resumen(self, request):
         """Retorna un resumen completo de MadeInArg"""
         try:
             # Tiendas destacadas
-            tiendas = TiendaMadeInArg.objects.filter(activa=True).annotate(
+            tiendas = TiendaMadeInArg.anotar_total_productos().filter(activa=True).annotate(
                 num_productos=Count('productos', filter=Q(productos__activo=True))
             ).order_by('-num_productos')[:6]
             
             # Artistas recientes
-            artistas = ArtistaMadeInArg.objects.filter(activo=True).order_by('-fecha_creacion')[:6]
+            artistas = ArtistaMadeInArg.objects.filter(activo=True).only(
+                *ArtistaMadeInArgListSerializer.CAMPOS_QUERYSET
+            ).order_by('-fecha_creacion')[:6]
             
             # Productos por categoría
             productos_por_categoria = {}
@@ -1081,7 +1369,9 @@ class MadeInArgViewSet(viewsets.ViewSet):
         
         if categoria == 'otro':
             # Retornar artistas
-            artistas = ArtistaMadeInArg.objects.filter(activo=True).order_by('-fecha_creacion')[:limit]
+            artistas = ArtistaMadeInArg.objects.filter(activo=True).only(
+                *ArtistaMadeInArgListSerializer.CAMPOS_QUERYSET
+            ).order_by('-fecha_creacion')[:limit]
             return Response({
                 'categoria': 'otro',
                 'tipo': 'artistas',
@@ -1090,7 +1380,7 @@ class MadeInArgViewSet(viewsets.ViewSet):
             })
         elif categoria in dict(ProductoMadeInArg.CATEGORIA_CHOICES):
             # Retornar tiendas que tienen productos de esta categoría CON CONTEO CORRECTO
-            tiendas_con_productos = TiendaMadeInArg.objects.filter(
+            tiendas_con_productos = TiendaMadeInArg.anotar_total_productos().filter(
                 activa=True,
                 productos__categoria=categoria,
                 productos__activo=True
@@ -1121,6 +1411,7 @@ class MadeInArgViewSet(viewsets.ViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @cachear_con_revalidacion(ambitos=[AMBITO_MADEINARG])
     def estadisticas(self, request):
         """Retorna estadísticas completas de MadeInArg"""
         try:
@@ -1147,7 +1438,7 @@ class MadeInArgViewSet(viewsets.ViewSet):
         try:
             # Buscar en tiendas
             tiendas_query = Q(titulo__icontains=query) | Q(subtitulo__icontains=query) | Q(descripcion__icontains=query)
-            tiendas = TiendaMadeInArg.objects.filter(tiendas_query, activa=True)
+            tiendas = TiendaMadeInArg.anotar_total_productos().filter(tiendas_query, activa=True)
             
             # Si hay filtro de categoría, solo tiendas que tengan productos de esa categoría
             if categoria_filtro and categoria_filtro in dict(ProductoMadeInArg.CATEGORIA_CHOICES):
@@ -1174,7 +1465,9 @@ class MadeInArgViewSet(viewsets.ViewSet):
             
             # Buscar en artistas
             artistas_query = Q(titulo__icontains=query) | Q(subtitulo__icontains=query) | Q(descripcion__icontains=query)
-            artistas = ArtistaMadeInArg.objects.filter(artistas_query, activo=True)[:10]
+            artistas = ArtistaMadeInArg.objects.filter(artistas_query, activo=True).only(
+                *ArtistaMadeInArgListSerializer.CAMPOS_QUERYSET
+            )[:10]
             
             # Si se filtra por categoría de productos, no mostrar artistas
             if categoria_filtro and categoria_filtro != 'otro':
@@ -1239,6 +1532,108 @@ def upload_image(request):
             'error': 'Error al subir la imagen'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# ==================== VISITAS ====================
+
+def ip_del_cliente(request):
+    """Obtiene la IP del cliente considerando proxies"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+class VisitasBeaconView(APIView):
+    """
+    Recibe lotes de visitas del front-end: [{"contenido_id": 1, "ts": <epoch en ms>}, ...].
+
+    Solo se valida la forma de cada evento; las visitas entran al buffer y se
+    vuelcan junto con las demás, así los detalles servidos desde cache o desde
+    los snapshots estáticos también se cuentan.
+    """
+    permission_classes = [AllowAny]
+    # Sin JWT ni sesión: el beacon es anónimo y no necesita CSRF
+    authentication_classes = []
+    parser_classes = [ORJSONParser, TextoJSONParser]
+
+    # Eventos más viejos que esto (o del futuro, salvo desfasaje de reloj) se descartan
+    ANTIGUEDAD_MAXIMA = timedelta(days=1)
+    DESFASAJE_MAXIMO = timedelta(minutes=5)
+
+    def post(self, request):
+        eventos = request.data.get('eventos') if isinstance(request.data, dict) else request.data
+        maximo = getattr(settings, 'VISITAS_BEACON_MAXIMO', 50)
+        if not isinstance(eventos, list) or len(eventos) > maximo:
+            return Response(
+                {'error': f'Se espera una lista de hasta {maximo} eventos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ip_address = ip_del_cliente(request)
+        ahora = timezone.now()
+        registradas = 0
+        for evento in eventos:
+            contenido_id, fecha = self._validar_evento(evento, ahora)
+            if contenido_id and registrar_visita_contenido(contenido_id, ip_address=ip_address, fecha=fecha):
+                registradas += 1
+
+        return Response(
+            {'registradas': registradas, 'descartadas': len(eventos) - registradas},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    def _validar_evento(self, evento, ahora):
+        """Retorna (contenido_id, fecha) o (None, None) si el evento no es válido"""
+        if not isinstance(evento, dict):
+            return None, None
+        contenido_id, ts = evento.get('contenido_id'), evento.get('ts')
+        if type(contenido_id) is not int or contenido_id <= 0:
+            return None, None
+        if ts is None:
+            return contenido_id, ahora
+        if type(ts) not in (int, float):
+            return None, None
+        try:
+            fecha = datetime.fromtimestamp(ts / 1000, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None, None
+        if not ahora - self.ANTIGUEDAD_MAXIMA <= fecha <= ahora + self.DESFASAJE_MAXIMO:
+            return None, None
+        return contenido_id, min(fecha, ahora)
+
+# ==================== SNAPSHOTS ESTÁTICOS ====================
+
+def servir_snapshot(request, ruta):
+    """
+    Sirve un snapshot exportado sin consultar la base: el index.json de la ruta
+    (o el manifiesto), en su variante .br o .gz si el cliente la acepta.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    archivo = ruta_archivo(SNAPSHOTS_ROOT, ruta)
+    if archivo is None:
+        raise Http404
+
+    aceptadas = _codificaciones_aceptadas(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for codificacion, sufijo in (('br', '.br'), ('gzip', '.gz'), (None, '')):
+        if codificacion and codificacion not in aceptadas:
+            continue
+        try:
+            estado = os.stat(archivo + sufijo)
+        except OSError:
+            continue
+        break
+    else:
+        raise Http404
+
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), estado.st_mtime):
+        return HttpResponseNotModified()
+    response = FileResponse(open(archivo + sufijo, 'rb'), content_type='application/json')
+    response['Last-Modified'] = http_date(estado.st_mtime)
+    if codificacion:
+        response['Content-Encoding'] = codificacion
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
 # ==================== VIEWSETS AUXILIARES ====================
 
 class TrabajadorViewSet(viewsets.ModelViewSet):
@@ -1551,6 +1946,8 @@ class AdminDashboardView(APIView):
     """Vista para el dashboard administrativo"""
     permission_classes = [IsAdminUser]
 
+    # Los totales son los mismos para cualquier admin: se comparten entre usuarios
+    @cachear_con_revalidacion(publico=False)
     def get(self, request):
         try:
             # Estadísticas generales
@@ -1562,8 +1959,8 @@ class AdminDashboardView(APIView):
                 },
                 'contenido': {
                     'total': Contenido.objects.count(),
-                    'publicado': Contenido.objects.filter(estado__nombre_estado='publicado').count(),
-                    'borrador': Contenido.objects.filter(estado__nombre_estado='borrador').count(),
+                    'publicado': Contenido.objects.filter(EstadoPublicacion.filtro(EstadoPublicacion.PUBLICADO)).count(),
+                    'borrador': Contenido.objects.filter(EstadoPublicacion.filtro(EstadoPublicacion.BORRADOR)).count(),
                     'por_categoria': {}
                 },
                 'madeinarg': get_madeinarg_stats(),